@@ -0,0 +1,245 @@
+import os
+import argparse
+from datetime import date, datetime, timedelta
+import pandas as pd
+import chicken_db
+from query_cache import QueryCache
+
+# pyarrow is optional: without it nothing is archived and read_range() reads SQLite only
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+ARCHIVE_AVAILABLE = pa is not None
+
+# --- Layout ---
+# <database name>_archive/<table>/<YYYY-MM>.parquet, one file per closed month, registered
+# in the ArchivedMonths table (migration 6). Writes to an archived month mark it Stale
+# until it is exported again, so the files never serve outdated rows.
+
+ARCHIVE_DIR_ENV_VAR = 'CHICKEN_TRACKER_ARCHIVE_DIR'
+COMPRESSION = 'zstd'
+
+# Column kinds per table; 'dictionary' columns are stored dictionary-encoded and come back
+# as pandas categoricals (a few suppliers/items repeated over millions of rows).
+ARCHIVE_SCHEMAS = {
+    'RawData': [
+        ('Date', 'date'), ('TandoorRate', 'float'), ('BoilerRate', 'float'), ('EggRate', 'float'),
+    ],
+    'BillEntries': [
+        ('ID', 'int'), ('Date', 'date'), ('SupplierName', 'dictionary'), ('ItemName', 'dictionary'),
+        ('Qty', 'float'), ('VendorRate', 'float'), ('ExpectedRate', 'float'), ('Variance', 'float'),
+        ('Status', 'dictionary'),
+    ],
+    'VendorLedger': [
+        ('ID', 'int'), ('Date', 'date'), ('SupplierName', 'dictionary'), ('TransactionType', 'dictionary'),
+        ('Amount', 'float'), ('Details', 'string'),
+    ],
+}
+
+def archive_dir():
+    """Archive folder of the current database (CHICKEN_TRACKER_ARCHIVE_DIR overrides it)."""
+    override = os.environ.get(ARCHIVE_DIR_ENV_VAR)
+    if override:
+        return override
+    base, _ = os.path.splitext(os.path.abspath(chicken_db.DB_NAME))
+    return base + '_archive'
+
+def month_path(table, month):
+    return os.path.join(archive_dir(), table, f"{month}.parquet")
+
+def _month_bounds(month):
+    """First day of month and of the following month, as date keys."""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{month}-01", f"{year + mon // 12:04d}-{mon % 12 + 1:02d}-01"
+
+def _require_pyarrow():
+    if not ARCHIVE_AVAILABLE:
+        raise RuntimeError("The columnar archive needs pyarrow (pip install pyarrow).")
+
+# --- Writer ---
+
+def _to_arrow(table, rows):
+    kinds = {'float': pa.float64(), 'int': pa.int64(), 'string': pa.string()}
+    schema = ARCHIVE_SCHEMAS[table]
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for (_, kind), values in zip(schema, columns):
+        if kind == 'date':
+            arrays.append(pa.array(values, pa.string()).cast(pa.date32()))
+        elif kind == 'dictionary':
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, kinds[kind]))
+    return pa.Table.from_arrays(arrays, names=[name for name, _ in schema])
+
+def pending_months(before=None):
+    """
+    (table, month) pairs that need exporting: months that end before `before` (default: today,
+    i.e. every closed month) and are not archived yet or went stale since.
+    """
+    cutoff = chicken_db.date_key(before or date.today())[:7] + '-01'
+    pending = []
+    for table in chicken_db.ARCHIVED_TABLES:
+        rows = chicken_db.read_rows(f"""
+            SELECT DISTINCT substr(Date, 1, 7) FROM {table} WHERE Date < ?
+            EXCEPT
+            SELECT Month FROM ArchivedMonths WHERE TableName = ? AND Stale = 0
+            ORDER BY 1
+        """, (cutoff, table))
+        pending += [(table, row[0]) for row in rows]
+    return pending
+
+def export_month(table, month):
+    """Writes one month of table to its Parquet file and registers it. Returns the row count."""
+    _require_pyarrow()
+    start, end = _month_bounds(month)
+    columns = ", ".join(name for name, _ in ARCHIVE_SCHEMAS[table])
+    path = month_path(table, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Read, write and register under the write lock, so no write can land in between
+    with chicken_db.transaction() as conn:
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE Date >= ? AND Date < ? ORDER BY Date, rowid", (start, end)
+        ).fetchall()
+        pq.write_table(_to_arrow(table, rows), path + '.tmp', compression=COMPRESSION)
+        os.replace(path + '.tmp', path)
+        conn.execute("""
+            INSERT INTO ArchivedMonths (TableName, Month, Rows, ArchivedAt, Stale) VALUES (?, ?, ?, ?, 0)
+            ON CONFLICT(TableName, Month) DO UPDATE SET Rows = excluded.Rows, ArchivedAt = excluded.ArchivedAt, Stale = 0
+        """, (table, month, len(rows), datetime.now().isoformat(timespec='seconds')))
+    return len(rows)
+
+def archive_closed_months(before=None):
+    """Exports every pending month (see pending_months). Returns [(table, month, rows)]."""
+    _require_pyarrow()
+    return [(table, month, export_month(table, month)) for table, month in pending_months(before)]
+
+def archive_summary():
+    """{table: {'months', 'stale', 'rows'}} from the ArchivedMonths register."""
+    summary = {table: {'months': 0, 'stale': 0, 'rows': 0} for table in chicken_db.ARCHIVED_TABLES}
+    for table, months, stale, rows in chicken_db.read_rows("""
+        SELECT TableName, COUNT(*), SUM(Stale), SUM(CASE WHEN Stale = 0 THEN Rows ELSE 0 END)
+        FROM ArchivedMonths GROUP BY TableName
+    """):
+        summary[table] = {'months': months, 'stale': stale, 'rows': rows}
+    return summary
+
+# --- Reader ---
+
+_range_cache = QueryCache(max_entries=16)
+
+def _archived_months(table, first_month, last_month):
+    """Fresh archived months in [first_month, last_month] whose file is present, in order."""
+    if not ARCHIVE_AVAILABLE:
+        return []
+    rows = chicken_db.read_rows("""
+        SELECT Month FROM ArchivedMonths
+        WHERE TableName = ? AND Stale = 0 AND Month >= ? AND Month <= ?
+        ORDER BY Month
+    """, (table, first_month, last_month))
+    return [row[0] for row in rows if os.path.exists(month_path(table, row[0]))]
+
+# Comparison operators accepted in read_range() filters, pyarrow's (column, op, value) form
+FILTER_OPS = ('=', '==', '!=', '<', '<=', '>', '>=')
+
+def _read_live(table, columns, lo, hi, filters):
+    """Rows with lo <= Date < hi from SQLite (one range seek on the Date index)."""
+    where = "".join(f" AND {col} {'=' if op == '==' else op} ?" for col, op, _ in filters)
+    return pd.read_sql_query(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE Date >= ? AND Date < ?{where} ORDER BY Date, rowid",
+        chicken_db.get_db_connection(), params=(lo, hi, *(value for _, _, value in filters)))
+
+def _read_files(table, columns, months, lo, hi, filters):
+    """Rows of the archived months with lo <= Date < hi; filters are applied while reading."""
+    bounds = [('Date', '>=', date.fromisoformat(lo) if lo else date.min),
+              ('Date', '<', date.fromisoformat(hi) if len(hi) == 10 else date.max)]
+    data = pq.read_table([month_path(table, month) for month in months], columns=columns, filters=bounds + filters)
+    return data.to_pandas(date_as_object=False)
+
+_PANDAS_DTYPES = {'date': 'datetime64[ns]', 'float': 'float64', 'int': 'int64', 'string': 'object', 'dictionary': 'category'}
+
+def _conform(table, df):
+    """
+    Same dtypes whichever source the frame came from, down to the categories: a Parquet
+    dictionary comes back in order of appearance and may hold values the filters dropped,
+    while astype() on SQLite text gives just the values present, sorted.
+    """
+    kinds = dict(ARCHIVE_SCHEMAS[table])
+    df = df.astype({col: _PANDAS_DTYPES[kinds[col]] for col in df.columns})
+    for col in df.columns:
+        if kinds[col] == 'dictionary':
+            values = df[col].cat.remove_unused_categories()
+            df[col] = values.cat.reorder_categories(values.cat.categories.sort_values())
+    return df
+
+def _read_range(table, columns, lo, hi, last_month, filters):
+    pieces = []
+    live_from = lo
+    for month in _archived_months(table, lo[:7], last_month):
+        month_start, month_end = _month_bounds(month)
+        if live_from < month_start:
+            pieces.append(('live', live_from, month_start))
+        if pieces and pieces[-1][0] == 'files':
+            pieces[-1][1].append(month)
+        else:
+            pieces.append(('files', [month]))
+        live_from = max(live_from, month_end)
+    if live_from < hi:
+        pieces.append(('live', live_from, hi))
+
+    frames = []
+    for piece in pieces:
+        if piece[0] == 'live':
+            frames.append(_conform(table, _read_live(table, columns, piece[1], piece[2], filters)))
+        else:
+            frames.append(_conform(table, _read_files(table, columns, piece[1], lo, hi, filters)))
+    if not frames:
+        return _conform(table, _read_live(table, columns, lo, lo, filters))
+    # Categoricals with different categories concatenate to object; re-encode once
+    return _conform(table, pd.concat(frames, ignore_index=True))
+
+def read_range(table, start=None, end=None, columns=None, filters=None):
+    """
+    Rows of table dated in [start, end] (either bound may be None) as a DataFrame in Date
+    order, with Date as datetime64 and dictionary columns as categoricals. Fresh archived
+    months come from their Parquet files; open, stale or unarchived months from SQLite.
+    filters: [(column, op, value)] row conditions, all of which must hold, e.g. [('Variance', '!=', 0)].
+    Cached until the next committed write, like chicken_db.read_frame().
+    """
+    kinds = dict(ARCHIVE_SCHEMAS[table])
+    columns = ['Date'] + [col for col in (columns or list(kinds)) if col != 'Date']
+    filters = [tuple(f) for f in (filters or [])]
+    for col, op, _ in filters:
+        if col not in kinds or op not in FILTER_OPS:
+            raise ValueError(f"Unsupported filter on {table}: {col} {op}")
+    lo = '' if start is None else chicken_db.date_key(start)
+    # Exclusive upper bound; '9999-99' sorts after every date key
+    hi = '9999-99' if end is None else (date.fromisoformat(chicken_db.date_key(end)) + timedelta(days=1)).isoformat()
+    last_month = '9999-99' if end is None else chicken_db.date_key(end)[:7]
+
+    generation = chicken_db.get_data_generation()
+    if generation is None:
+        return _read_range(table, columns, lo, hi, last_month, filters)
+    key = QueryCache.make_key(chicken_db.DB_NAME, f"archive:{table}", (lo, hi, *columns, *filters))
+    return _range_cache.get_or_compute(key, generation, lambda: _read_range(table, columns, lo, hi, last_month, filters)).copy()
+
+def clear_range_cache():
+    _range_cache.clear()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export closed months to the columnar archive.")
+    parser.add_argument('--db', default=chicken_db.DB_NAME, help="Database file (default: %(default)s)")
+    parser.add_argument('--before', help="Only months ending before this date (default: every closed month)")
+    args = parser.parse_args()
+
+    chicken_db.DB_NAME = args.db
+    chicken_db.initialize_db()
+    exported = archive_closed_months(args.before)
+    for table, month, rows in exported:
+        print(f"{table} {month}: {rows} rows")
+    print(f"{len(exported)} month file(s) written to {archive_dir()}")
@@ -0,0 +1,20 @@
+import argparse
+from benchmarks import synthetic
+from benchmarks.runner import DEFAULT_REPEAT, run_benchmarks, format_report, write_report
+from benchmarks.scenarios import SCENARIOS
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the billing hot paths on synthetic data.")
+parser.add_argument('--scale', choices=list(synthetic.SCALES), default='small')
+parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed runs per scenario (default: %(default)s)")
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--scenario', action='append', choices=[cls.name for cls in SCENARIOS],
+                    help="Only run this scenario (repeatable)")
+parser.add_argument('--output', help="Write the JSON report to this file")
+args = parser.parse_args()
+
+report = run_benchmarks(args.scale, args.repeat, args.seed, args.scenario)
+print(f"{args.scale}: {report['dataset']['bill_entry_rows']} bill entries, built in {report['dataset']['build_seconds']}s")
+print(format_report(report))
+if args.output:
+    write_report(report, args.output)
+    print(f"Report written to {args.output}")
@@ -0,0 +1,101 @@
+import gc
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import chicken_db
+from benchmarks import synthetic
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_REPEAT = 20
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def time_scenario(scenario, repeat):
+    """
+    Runs the scenario repeat times for latency (no tracing), then once more under
+    tracemalloc for the peak Python allocation. Returns a result dict.
+    """
+    samples = []
+    for _ in range(repeat):
+        scenario.before_run()
+        gc.collect()
+        started = time.perf_counter()
+        scenario.run()
+        samples.append((time.perf_counter() - started) * 1000.0)
+
+    scenario.before_run()
+    gc.collect()
+    tracemalloc.start()
+    scenario.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = np.array(samples)
+    return {
+        'repeat': repeat,
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'mean_ms': round(float(samples.mean()), 3),
+        'peak_memory_kb': round(peak / 1024.0, 1),
+    }
+
+def run_benchmarks(scale='small', repeat=DEFAULT_REPEAT, seed=0, only=None, workdir=None):
+    """
+    Builds a synthetic database for the scale in a temporary directory and times every
+    scenario against it. Returns the JSON-ready report dict.
+    """
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        old_db = chicken_db.DB_NAME
+        try:
+            started = time.perf_counter()
+            dataset = synthetic.build_database(os.path.join(tmp, 'bench.db'), scale, seed)
+            dataset['build_seconds'] = round(time.perf_counter() - started, 2)
+
+            suppliers, _ = chicken_db.fetch_suppliers_and_items()
+            dates = [row[0] for row in chicken_db.read_rows("SELECT Date FROM RawData ORDER BY Date")]
+            ctx = {**synthetic.SCALES[scale], 'seed': seed, 'suppliers': suppliers, 'dates': dates}
+
+            results = {}
+            # Read-only scenarios first, so they all see the freshly generated data
+            for cls in sorted(SCENARIOS, key=lambda c: c.writes):
+                if not cls.enabled or (only and cls.name not in only):
+                    continue
+                scenario = cls()
+                scenario.setup(ctx)
+                results[cls.name] = time_scenario(scenario, repeat)
+        finally:
+            chicken_db.close_db_connection()
+            chicken_db.DB_NAME = old_db
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': dataset,
+        'scenarios': results,
+    }
+
+def format_report(report):
+    lines = [f"{'scenario':<24}{'p50 ms':>12}{'p95 ms':>12}{'peak KB':>12}"]
+    for name, result in report['scenarios'].items():
+        lines.append(f"{name:<24}{result['p50_ms']:>12.2f}{result['p95_ms']:>12.2f}{result['peak_memory_kb']:>12.1f}")
+    return "\n".join(lines)
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,143 @@
+import tempfile
+from datetime import date, timedelta
+import pandas as pd
+import numpy as np
+import chicken_db
+import importers
+import archive
+import exports
+import forecasting
+import bill_math
+from benchmarks import synthetic
+
+# --- Scenarios ---
+# Each scenario is a class with setup(ctx) (untimed, once) and run() (timed, repeated).
+# They call the same chicken_db/importers functions the views do, without Streamlit.
+# Caches are cleared before every run so the numbers are cold-path costs.
+
+class Scenario:
+    name = None
+    writes = False
+    enabled = True # False when an optional dependency is missing
+
+    def setup(self, ctx):
+        self.ctx = ctx
+        self.rng = np.random.default_rng(ctx['seed'])
+
+    def before_run(self):
+        chicken_db.clear_query_cache()
+        chicken_db.clear_expected_rate_cache()
+        forecasting.clear_model_cache()
+
+    def run(self):
+        raise NotImplementedError
+
+class GridLoad(Scenario):
+    """Open one vendor/date in the bill grid: context query plus building its bill model."""
+    name = 'grid_load'
+
+    def run(self):
+        supplier = self.rng.choice(self.ctx['suppliers'])
+        date = self.rng.choice(self.ctx['dates'])
+        context = chicken_db.fetch_bill_context(date, supplier)
+        items = context['items']
+        qty = [context['existing'][item][0] if item in context['existing'] else 0.0 for item in items]
+        vendor_rate = [context['existing'][item][1] if item in context['existing'] else 0.0 for item in items]
+        expected = [context['expected_rates'][item] for item in items]
+        bill_math.BillModel(items, expected, qty_recv=qty, vendor_rate=vendor_rate)
+
+class RateCsvImport(Scenario):
+    """Parse, validate and upsert a rates CSV covering the whole history, then recompute bills."""
+    name = 'rate_csv_import'
+    writes = True
+
+    def setup(self, ctx):
+        super().setup(ctx)
+        self.csv_text = synthetic.rates_csv(ctx['days'], ctx['seed'])
+
+    def run(self):
+        df = synthetic.read_csv_text(self.csv_text)
+        rates, _ = importers.prepare_rates(df, 'Date', 'Tandoor', 'Boiler', 'Egg')
+        importers.import_rates(rates)
+
+class WideBillImport(Scenario):
+    """Import a Bill.csv-style wide file for one supplier over the whole history."""
+    name = 'wide_bill_import'
+    writes = True
+
+    def setup(self, ctx):
+        super().setup(ctx)
+        self.supplier = ctx['suppliers'][0]
+        self.csv_text = synthetic.wide_bill_csv(ctx['days'], ctx['items'], ctx['seed'])
+
+    def run(self):
+        df = synthetic.read_csv_text(self.csv_text)
+        item_cols = [col for col in df.columns if col != 'Date']
+        bills, dates, _ = importers.prepare_wide_bills(df, 'Date', item_cols, self.supplier)
+        importers.import_wide_bills(bills, dates, self.supplier)
+
+class RateChangeRecompute(Scenario):
+    """Re-save a month of rates and recompute every bill on those dates."""
+    name = 'rate_change_recompute'
+    writes = True
+
+    def run(self):
+        dates = self.ctx['dates'][-30:]
+        chicken_db.recalculate_bill_entries(dates)
+
+class LedgerView(Scenario):
+    """Vendor ledger tab: first page with running balance, plus the Net Due summary."""
+    name = 'ledger_view'
+
+    def run(self):
+        supplier = self.rng.choice(self.ctx['suppliers'])
+        page = chicken_db.fetch_ledger_page(supplier)
+        pd.DataFrame(page['rows'], columns=['Date', 'TransactionType', 'Amount', 'Details', 'Balance'])
+        chicken_db.fetch_vendor_balance(supplier)
+
+class DashboardOverview(Scenario):
+    """Overview tab: outstanding total, supplier count, rate history and the forecast."""
+    name = 'dashboard_overview'
+
+    def run(self):
+        chicken_db.read_rows("SELECT COUNT(*) FROM Suppliers")
+        chicken_db.fetch_total_outstanding()
+        df_rates = chicken_db.read_frame("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date")
+        df_rates['Date'] = pd.to_datetime(df_rates['Date'])
+        forecasting.get_rate_forecaster().forecast(7)
+
+class VarianceTab(Scenario):
+    """Variance tab over the whole history, every month read from the live database."""
+    name = 'variance_tab'
+
+    def before_run(self):
+        super().before_run()
+        archive.clear_range_cache()
+
+    def run(self):
+        df = archive.read_range('BillEntries', columns=['SupplierName', 'ItemName', 'ExpectedRate', 'VendorRate', 'Variance'],
+                                filters=[('Variance', '!=', 0.0)])
+        df.sort_values('Date', ascending=False, kind='stable')
+
+class ArchivedVarianceTab(VarianceTab):
+    """The same tab after every closed month was exported to the columnar archive."""
+    name = 'variance_tab_archived'
+    writes = True # Registers the exported months
+    enabled = archive.ARCHIVE_AVAILABLE
+
+    def setup(self, ctx):
+        super().setup(ctx)
+        last_date = date.fromisoformat(ctx['dates'][-1])
+        archive.archive_closed_months(before=last_date + timedelta(days=32))
+
+class VarianceExport(Scenario):
+    """Variance Report XLSX for the last month, streamed from the live database."""
+    name = 'variance_export'
+
+    def run(self):
+        dates = self.ctx['dates']
+        with tempfile.TemporaryFile() as out:
+            exports.write_xlsx('variance_report', out, dates[-30], dates[-1])
+
+SCENARIOS = [GridLoad, RateCsvImport, WideBillImport, RateChangeRecompute, LedgerView, DashboardOverview, VarianceTab,
+             VarianceExport, ArchivedVarianceTab]
@@ -0,0 +1,172 @@
+import io
+from datetime import date, timedelta
+import pandas as pd
+import numpy as np
+import chicken_db
+import bill_math
+
+# --- Scales ---
+# suppliers x items x days; every supplier buys each of its items on ~DENSITY of the days.
+
+SCALES = {
+    'small': {'suppliers': 5, 'items': 10, 'days': 90},
+    'medium': {'suppliers': 20, 'items': 20, 'days': 365},
+    'large': {'suppliers': 50, 'items': 30, 'days': 1095},
+}
+DENSITY = 0.6
+PAYMENT_EVERY_DAYS = 7
+START_DATE = date(2022, 1, 1)
+
+BASE_RATES = {'TandoorRate': 130.0, 'BoilerRate': 118.0, 'EggRate': 580.0}
+
+def _supplier_name(i):
+    return f"Supplier {i:03d}"
+
+def _item_name(i):
+    return f"Item {i:02d}"
+
+# --- Frames ---
+
+def generate_rates(rng, days, start=START_DATE):
+    """RawData-shaped frame: a mean-reverting random walk per rate type."""
+    dates = [(start + timedelta(days=d)).isoformat() for d in range(days)]
+    data = {'Date': dates}
+    for rate_type, base in BASE_RATES.items():
+        steps = rng.normal(0.0, base * 0.015, size=days)
+        walk = np.empty(days)
+        level = base
+        for d in range(days):
+            level += steps[d] + (base - level) * 0.05
+            walk[d] = level
+        data[rate_type] = np.round(walk, 0)
+    return pd.DataFrame(data)
+
+def generate_markups(rng, suppliers, items):
+    """Markups-shaped frame: every supplier has a rule for every item."""
+    rows = []
+    for s in range(suppliers):
+        for i in range(items):
+            rows.append((
+                _supplier_name(s), _item_name(i),
+                chicken_db.RATE_TYPES[rng.integers(0, len(chicken_db.RATE_TYPES))],
+                '+', float(rng.integers(0, 60)),
+                '*' if rng.random() < 0.3 else None,
+                round(float(rng.uniform(1.0, 1.2)), 2) if rng.random() < 0.3 else None,
+            ))
+    df = pd.DataFrame(rows, columns=['SupplierName', 'ItemName', *chicken_db.RULE_COLUMNS])
+    df.loc[df['MarkupOperator2'].isna(), 'MarkupValue2'] = None
+    return df
+
+def generate_bills(rng, rates, markups, density=DENSITY):
+    """
+    BillEntries-shaped frame priced with the real markup engine. Most vendor rates
+    match the expected rate; some are off by a few percent and a few by much more.
+    """
+    pairs = markups[['SupplierName', 'ItemName']]
+    grid = rates[['Date']].merge(pairs, how='cross')
+    grid = grid[rng.random(len(grid)) < density].reset_index(drop=True)
+
+    priced = grid.merge(rates, on='Date').merge(markups, on=['SupplierName', 'ItemName'])
+    expected = chicken_db.calculate_expected_rates(
+        priced[list(chicken_db.RATE_TYPES)].to_numpy(dtype=float),
+        *(priced[col].to_numpy(dtype=object) for col in chicken_db.RULE_COLUMNS)
+    )
+    qty = np.round(rng.gamma(2.0, 6.0, size=len(priced)), 1) + 0.5
+
+    drift = rng.choice([0.0, 0.02, -0.02, 0.08, -0.08], size=len(priced), p=[0.7, 0.1, 0.1, 0.05, 0.05])
+    vendor_rate = bill_math.round2(expected * (1.0 + drift))
+    rows = bill_math.compute_bill_rows(qty, 0.0, expected, vendor_rate)
+
+    return pd.DataFrame({
+        'Date': priced['Date'], 'SupplierName': priced['SupplierName'], 'ItemName': priced['ItemName'],
+        'Qty': qty, 'VendorRate': vendor_rate, 'ExpectedRate': expected,
+        'Variance': rows['variance'], 'Status': rows['status'],
+        'VendorAmount': rows['vendor_amount'],
+    })
+
+def generate_ledger(rng, bills):
+    """One 'Bill' row per supplier/date plus a weekly payment covering most of the week."""
+    totals = bills.groupby(['SupplierName', 'Date'], sort=True)['VendorAmount'].sum().reset_index()
+    ledger = pd.DataFrame({
+        'Date': totals['Date'], 'SupplierName': totals['SupplierName'], 'TransactionType': 'Bill',
+        'Amount': totals['VendorAmount'].round(2), 'Details': 'Bill Total',
+    })
+
+    day = (pd.to_datetime(totals['Date']) - pd.Timestamp(START_DATE)).dt.days
+    totals['Week'] = day // PAYMENT_EVERY_DAYS
+    weekly = totals.groupby(['SupplierName', 'Week']).agg(Date=('Date', 'max'), Amount=('VendorAmount', 'sum')).reset_index()
+    payments = pd.DataFrame({
+        'Date': weekly['Date'], 'SupplierName': weekly['SupplierName'], 'TransactionType': 'Payment',
+        'Amount': -(weekly['Amount'] * rng.uniform(0.8, 1.0, size=len(weekly))).round(2),
+        'Details': 'Weekly Payment',
+    })
+    return pd.concat([ledger, payments], ignore_index=True)
+
+# --- Database ---
+
+def build_database(db_path, scale='small', seed=0):
+    """
+    Creates a fresh database at db_path (must not exist) filled with the given scale.
+    Returns a summary dict with row counts.
+    """
+    spec = SCALES[scale]
+    rng = np.random.default_rng(seed)
+
+    chicken_db.DB_NAME = str(db_path)
+    chicken_db.initialize_db()
+
+    rates = generate_rates(rng, spec['days'])
+    markups = generate_markups(rng, spec['suppliers'], spec['items'])
+    bills = generate_bills(rng, rates, markups)
+    ledger = generate_ledger(rng, bills)
+
+    def records(df, columns):
+        return list(df[columns].astype(object).where(df[columns].notna(), None).itertuples(index=False, name=None))
+
+    with chicken_db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO Suppliers (SupplierName, VendorType, PreferredPaymentType, PaymentFrequency) VALUES (?, 'Chicken', 'Cash', 'Weekly')",
+            [(_supplier_name(s),) for s in range(spec['suppliers'])])
+        conn.executemany(
+            "INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)",
+            records(rates, ['Date', *chicken_db.RATE_TYPES]))
+        conn.executemany(
+            "INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            records(markups, ['SupplierName', 'ItemName', *chicken_db.RULE_COLUMNS]))
+        conn.executemany(
+            "INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            records(bills, ['Date', 'SupplierName', 'ItemName', 'Qty', 'VendorRate', 'ExpectedRate', 'Variance', 'Status']))
+        conn.executemany(
+            "INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES (?, ?, ?, ?, ?)",
+            records(ledger, ['Date', 'SupplierName', 'TransactionType', 'Amount', 'Details']))
+    chicken_db.get_db_connection().execute("ANALYZE")
+
+    return {
+        'scale': scale, 'seed': seed, **spec,
+        'raw_data_rows': len(rates), 'markup_rows': len(markups),
+        'bill_entry_rows': len(bills), 'ledger_rows': len(ledger),
+    }
+
+# --- Import Payloads ---
+
+def rates_csv(days, seed=0):
+    """A daily-rates CSV in the 'Paper Rate.csv' layout (d/m/Y dates)."""
+    rates = generate_rates(np.random.default_rng(seed + 1), days)
+    out = pd.DataFrame({
+        'Date': pd.to_datetime(rates['Date']).dt.strftime('%d/%m/%Y').str.replace(r'(^|/)0', r'\1', regex=True),
+        'Tandoor': rates['TandoorRate'], 'Boiler': rates['BoilerRate'], 'Egg': rates['EggRate'],
+    })
+    return out.to_csv(index=False)
+
+def wide_bill_csv(days, items, seed=0):
+    """A wide bill CSV in the 'Bill.csv' layout: one row per date, one column per item (dd/mm/yy)."""
+    rng = np.random.default_rng(seed + 2)
+    dates = pd.date_range(START_DATE, periods=days, freq='D')
+    qty = np.round(rng.gamma(2.0, 6.0, size=(days, items)), 1)
+    qty[rng.random((days, items)) > DENSITY] = 0.0
+    out = pd.DataFrame(qty, columns=[_item_name(i) for i in range(items)])
+    out.insert(0, 'Date', dates.strftime('%d/%m/%y'))
+    return out.to_csv(index=False)
+
+def read_csv_text(text):
+    return pd.read_csv(io.StringIO(text))
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, Toplevel
-import sqlite3
 from datetime import datetime
 
 # Placeholder for tkcalendar import
@@ -9,32 +8,37 @@ try:
 except ImportError:
     pass # Assumed to be available in the main environment
 
+import bill_math
+import events
+from virtual_tree import VirtualTreeview, sequence_pages
 from chicken_db import (
-    DB_NAME,
-    fetch_items_for_supplier,
-    fetch_rate_and_rule,
-    calculate_expected_rate
+    query_one,
+    transaction,
+    fetch_bill_context,
+    date_key
 )
 
-# Global cache for expected rates to improve performance during row edits
-# Key: (date, supplier_name, item_name) -> Value: expected_rate
-RATE_CACHE = {} 
-
 class BillEntryManager:
     """Manages the Daily Bill Entry functionality."""
 
-    def __init__(self, master_app, notebook_frame, suppliers, update_app_data_callback):
+    def __init__(self, master_app, notebook_frame, suppliers, event_bus):
         self.master_app = master_app
         self.frame = notebook_frame
         self.suppliers = suppliers
-        self.update_app_data_callback = update_app_data_callback
+        self.events = event_bus
         
         # State variables
-        self.expected_rates = {} # Cache for current grid calculation
+        # Typed rows of the bill on screen (bill_math.BillModel), the source of truth for
+        # totals and saving; the tree only renders a window of them
+        self.bill_model = bill_math.BillModel([], [])
         self.total_bill_amount_var = tk.StringVar(value="Total Bill: ₹0.00")
         
         self._setup_bill_entry_tab()
 
+        self.events.subscribe(events.SUPPLIERS_CHANGED, self._on_suppliers_changed)
+        self.events.subscribe(events.RATES_CHANGED, self._on_rates_changed)
+        self.events.subscribe(events.MARKUPS_CHANGED, self._on_markups_changed)
+
     # --- Calendar Widget Helper ---
     def _open_calendar_popup(self, date_var):
         """Opens a Toplevel window with a calendar for date selection."""
@@ -102,7 +106,9 @@ class BillEntryManager:
         
         # Treeview for Bill Entries (Initialization)
         columns = ('Item', 'Q_Rec', 'Q_Dmg', 'Net_Q', 'E_Rate', 'V_Rate', 'E_Amt', 'V_Amt', 'Var_Amt', 'Status')
-        self.bill_tree = ttk.Treeview(grid_frame, columns=columns, show='headings', selectmode='browse')
+        self.bill_grid = VirtualTreeview(grid_frame, sequence_pages(lambda: len(self.bill_model), self._bill_grid_row),
+                                         columns=columns, show='headings', selectmode='browse')
+        self.bill_tree = self.bill_grid.tree
         
         # Define Headings and Columns
         self.bill_tree.heading('Item', text='Item Name')
@@ -122,12 +128,7 @@ class BillEntryManager:
         self.bill_tree.column('Item', width=100, anchor='w')
         self.bill_tree.column('Status', width=80, anchor='center')
         
-        self.bill_tree.pack(side=tk.LEFT, fill='both', expand=True)
-        
-        # Scrollbar
-        vsb = ttk.Scrollbar(grid_frame, orient="vertical", command=self.bill_tree.yview)
-        vsb.pack(side=tk.RIGHT, fill='y')
-        self.bill_tree.configure(yscrollcommand=vsb.set)
+        self.bill_grid.frame.pack(fill='both', expand=True)
         
         # Bind double-click for editing input cells
         self.bill_tree.bind('<Double-1>', self._start_bill_edit)
@@ -144,64 +145,70 @@ class BillEntryManager:
             self._load_bill_grid()
 
 
-    # --- Data Handling and Calculation ---
-    
-    def _fetch_expected_rate(self, date, supplier_name, item_name):
-        """Fetches/calculates the expected rate using caching."""
-        global RATE_CACHE
-        cache_key = (date, supplier_name, item_name)
-        
-        if cache_key in RATE_CACHE:
-            return RATE_CACHE[cache_key]
+    # --- Event Handlers ---
 
-        paper_rates, rule = fetch_rate_and_rule(date, supplier_name, item_name)
-        
-        if paper_rates and rule:
-            expected_rate = calculate_expected_rate(paper_rates, rule)
-            RATE_CACHE[cache_key] = expected_rate
-            return expected_rate
-        
-        # If rates or rule are missing, return 0.0
-        RATE_CACHE[cache_key] = 0.0 
-        return 0.0
+    def _on_suppliers_changed(self, payloads):
+        """Refreshes the vendor combobox; reloads the grid only if its vendor is gone."""
+        self.suppliers = self.master_app.suppliers
+        self.bill_vendor_combo['values'] = self.suppliers
+        if self.bill_vendor_var.get() in self.suppliers:
+            return
+        self.bill_vendor_var.set(self.suppliers[0] if self.suppliers else '')
+        if self.suppliers:
+            self._load_bill_grid()
+        else:
+            self.bill_model = bill_math.BillModel([], [])
+            self.bill_grid.load()
+            self._update_total_bill()
 
+    def _on_rates_changed(self, payloads):
+        if self.bill_vendor_var.get() and (self.bill_date_var.get(),) in payloads:
+            self._load_bill_grid()
+
+    def _on_markups_changed(self, payloads):
+        if self.bill_vendor_var.get() and (self.bill_vendor_var.get(),) in payloads:
+            self._load_bill_grid()
+
+    # --- Data Handling and Calculation ---
+    
     def _load_bill_grid(self, event=None):
         """Loads items for the selected vendor and calculates their expected rates."""
         vendor = self.bill_vendor_var.get()
-        bill_date = self.bill_date_var.get()
         
         if not vendor: return
 
-        # Clear existing data and cache
-        self.bill_tree.delete(*self.bill_tree.get_children())
-        self.expected_rates = {}
-        global RATE_CACHE
-        RATE_CACHE = {} 
+        try:
+            bill_date = date_key(self.bill_date_var.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid Date", str(e))
+            return
+        self.bill_date_var.set(bill_date)
+
+        # Clear existing data (the shared expected-rate cache invalidates itself on rate/markup changes)
+        self.bill_model = bill_math.BillModel([], [])
+        self.bill_grid.load()
         self.total_bill_amount_var.set("Total Bill: ₹0.00")
 
-        # 1. Fetch Items
-        items = fetch_items_for_supplier(vendor)
+        # 1. Fetch items, rates and any saved entries in one round-trip
+        context = fetch_bill_context(bill_date, vendor)
+        items = context['items']
         
         if not items:
             messagebox.showwarning("No Markups", f"No markup rules found for vendor '{vendor}'. Cannot enter bill.")
             return
 
-        # 2. Populate Grid and Calculate Initial Expected Rates
-        for item in items:
-            expected_rate = self._fetch_expected_rate(bill_date, vendor, item)
-            self.expected_rates[item] = expected_rate
-            
-            # Initial row values (Net_Q, Exp_Amt, Ven_Amt, Var_Amt are 0.00)
-            values = (item, 0.0, 0.0, 0.0, f"{expected_rate:,.2f}", 0.0, 0.0, 0.0, 0.0, 'N/A')
-            self.bill_tree.insert('', tk.END, iid=item, values=values)
-            
-            if expected_rate == 0.0:
-                 self.bill_tree.item(item, tags=('no_rate',))
-                 self.bill_tree.set(item, 'Status', 'No Rate Data')
-            else:
-                 self.bill_tree.item(item, tags=('okay',))
-                 self.bill_tree.set(item, 'Status', 'Okay')
+        # 2. Build the Bill Rows, pre-filling a previously saved bill (stored Qty is the net quantity)
+        existing = context['existing']
+        self.bill_model = bill_math.BillModel(
+            items,
+            [context['expected_rates'][item] for item in items],
+            qty_recv=[existing[item][0] if item in existing else 0.0 for item in items],
+            vendor_rate=[existing[item][1] if item in existing else 0.0 for item in items],
+        )
+        self._update_total_bill()
 
+        # 3. Show the first page of rows; the rest are fetched while scrolling
+        self.bill_grid.load()
 
         # Configure tags for visual feedback
         self.bill_tree.tag_configure('okay', foreground='black')
@@ -218,9 +225,9 @@ class BillEntryManager:
         column_index = int(column.replace('#', '')) - 1
         
         # Only Qty Received (1), Qty Damaged (2), and Vendor Rate (5) are editable
-        editable_cols = [1, 2, 5]
+        input_fields = {1: 'qty_recv', 2: 'qty_dmg', 5: 'vendor_rate'}
         
-        if column_index in editable_cols:
+        if column_index in input_fields:
             x, y, width, height = self.bill_tree.bbox(item_id, column)
             current_value = self.bill_tree.item(item_id, 'values')[column_index]
             
@@ -243,178 +250,91 @@ class BillEntryManager:
                     entry.destroy()
                     return
 
-                current_values = list(self.bill_tree.item(item_id, 'values'))
-                current_values[column_index] = numeric_value
-                
-                # Update the treeview with the new value
-                self.bill_tree.item(item_id, values=current_values)
                 entry.destroy()
                 
-                # Recalculate the entire row
-                self._recalculate_row(item_id)
+                # Recalculate the row and move the totals by its change
+                self.bill_model.set_input(item_id, input_fields[column_index], numeric_value)
+                self._render_row(item_id)
             
             entry.bind('<Return>', save_edit)
             entry.bind('<FocusOut>', save_edit) 
 
-    def _recalculate_row(self, item_name):
-        """Performs all calculations for a single row based on user input."""
-        current_values = list(self.bill_tree.item(item_name, 'values'))
-        
-        # Columns indices: 0:Item, 1:Q_Rec, 2:Q_Dmg, 3:Net_Q, 4:E_Rate, 5:V_Rate, 6:E_Amt, 7:V_Amt, 8:Var_Amt, 9:Status
-        
-        # 1. Parse inputs
-        try:
-            q_recv = float(current_values[1])
-            q_dmg = float(current_values[2])
-            v_rate = float(current_values[5])
-            e_rate_display = current_values[4].replace(',', '') # Remove formatting for calculation
-            e_rate = float(e_rate_display)
-        except ValueError:
-            # Should not happen if input validation is correct, but handles initial 'N/A' or bad data
-            self.bill_tree.set(item_name, 'Status', 'Input Error')
-            return
+    def _bill_grid_row(self, i):
+        """Row i of the bill grid as (iid, values, tags), iid = item name."""
+        return self.bill_model.items[i], self.bill_model.display_values(i), (self.bill_model.tag(i),)
 
-        # 2. Calculations
-        net_qty = max(0.0, q_recv - q_dmg)
-        exp_amount = round(net_qty * e_rate, 2)
-        vendor_amount = round(net_qty * v_rate, 2)
-        variance_amount = round(vendor_amount - exp_amount, 2)
-        
-        # 3. Status Determination
-        status = 'N/A'
-        tags = ('okay',)
-        
-        # Only calculate status if there is a positive net quantity
-        if net_qty > 0.0 and e_rate > 0.0:
-            variance_pct = (variance_amount / exp_amount) * 100 if exp_amount else 0.0
-            
-            if variance_pct > 5.0:
-                status = 'HIGH (+)'
-                tags = ('high_var',)
-            elif variance_pct < -5.0:
-                status = 'LOW (-)'
-                tags = ('low_var',)
-            elif variance_amount != 0.0:
-                status = 'Variance'
-            else:
-                status = 'Okay'
-        elif e_rate == 0.0:
-            status = 'No Rate Data'
-            tags = ('no_rate',)
-            
-        # 4. Update row values and tags
-        current_values[3] = f"{net_qty:,.2f}"
-        current_values[6] = f"{exp_amount:,.2f}"
-        current_values[7] = f"{vendor_amount:,.2f}"
-        current_values[8] = f"{variance_amount:,.2f}"
-        current_values[9] = status
-        
-        self.bill_tree.item(item_name, values=current_values, tags=tags)
-        
-        # 5. Update total bill amount
+    def _render_row(self, item_name):
+        """Redraws one row from the model (if it is in the tree) and the total."""
+        _, values, tags = self._bill_grid_row(self.bill_model.index(item_name))
+        self.bill_grid.update_row(item_name, values=values, tags=tags)
         self._update_total_bill()
 
     def _update_total_bill(self):
-        """Sums up the Vendor Amount (column 7) for all rows."""
-        total = 0.0
-        for item_id in self.bill_tree.get_children():
-            values = self.bill_tree.item(item_id, 'values')
-            if len(values) > 7:
-                try:
-                    # Column 7 (Vendor Amount) is stored as a formatted string, remove comma for calculation
-                    v_amt_str = str(values[7]).replace(',', '') 
-                    total += float(v_amt_str)
-                except ValueError:
-                    continue
-        
-        self.total_bill_amount_var.set(f"Total Bill: ₹{total:,.2f}")
+        """Shows the model's running Vendor Amount total."""
+        self.total_bill_amount_var.set(f"Total Bill: ₹{self.bill_model.total_vendor_amount:,.2f}")
 
 
     def _save_bill(self):
         """Saves all entries with Net Qty > 0 to BillEntries and updates the VendorLedger."""
         vendor = self.bill_vendor_var.get()
-        bill_date = self.bill_date_var.get()
-        total_bill_amount = 0.0
-        entries_to_save = []
         
         if not vendor:
             messagebox.showwarning("Warning", "Please select a vendor.")
             return
 
+        try:
+            bill_date = date_key(self.bill_date_var.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid Date", str(e))
+            return
+
         if not messagebox.askyesno("Confirm Save", f"Confirm saving bill for {vendor} on {bill_date}?"):
             return
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        # Check for existing bill entries for this vendor/date combination
+        overwrite = query_one("SELECT COUNT(*) FROM BillEntries WHERE SupplierName = ? AND Date = ?", (vendor, bill_date))[0] > 0
+        if overwrite:
+             if not messagebox.askyesno("Overwrite Warning", 
+                                        f"Bill entries already exist for {vendor} on {bill_date}. Do you want to **overwrite** them?"):
+                 return
+
+        # 1. Prepare Entries: rows with Net Qty > 0, read straight from the model
+        entries_to_save = [(bill_date, vendor, *entry) for entry in self.bill_model.entries()]
+        total_bill_amount = self.bill_model.total_vendor_amount
+
+        if not entries_to_save:
+            messagebox.showwarning("Warning", "No entries with positive net quantity to save.")
+            return
 
         try:
-            # Check for existing bill entries for this vendor/date combination
-            cursor.execute("SELECT COUNT(*) FROM BillEntries WHERE SupplierName = ? AND Date = ?", (vendor, bill_date))
-            if cursor.fetchone()[0] > 0:
-                 if not messagebox.askyesno("Overwrite Warning", 
-                                            f"Bill entries already exist for {vendor} on {bill_date}. Do you want to **overwrite** them?"):
-                     conn.close()
-                     return
-                 
-                 # Delete existing entries first
-                 cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ? AND Date = ?", (vendor, bill_date))
-                 # Also remove the previous bill entry from the ledger to prevent double-billing
-                 cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ? AND Date = ? AND TransactionType = 'Bill'", (vendor, bill_date))
-
-
-            # 1. Prepare and Validate Entries
-            for item_id in self.bill_tree.get_children():
-                values = self.bill_tree.item(item_id, 'values')
-                
-                # Values: 0:Item, 1:Q_Rec, 2:Q_Dmg, 3:Net_Q, 4:E_Rate, 5:V_Rate, 6:E_Amt, 7:V_Amt, 8:Var_Amt, 9:Status
-                
-                # Parse all calculated/input fields
-                try:
-                    item_name = str(values[0])
-                    net_qty = float(str(values[3]).replace(',', ''))
-                    e_rate = float(str(values[4]).replace(',', ''))
-                    v_rate = float(values[5])
-                    variance = float(str(values[8]).replace(',', ''))
-                    status = str(values[9])
-                except (ValueError, IndexError):
-                    messagebox.showerror("Save Error", f"Data error in row for {values[0]}. Please check inputs.")
-                    conn.rollback()
-                    return
+            with transaction() as conn:
+                cursor = conn.cursor()
+
+                if overwrite:
+                    # Delete existing entries first
+                    cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ? AND Date = ?", (vendor, bill_date))
+                    # Also remove the previous bill entry from the ledger to prevent double-billing
+                    cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ? AND Date = ? AND TransactionType = 'Bill'", (vendor, bill_date))
+
+                # 2. Insert into BillEntries
+                bill_entry_query = """
+                    INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """
+                cursor.executemany(bill_entry_query, entries_to_save)
+
+                # 3. Insert/Update VendorLedger (Bill is a positive amount)
+                ledger_entry_query = """
+                    INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+                    VALUES (?, ?, ?, ?, ?)
+                """
+                cursor.execute(ledger_entry_query, (
+                    bill_date, vendor, 'Bill', total_bill_amount, f"Total Bill Amount for {bill_date}"
+                ))
 
-                if net_qty > 0.0:
-                    entries_to_save.append((
-                        bill_date, vendor, item_name, net_qty, v_rate, e_rate, variance, status
-                    ))
-                    total_bill_amount += round(net_qty * v_rate, 2) # Summing up the Vendor Amount
-
-            if not entries_to_save:
-                messagebox.showwarning("Warning", "No entries with positive net quantity to save.")
-                conn.close()
-                return
-
-            # 2. Insert into BillEntries
-            bill_entry_query = """
-                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            cursor.executemany(bill_entry_query, entries_to_save)
-
-            # 3. Insert/Update VendorLedger (Bill is a positive amount)
-            ledger_entry_query = """
-                INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
-                VALUES (?, ?, ?, ?, ?)
-            """
-            cursor.execute(ledger_entry_query, (
-                bill_date, vendor, 'Bill', total_bill_amount, f"Total Bill Amount for {bill_date}"
-            ))
-
-            conn.commit()
             messagebox.showinfo("Success", f"Bill entries for {vendor} on {bill_date} saved successfully.\nTotal Bill: ₹{total_bill_amount:,.2f}")
             self._load_bill_grid() # Reload the grid/reset entries
-            self.update_app_data_callback() # Notify main app to update ledger/due balance views
+            self.events.publish(events.BILL_SAVED, vendor, bill_date) # Ledger/due balance views refresh
 
         except Exception as e:
             messagebox.showerror("Database Error", f"An error occurred while saving the bill: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
\ No newline at end of file
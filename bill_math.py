@@ -0,0 +1,167 @@
+import numpy as np
+
+# --- Bill Row Math ---
+# The one place Net Qty, amounts, Variance and Status are computed. Used by the Streamlit
+# bill grid, the Tkinter bill grid and the bulk recalculation of saved BillEntries.
+
+# A row is HIGH/LOW once its variance exceeds this share of the expected amount.
+# Callers can pass threshold_pct to override it per call.
+VARIANCE_THRESHOLD_PCT = 5.0
+
+STATUS_HIGH = 'HIGH (+)'
+STATUS_LOW = 'LOW (-)'
+STATUS_VARIANCE = 'Variance'
+STATUS_OKAY = 'Okay'
+STATUS_NO_RATE = 'No Rate Data'
+STATUS_NO_QTY = 'N/A'
+
+# Treeview tag per status in the Tkinter grid (anything else is 'okay')
+STATUS_TAGS = {STATUS_HIGH: 'high_var', STATUS_LOW: 'low_var', STATUS_NO_RATE: 'no_rate'}
+
+def round2(values):
+    """
+    Rounds to 2 decimals exactly like the builtin round().
+    np.round scales by 100 first, which can flip near-.5 cases, so those few fall back to round().
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(float(v), 2) for v in values[near_tie]]
+    return rounded
+
+def classify_variance(net_qty, expected_rate, exp_amount, variance, threshold_pct=None):
+    """
+    Status labels for whole arrays at once.
+    Rows with a quantity and a rate are graded by variance %; otherwise a missing
+    rate wins over a missing quantity.
+    """
+    if threshold_pct is None:
+        threshold_pct = VARIANCE_THRESHOLD_PCT
+    var_pct = np.divide(variance, exp_amount, out=np.zeros_like(variance), where=exp_amount != 0) * 100
+    priced = (net_qty > 0) & (expected_rate > 0)
+    return np.select(
+        [priced & (var_pct > threshold_pct),
+         priced & (var_pct < -threshold_pct),
+         priced & (variance != 0.0),
+         priced,
+         expected_rate == 0.0],
+        [STATUS_HIGH, STATUS_LOW, STATUS_VARIANCE, STATUS_OKAY, STATUS_NO_RATE],
+        default=STATUS_NO_QTY
+    )
+
+def compute_bill_rows(qty_recv, qty_dmg, expected_rate, vendor_rate, threshold_pct=None):
+    """
+    Vectorized bill grid math. All inputs are equal-length arrays (or scalars).
+    Returns a dict of arrays: net_qty, exp_amount, vendor_amount, variance, status.
+    """
+    qty_recv = np.atleast_1d(np.asarray(qty_recv, dtype=float))
+    qty_dmg = np.atleast_1d(np.asarray(qty_dmg, dtype=float))
+    expected_rate = np.atleast_1d(np.asarray(expected_rate, dtype=float))
+    vendor_rate = np.atleast_1d(np.asarray(vendor_rate, dtype=float))
+
+    net_qty = np.maximum(qty_recv - qty_dmg, 0.0)
+    exp_amount = round2(net_qty * expected_rate)
+    vendor_amount = round2(net_qty * vendor_rate)
+    variance = round2(vendor_amount - exp_amount)
+    status = classify_variance(net_qty, expected_rate, exp_amount, variance, threshold_pct)
+
+    return {
+        'net_qty': net_qty,
+        'exp_amount': exp_amount,
+        'vendor_amount': vendor_amount,
+        'variance': variance,
+        'status': status,
+    }
+
+# --- Bill Row Model ---
+# Typed rows of one vendor/date bill, the Tkinter grid's source of truth (the Treeview only
+# renders it). One float64 array per column, rows addressed by item name. An edit recomputes
+# its own row with compute_bill_rows() and moves the totals by that row's change, so it costs
+# the same however long the bill is. Totals are kept in paise (amounts are already rounded
+# to 2 decimals), so the running deltas never drift from a fresh sum.
+
+BILL_INPUT_FIELDS = ('qty_recv', 'qty_dmg', 'vendor_rate')
+BILL_AMOUNT_FIELDS = ('exp_amount', 'vendor_amount', 'variance')
+
+def _paise(amount):
+    return int(round(float(amount) * 100))
+
+class BillModel:
+    """Rows of one bill. Inputs change via set_input(); everything else is derived."""
+
+    __slots__ = ('items', '_index', 'qty_recv', 'qty_dmg', 'expected_rate', 'vendor_rate',
+                 'net_qty', 'exp_amount', 'vendor_amount', 'variance', 'status', '_totals')
+
+    def __init__(self, items, expected_rates, qty_recv=None, vendor_rate=None):
+        n = len(items)
+        self.items = list(items)
+        self._index = {item: i for i, item in enumerate(self.items)}
+        self.expected_rate = np.array(expected_rates, dtype=float)
+        self.qty_recv = np.zeros(n) if qty_recv is None else np.array(qty_recv, dtype=float)
+        self.qty_dmg = np.zeros(n)
+        self.vendor_rate = np.zeros(n) if vendor_rate is None else np.array(vendor_rate, dtype=float)
+
+        rows = compute_bill_rows(self.qty_recv, self.qty_dmg, self.expected_rate, self.vendor_rate)
+        self.net_qty = rows['net_qty']
+        self.exp_amount = rows['exp_amount']
+        self.vendor_amount = rows['vendor_amount']
+        self.variance = rows['variance']
+        self.status = rows['status'].astype(object)
+        self._totals = {field: sum(_paise(v) for v in getattr(self, field)) for field in BILL_AMOUNT_FIELDS}
+
+    def __len__(self):
+        return len(self.items)
+
+    def index(self, item):
+        return self._index[item]
+
+    def set_input(self, item, field, value):
+        """Sets qty_recv, qty_dmg or vendor_rate of one row and recomputes that row. Returns its index."""
+        if field not in BILL_INPUT_FIELDS:
+            raise ValueError(f"Not an input field: {field}")
+        i = self._index[item]
+        getattr(self, field)[i] = value
+
+        row = compute_bill_rows(self.qty_recv[i], self.qty_dmg[i], self.expected_rate[i], self.vendor_rate[i])
+        self.net_qty[i] = row['net_qty'][0]
+        for name in BILL_AMOUNT_FIELDS:
+            column = getattr(self, name)
+            self._totals[name] += _paise(row[name][0]) - _paise(column[i])
+            column[i] = row[name][0]
+        self.status[i] = str(row['status'][0])
+        return i
+
+    # --- Totals ---
+
+    @property
+    def total_exp_amount(self):
+        return self._totals['exp_amount'] / 100
+
+    @property
+    def total_vendor_amount(self):
+        return self._totals['vendor_amount'] / 100
+
+    @property
+    def total_variance(self):
+        return self._totals['variance'] / 100
+
+    # --- Output ---
+
+    def display_values(self, i):
+        """Treeview values of row i: Item, Qty Recv., Qty Dmg., Net Qty, Exp. Rate, Vendor Rate, amounts, Status."""
+        return (self.items[i], float(self.qty_recv[i]), float(self.qty_dmg[i]), f"{self.net_qty[i]:,.2f}",
+                f"{self.expected_rate[i]:,.2f}", float(self.vendor_rate[i]), f"{self.exp_amount[i]:,.2f}",
+                f"{self.vendor_amount[i]:,.2f}", f"{self.variance[i]:,.2f}", self.status[i])
+
+    def tag(self, i):
+        return STATUS_TAGS.get(self.status[i], 'okay')
+
+    def entries(self):
+        """(ItemName, Qty, VendorRate, ExpectedRate, Variance, Status) of rows with a positive net quantity."""
+        return [
+            (self.items[i], float(self.net_qty[i]), float(self.vendor_rate[i]), float(self.expected_rate[i]),
+             float(self.variance[i]), self.status[i])
+            for i in np.flatnonzero(self.net_qty > 0)
+        ]
@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, Toplevel
 from datetime import datetime
-import sqlite3
 import pandas as pd
 import numpy as np
 import tkinter as tk
@@ -10,6 +9,8 @@ import tkinter as tk
 
 # Import all modules
 import chicken_db
+import forecasting
+import events
 from vendor_management import VendorManager
 from bill_entry import BillEntryManager # NEW IMPORT
 
@@ -23,7 +24,16 @@ class ChickenTrackerApp(tk.Tk):
         # Initialize Database and Data
         chicken_db.initialize_db()
         self.suppliers, self.markup_map = chicken_db.fetch_suppliers_and_items()
-        self.markup_rules_cache = {} # Cache for quick markup lookups
+        
+        # Tabs publish data changes here and refresh themselves from it (see events.py).
+        # The app subscribes first, so self.suppliers is current when the tabs' handlers run
+        self.events = events.EventBus(self)
+        self.events.subscribe(events.SUPPLIERS_CHANGED, self._update_app_data)
+        self.events.subscribe(events.MARKUPS_CHANGED, self._update_app_data)
+        # Changes made outside this process (e.g. the Streamlit app) publish no events; a tab
+        # is refreshed when it is selected if the DataVersion generation moved since its last
+        # refresh. Key: tab index -> generation
+        self._tab_generations = {}
         
         # Styling
         self._setup_style()
@@ -44,26 +54,9 @@ class ChickenTrackerApp(tk.Tk):
         style.configure("Treeview.Heading", font=('Arial', 10, 'bold'))
         style.configure("Treeview", font=('Arial', 9))
 
-    def _update_app_data(self, new_suppliers=None):
-        """
-        Refreshes supplier and item data across the application. 
-        Called after CRUD operations in VendorManager.
-        """
+    def _update_app_data(self, payloads):
+        """Reloads the supplier list and item map shared by the tabs (suppliers/markups changed)."""
         self.suppliers, self.markup_map = chicken_db.fetch_suppliers_and_items()
-        self.markup_rules_cache = {} # Clear cache on data update
-        
-        # Notify other managers to update their comboboxes/lists
-        # This assumes all managers have a 'suppliers' list or similar to refresh
-        if hasattr(self, 'vendor_manager') and not getattr(self, "_in_update", False):
-            self._in_update = True
-            self.vendor_manager.load_vendor_list()
-            self._in_update = False
-            # Re-runs fetch_suppliers_and_items internally
-            
-        # Update Bill Entry Manager's combobox
-        if hasattr(self, 'bill_entry_manager'):
-            self.bill_entry_manager.suppliers = self.suppliers
-            self.bill_entry_manager.bill_vendor_combo['values'] = self.suppliers
             
     def _setup_main_ui(self):
         # Create a main notebook (tabs)
@@ -78,12 +71,12 @@ class ChickenTrackerApp(tk.Tk):
         # --- Tab 2: Daily Bill Entry (NEW) ---
         self.bill_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.bill_frame, text="Daily Bill Entry")
-        self.bill_entry_manager = BillEntryManager(self, self.bill_frame, self.suppliers, self._update_app_data)
+        self.bill_entry_manager = BillEntryManager(self, self.bill_frame, self.suppliers, self.events)
 
         # --- Tab 3: Vendor Management ---
         self.vendor_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.vendor_frame, text="Vendor Management")
-        self.vendor_manager = VendorManager(self, self.vendor_frame, self.suppliers, self._update_app_data)
+        self.vendor_manager = VendorManager(self, self.vendor_frame, self.suppliers, self.events)
         
         # --- Tab 4: Dashboard/Reports ---
         self.dashboard_frame = ttk.Frame(self.notebook, padding="10")
@@ -97,15 +90,29 @@ class ChickenTrackerApp(tk.Tk):
         """Handle actions when a tab is selected."""
         selected_tab = self.notebook.index(self.notebook.select())
         
-        # When Bill Entry tab is selected, refresh its vendor list and load grid if necessary
-        if selected_tab == 1:
+        # Tabs keep themselves current through self.events; reload one only if the database
+        # changed since it was last shown (one cheap single-row read)
+        generation = chicken_db.get_data_generation()
+        stale = self._tab_generations.get(selected_tab) != generation
+        self._tab_generations[selected_tab] = generation
+        if stale:
+             self._update_app_data(())
+        
+        if selected_tab == 0:
+             if stale:
+                 self._load_daily_rates()
+        
+        elif selected_tab == 1:
+             if stale:
+                 self.bill_entry_manager._on_suppliers_changed(())
              if self.suppliers and not self.bill_entry_manager.bill_vendor_var.get():
                  self.bill_entry_manager.bill_vendor_var.set(self.suppliers[0])
-             self.bill_entry_manager._load_bill_grid()
+             if stale or not len(self.bill_entry_manager.bill_model):
+                 self.bill_entry_manager._load_bill_grid()
              
-        # When Vendor Management tab is selected, ensure list is refreshed
         elif selected_tab == 2:
-             self.vendor_manager.load_vendor_list()
+             if stale:
+                 self.vendor_manager.refresh()
              
         # Placeholder for Dashboard refresh if needed later
         elif selected_tab == 3:
@@ -186,12 +193,8 @@ class ChickenTrackerApp(tk.Tk):
     def _load_daily_rates(self):
         """Loads rates from the DB for the selected date."""
         date = self.rate_date_var.get()
-        conn = sqlite3.connect(chicken_db.DB_NAME)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (date,))
-            data = cursor.fetchone()
+            data = chicken_db.query_one("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (chicken_db.date_key(date),))
             
             if data:
                 self.tandoor_var.set(data[0])
@@ -203,13 +206,15 @@ class ChickenTrackerApp(tk.Tk):
                 self.egg_var.set(0.0)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load rates: {e}")
-        finally:
-            conn.close()
 
 
     def _save_daily_rates(self):
         """Saves or updates the daily rates in the RawData table."""
-        date = self.rate_date_var.get()
+        try:
+            date = chicken_db.date_key(self.rate_date_var.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid Date", str(e))
+            return
         tandoor = self.tandoor_var.get()
         boiler = self.boiler_var.get()
         egg = self.egg_var.get()
@@ -218,29 +223,20 @@ class ChickenTrackerApp(tk.Tk):
             if not messagebox.askyesno("Confirm Zero Entry", "Rates are zero or negative. Do you still want to save?"):
                 return
 
-        conn = sqlite3.connect(chicken_db.DB_NAME)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("""
-                INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
-                ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
-            """, (date, tandoor, boiler, egg))
-            conn.commit()
+            with chicken_db.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
+                """, (date, tandoor, boiler, egg))
+            forecasting.record_rates(date, tandoor, boiler, egg)
             messagebox.showinfo("Success", f"Daily rates for {date} saved/updated successfully.")
             
-            # Clear Rate Cache (Global scope for all calculations)
-            global RATE_CACHE
-            RATE_CACHE = {} 
-            
-            # Notify Bill Entry Manager to reload if it's visible and date matches
-            if hasattr(self, 'bill_entry_manager') and self.bill_entry_manager.bill_date_var.get() == date:
-                 self.bill_entry_manager._load_bill_grid()
+            # Cached expected rates of this date are dropped via the RateChanges log (see chicken_db)
+            self.events.publish(events.RATES_CHANGED, date)
                  
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save daily rates: {e}")
-        finally:
-            conn.close()
 
 if __name__ == '__main__':
     app = ChickenTrackerApp()
@@ -1,17 +1,301 @@
+import os
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+import atexit
+import json
+from collections import deque
+from contextlib import closing, contextmanager
+from datetime import date as date_cls, datetime, timedelta
 import pandas as pd
 import numpy as np
+from query_cache import QueryCache, ExpectedRateCache
+from bill_math import round2, compute_bill_rows
 
 DB_NAME = 'chicken_tracker.db'
 
+# --- Connection Manager ---
+# Connections are opened once per thread and reused for every helper call, instead of
+# a fresh sqlite3.connect() per query. Each one is tuned on open (see _configure_connection).
+
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+
+_thread_local = threading.local()
+_open_connections = {} # Key: thread ident -> (thread, connection)
+_registry_lock = threading.Lock()
+
+def _configure_connection(conn):
+    """Applies the per-connection PRAGMAs. Runs once when the connection is opened."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+def _prune_dead_connections():
+    """Closes connections owned by threads that have exited (e.g. finished Streamlit script runs)."""
+    with _registry_lock:
+        dead = [ident for ident, (thread, _) in _open_connections.items() if not thread.is_alive()]
+        for ident in dead:
+            _, conn = _open_connections.pop(ident)
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
 def get_db_connection():
-    return sqlite3.connect(DB_NAME)
+    """
+    Returns the calling thread's shared, pre-tuned connection.
+    Callers must NOT close it; use transaction() for writes and query_one()/query_all()
+    (or read_rows()) for reads outside one. The connection lives as long as its thread, and
+    in WAL mode a cursor left mid-result keeps its read snapshot open: later reads on the
+    connection would not see commits from other processes.
+    """
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None and _thread_local.db_name == DB_NAME:
+        return conn
+
+    if conn is not None: # DB_NAME was repointed at another file, drop the stale handle
+        close_db_connection()
+
+    _prune_dead_connections()
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                           factory=_TracedConnection if PROFILE_ENABLED else sqlite3.Connection)
+    if PROFILE_ENABLED:
+        conn.set_trace_callback(_trace_statement)
+    _configure_connection(conn)
+
+    _thread_local.conn = conn
+    _thread_local.db_name = DB_NAME
+    with _registry_lock:
+        _open_connections[threading.get_ident()] = (threading.current_thread(), conn)
+    return conn
+
+def query_one(sql, params=()):
+    """First row of a read (or None), with the cursor closed so it holds no snapshot."""
+    with closing(get_db_connection().execute(sql, params)) as cursor:
+        return cursor.fetchone()
+
+def query_all(sql, params=()):
+    """All rows of a read, uncached (see read_rows() for the cached variant)."""
+    with closing(get_db_connection().execute(sql, params)) as cursor:
+        return cursor.fetchall()
+
+@contextmanager
+def transaction(bump_generation=True):
+    """
+    Runs the enclosed block as one write transaction on the thread's connection.
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent savers wait on
+    busy_timeout instead of failing with "database is locked" halfway through.
+    Nested use joins the outer transaction. A block that changed any rows also bumps
+    the DataVersion generation, which invalidates the query cache in every process;
+    bump_generation=False skips that for bookkeeping writes no cached read selects.
+    """
+    conn = get_db_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    changes_before = conn.total_changes
+    try:
+        yield conn
+        if bump_generation and conn.total_changes != changes_before:
+            _bump_data_generation(conn)
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def close_db_connection():
+    """Closes the calling thread's connection (it is reopened on next use)."""
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is None:
+        return
+    with _registry_lock:
+        _open_connections.pop(threading.get_ident(), None)
+    _thread_local.conn = None
+    conn.close()
+
+@atexit.register
+def close_all_connections():
+    """Closes every pooled connection. Registered to run at interpreter exit."""
+    with _registry_lock:
+        entries = list(_open_connections.values())
+        _open_connections.clear()
+    for _, conn in entries:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _thread_local.conn = None
+
+# --- Instrumentation ---
+# Off unless CHICKEN_TRACKER_PROFILE is set when the process starts. When on, connections
+# are opened with _TracedConnection: every statement is timed (wall clock around execute
+# and the fetches) and sqlite3's trace callback counts the statements it really ran,
+# including trigger bodies. Records are kept per thread, i.e. per Streamlit script run.
+
+PROFILE_ENV_VAR = 'CHICKEN_TRACKER_PROFILE'
+PROFILE_ENABLED = os.environ.get(PROFILE_ENV_VAR, '') not in ('', '0')
+PROFILE_MAX_RECORDS = 5000
+
+_profile_local = threading.local()
+
+def _profile_state():
+    state = getattr(_profile_local, 'state', None)
+    if state is None:
+        state = _profile_local.state = {'queries': deque(maxlen=PROFILE_MAX_RECORDS), 'renders': [], 'active': None}
+    return state
+
+def _trace_statement(statement):
+    record = _profile_state()['active']
+    if record is not None:
+        record['statements'] += 1
+
+class _TracedCursor(sqlite3.Cursor):
+    """Cursor that records statement text, parameter count (batch size for executemany), duration and rows."""
+
+    def _timed(self, sql, params, call):
+        state = _profile_state()
+        record = {'sql': sql, 'params': params, 'ms': 0.0, 'rows': 0, 'statements': 0}
+        state['queries'].append(record)
+        self._record = record
+        state['active'] = record
+        started = time.perf_counter()
+        try:
+            return call()
+        finally:
+            record['ms'] += (time.perf_counter() - started) * 1000.0
+            state['active'] = None
+            if self.rowcount > 0: # INSERT/UPDATE/DELETE; SELECT rows are counted on fetch
+                record['rows'] = self.rowcount
+
+    def _fetched(self, started, rows):
+        record = getattr(self, '_record', None)
+        if record is not None:
+            record['ms'] += (time.perf_counter() - started) * 1000.0
+            record['rows'] += rows
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sql, len(parameters), lambda: super(_TracedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        batch = list(seq_of_parameters)
+        return self._timed(sql, len(batch), lambda: super(_TracedCursor, self).executemany(sql, batch))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+class _TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def reset_profile():
+    """Starts a fresh profile for the calling thread (call at the top of a rerun)."""
+    _profile_local.state = None
+
+@contextmanager
+def profile_render(name):
+    """Times a block (e.g. one view's render()) and the queries issued inside it."""
+    if not PROFILE_ENABLED:
+        yield
+        return
+    state = _profile_state()
+    first = len(state['queries'])
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        queries = list(state['queries'])[first:]
+        state['renders'].append({
+            'view': name,
+            'ms': (time.perf_counter() - started) * 1000.0,
+            'queries': len(queries),
+            'db_ms': sum(q['ms'] for q in queries),
+        })
+
+def profile_renders():
+    return list(_profile_state()['renders'])
+
+def profile_top_queries(limit=15):
+    """Queries of the calling thread grouped by statement text, slowest total first."""
+    grouped = {}
+    for record in _profile_state()['queries']:
+        sql = " ".join(record['sql'].split())
+        entry = grouped.setdefault(sql, {'sql': sql, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                         'rows': 0, 'params': record['params'], 'statements': 0})
+        entry['calls'] += 1
+        entry['total_ms'] += record['ms']
+        entry['max_ms'] = max(entry['max_ms'], record['ms'])
+        entry['rows'] += record['rows']
+        entry['statements'] += record['statements']
+    return sorted(grouped.values(), key=lambda e: e['total_ms'], reverse=True)[:limit]
+
+# --- Dates ---
+# Every Date column holds canonical 'YYYY-MM-DD' text, enforced by CHECK constraints
+# (migration 5). date_key() is the single adapter every write site passes dates through,
+# whatever they arrive as: date objects from st.date_input, Tkinter StringVar text, etc.
+
+# Accepted text layouts besides ISO, tried in order (day-first).
+# Covers "Paper Rate.csv" (29/9/2024), "Bill.csv" (29/09/24) and ISO dates.
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y', '%d-%m-%y']
+
+def date_key(value):
+    """Returns value as stored 'YYYY-MM-DD' text. Raises ValueError if it is not a date."""
+    if isinstance(value, datetime): # also pd.Timestamp
+        return value.date().isoformat()
+    if isinstance(value, date_cls):
+        return value.isoformat()
+
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+def _date_key_or_none(value):
+    try:
+        return None if value is None else date_key(value)
+    except ValueError:
+        return None
 
 def initialize_db():
-    """Ensures all necessary tables exist in the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    """Brings the database schema up to date (see MIGRATIONS). Cheap when already current."""
+    migrate()
+
+def _create_tables(cursor):
     
     # 1. Suppliers Table (Renamed from Vendors to match vendor_management.py)
     cursor.execute("""
@@ -83,59 +367,690 @@ def initialize_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+def _create_vendor_balance(cursor):
+    # 6. VendorBalance Table (per-vendor running totals, maintained by triggers)
+    # NetDue = TotalBilled (BillEntries) + LedgerTotal (all VendorLedger rows), the same
+    # figure the ledger views show. TotalPaid is the positive sum of Payment rows.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS VendorBalance (
+            SupplierName TEXT PRIMARY KEY,
+            TotalBilled REAL NOT NULL DEFAULT 0,
+            TotalPaid REAL NOT NULL DEFAULT 0,
+            LedgerTotal REAL NOT NULL DEFAULT 0,
+            NetDue REAL NOT NULL DEFAULT 0,
+            LastActivityDate TEXT
+        )
+    """)
+    _create_balance_triggers(cursor)
+    rebuild_vendor_balances()
+
+def _create_indexes(cursor):
+    # Shaped after the real queries; the UNIQUE constraints already cover
+    # BillEntries lookups by Date and Markups lookups by SupplierName.
+    # Ledger bill totals: WHERE SupplierName = ? GROUP BY Date, SUM(Qty * VendorRate) -> covering
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bill_entries_supplier_date
+        ON BillEntries (SupplierName, Date, Qty, VendorRate)
+    """)
+    # Ledger listing, bill overwrite deletes and balance triggers -> covering
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vendor_ledger_supplier_date_type
+        ON VendorLedger (SupplierName, Date, TransactionType, Amount)
+    """)
+    cursor.execute("ANALYZE")
+
+def _create_data_version(cursor):
+    # 7. DataVersion (single row, bumped once per committed write transaction; see transaction())
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS DataVersion (
+            ID INTEGER PRIMARY KEY CHECK (ID = 1),
+            Generation INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO DataVersion (ID, Generation) VALUES (1, 0)")
+
+# --- Schema Migrations ---
+# Ordered (version, description, step). PRAGMA user_version records the last applied
+# version, so each step runs exactly once per database. Append new steps; never edit old ones.
+
+# Rebuilt by migration 5 with the Date CHECK (SQLite cannot add a CHECK to an existing table)
+_DATE_CHECKED_TABLES = {
+    'RawData': """
+        CREATE TABLE {name} (
+            Date TEXT PRIMARY KEY CHECK (date(Date) IS Date),
+            TandoorRate REAL NOT NULL,
+            BoilerRate REAL NOT NULL,
+            EggRate REAL NOT NULL
+        )
+    """,
+    'BillEntries': """
+        CREATE TABLE {name} (
+            ID INTEGER PRIMARY KEY,
+            Date TEXT NOT NULL CHECK (date(Date) IS Date),
+            SupplierName TEXT NOT NULL,
+            ItemName TEXT NOT NULL,
+            Qty REAL NOT NULL,
+            VendorRate REAL NOT NULL,
+            ExpectedRate REAL NOT NULL,
+            Variance REAL NOT NULL,
+            Status TEXT NOT NULL,
+            FOREIGN KEY (SupplierName) REFERENCES Suppliers(SupplierName),
+            UNIQUE (Date, SupplierName, ItemName)
+        )
+    """,
+    'VendorLedger': """
+        CREATE TABLE {name} (
+            ID INTEGER PRIMARY KEY,
+            Date TEXT NOT NULL CHECK (date(Date) IS Date),
+            SupplierName TEXT NOT NULL,
+            TransactionType TEXT NOT NULL,
+            Amount REAL NOT NULL,
+            Details TEXT,
+            FOREIGN KEY (SupplierName) REFERENCES Suppliers(SupplierName)
+        )
+    """,
+}
+
+# Unique keys of the dated tables; two spellings of one date (e.g. '5/1/2024' and
+# '2024-01-05') collapse onto the same key when the dates are normalized
+_DATE_KEYS = {
+    'RawData': ('Date',),
+    'BillEntries': ('Date', 'SupplierName', 'ItemName'),
+}
+
+def _collapsed_date_rows(cursor, table):
+    """Rows of table that lose to a newer row with the same key once dates are normalized."""
+    keys = ", ".join("date_key(Date)" if col == 'Date' else col for col in _DATE_KEYS[table])
+    return cursor.execute(f"""
+        SELECT * FROM {table}
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {keys})
+        ORDER BY rowid
+    """).fetchall()
+
+def _merge_collapsed_bills(cursor, groups):
+    """
+    Replaces the 'Bill' ledger rows of each (SupplierName, Date) whose bill entries
+    collapsed with one row for the surviving entries, so the bill is not counted twice.
+    Returns the replaced ledger rows.
+    """
+    replaced = []
+    for supplier, date in sorted(groups):
+        where = "SupplierName = ? AND Date = ? AND TransactionType = 'Bill'"
+        replaced += cursor.execute(f"SELECT * FROM VendorLedger WHERE {where}", (supplier, date)).fetchall()
+        cursor.execute(f"DELETE FROM VendorLedger WHERE {where}", (supplier, date))
+        cursor.execute("""
+            INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+            SELECT ?, ?, 'Bill', SUM(ROUND(Qty * VendorRate, 2)), ?
+            FROM BillEntries WHERE SupplierName = ? AND Date = ?
+            HAVING COUNT(*) > 0
+        """, (date, supplier, f"Total Bill Amount for {date}", supplier, date))
+    return replaced
+
+def _normalize_dates(cursor):
+    """
+    Rewrites every Date as canonical ISO text and rebuilds the dated tables with a CHECK
+    that keeps it that way. Rows whose dates collapse onto the same key keep the newest row;
+    the dropped rows are printed, and the ledger bills of the affected vendor/dates are
+    merged into one bill for the rows kept. Aborts (leaving the database untouched) if
+    any stored date cannot be parsed.
+    """
+    cursor.connection.create_function('date_key', 1, _date_key_or_none, deterministic=True)
+
+    bad = []
+    for table in _DATE_CHECKED_TABLES:
+        rows = cursor.execute(f"SELECT DISTINCT Date FROM {table} WHERE date_key(Date) IS NULL LIMIT 10").fetchall()
+        bad += [f"{table}: {row[0]!r}" for row in rows]
+    if bad:
+        raise ValueError("Cannot migrate dates, fix these values first: " + ", ".join(bad))
+
+    dropped = {table: _collapsed_date_rows(cursor, table) for table in _DATE_KEYS}
+    # Row layout: ID, Date, SupplierName, ...
+    collapsed_bills = {(row[2], date_key(row[1])) for row in dropped['BillEntries']}
+
+    # The balance triggers reference the tables being swapped out; recreated below
+    for name in BALANCE_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    for table, ddl in _DATE_CHECKED_TABLES.items():
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        select = ", ".join("date_key(Date)" if col == 'Date' else col for col in columns)
+        cursor.execute(ddl.format(name=f"{table}_new"))
+        cursor.execute(f"INSERT OR REPLACE INTO {table}_new ({', '.join(columns)}) SELECT {select} FROM {table} ORDER BY rowid")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    replaced_bills = _merge_collapsed_bills(cursor, collapsed_bills)
+    for table, rows in dropped.items():
+        if rows:
+            print(f"Date migration: dropped {len(rows)} {table} row(s) duplicated by another spelling of their date:")
+            for row in rows:
+                print(f"  {row}")
+    if replaced_bills:
+        print(f"Date migration: merged {len(replaced_bills)} VendorLedger bill row(s) of {len(collapsed_bills)} vendor/date(s):")
+        for row in replaced_bills:
+            print(f"  {row}")
+
+    # Dropping the tables also dropped their indexes
+    _create_balance_triggers(cursor)
+    _create_indexes(cursor)
+    rebuild_vendor_balances()
+
+# Tables that archive.py can export by month (see _create_archive_register)
+ARCHIVED_TABLES = ('RawData', 'BillEntries', 'VendorLedger')
+
+def _archive_stale_on(table, *rows):
+    months = ", ".join(f"substr({row}.Date, 1, 7)" for row in rows)
+    return f"""
+    UPDATE ArchivedMonths SET Stale = 1
+    WHERE TableName = '{table}' AND Month IN ({months}) AND Stale = 0;
+"""
+
+def _create_archive_register(cursor):
+    # 8. ArchivedMonths (one row per month exported to the columnar archive by archive.py)
+    # A write touching an archived month marks it Stale, so readers go back to the live
+    # table for that month until it is exported again.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ArchivedMonths (
+            TableName TEXT NOT NULL,
+            Month TEXT NOT NULL, -- 'YYYY-MM'
+            Rows INTEGER NOT NULL,
+            ArchivedAt TEXT NOT NULL,
+            Stale INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (TableName, Month)
+        )
+    """)
+    for table in ARCHIVED_TABLES:
+        name = f"trg_{table.lower()}_archive_stale"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} BEGIN {_archive_stale_on(table, 'NEW')} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} BEGIN {_archive_stale_on(table, 'OLD')} END")
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE ON {table} "
+            f"BEGIN {_archive_stale_on(table, 'OLD', 'NEW')} END"
+        )
+
+def _create_jobs(cursor):
+    # 9. Jobs (one row per background job, see jobs.py; saved when a job starts and ends)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Jobs (
+            JobID TEXT PRIMARY KEY,
+            Kind TEXT NOT NULL,
+            Label TEXT NOT NULL,
+            Status TEXT NOT NULL,
+            ProgressDone INTEGER NOT NULL DEFAULT 0,
+            ProgressTotal INTEGER,
+            Message TEXT,
+            Result TEXT, -- JSON
+            Error TEXT,
+            CreatedAt TEXT NOT NULL,
+            StartedAt TEXT,
+            FinishedAt TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON Jobs (CreatedAt)")
+
+# Rows kept in RateChanges; a process that fell further behind clears its cache instead
+RATE_CHANGE_LOG_ROWS = 10000
+
+def _create_rate_changes(cursor):
+    # 10. RateChanges (log of what expected rates depend on: a Date whose paper rates changed,
+    # a SupplierName/ItemName whose markup changed, or a SupplierName alone for a vendor that
+    # was deleted or renamed). Filled by triggers, so every writer and every process is seen;
+    # the expected-rate caches replay it to invalidate only the affected entries.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS RateChanges (
+            Seq INTEGER PRIMARY KEY,
+            Date TEXT,
+            SupplierName TEXT,
+            ItemName TEXT
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rate_changes_prune AFTER INSERT ON RateChanges
+        BEGIN DELETE FROM RateChanges WHERE Seq <= NEW.Seq - {RATE_CHANGE_LOG_ROWS}; END
+    """)
+    rates_changed = "OLD.TandoorRate IS NOT NEW.TandoorRate OR OLD.BoilerRate IS NOT NEW.BoilerRate OR OLD.EggRate IS NOT NEW.EggRate"
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS trg_rawdata_rate_change_insert AFTER INSERT ON RawData BEGIN INSERT INTO RateChanges (Date) VALUES (NEW.Date); END")
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS trg_rawdata_rate_change_delete AFTER DELETE ON RawData BEGIN INSERT INTO RateChanges (Date) VALUES (OLD.Date); END")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rawdata_rate_change_update AFTER UPDATE ON RawData
+        WHEN OLD.Date IS NOT NEW.Date OR {rates_changed}
+        BEGIN INSERT INTO RateChanges (Date) SELECT OLD.Date UNION SELECT NEW.Date; END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_markups_rate_change_insert AFTER INSERT ON Markups
+        BEGIN INSERT INTO RateChanges (SupplierName, ItemName) VALUES (NEW.SupplierName, NEW.ItemName); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_markups_rate_change_delete AFTER DELETE ON Markups
+        BEGIN INSERT INTO RateChanges (SupplierName, ItemName) VALUES (OLD.SupplierName, OLD.ItemName); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_markups_rate_change_update AFTER UPDATE ON Markups
+        BEGIN
+            INSERT INTO RateChanges (SupplierName, ItemName)
+            SELECT OLD.SupplierName, OLD.ItemName UNION SELECT NEW.SupplierName, NEW.ItemName;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_suppliers_rate_change_delete AFTER DELETE ON Suppliers
+        BEGIN INSERT INTO RateChanges (SupplierName) VALUES (OLD.SupplierName); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_suppliers_rate_change_rename AFTER UPDATE OF SupplierName ON Suppliers
+        WHEN OLD.SupplierName IS NOT NEW.SupplierName
+        BEGIN INSERT INTO RateChanges (SupplierName) VALUES (OLD.SupplierName); END
+    """)
+
+def _add_job_owner(cursor):
+    # Migration 9: Jobs.Owner ("pid:runner id" of the process running the job) and Jobs.HeartbeatAt,
+    # refreshed while the job is unfinished, so a runner only reclaims jobs of dead processes
+    cursor.execute("ALTER TABLE Jobs ADD COLUMN Owner TEXT")
+    cursor.execute("ALTER TABLE Jobs ADD COLUMN HeartbeatAt TEXT")
+
+MIGRATIONS = [
+    (1, "Base tables", _create_tables),
+    (2, "VendorBalance summary table and triggers", _create_vendor_balance),
+    (3, "Secondary indexes for ledger and bill queries", _create_indexes),
+    (4, "DataVersion write-generation counter", _create_data_version),
+    (5, "Canonical ISO dates enforced by CHECK", _normalize_dates),
+    (6, "ArchivedMonths register for the columnar archive", _create_archive_register),
+    (7, "Jobs table for background job results", _create_jobs),
+    (8, "RateChanges log for expected-rate cache invalidation", _create_rate_changes),
+    (9, "Jobs owner and heartbeat columns", _add_job_owner),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    return get_db_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """Applies pending migrations in order, all in one transaction. Returns the versions applied."""
+    if get_schema_version() >= SCHEMA_VERSION:
+        return []
+
+    applied = []
+    with transaction() as conn:
+        cursor = conn.cursor()
+        # Re-read under the write lock: another process may have migrated meanwhile
+        current = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            applied.append(version)
+    return applied
+
+# --- Query Cache ---
+# Read helpers go through read_rows()/read_frame(). Results are reused until the next
+# committed write anywhere (this process, another Streamlit session or the Tkinter app),
+# detected via the DataVersion generation that every write transaction bumps.
+
+_query_cache = QueryCache(max_entries=256)
+
+def _bump_data_generation(conn):
+    try:
+        conn.execute("UPDATE DataVersion SET Generation = Generation + 1 WHERE ID = 1")
+    except sqlite3.OperationalError:
+        pass # Table not created yet (migrations in progress)
+
+def get_data_generation():
+    """Current write generation of the database (None before migration 4)."""
+    try:
+        row = get_db_connection().execute("SELECT Generation FROM DataVersion WHERE ID = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+def _cached(sql, params, compute):
+    conn = get_db_connection()
+    generation = get_data_generation()
+    if conn.in_transaction or generation is None:
+        # Uncommitted data must never be cached
+        _query_cache.count_bypass()
+        return compute(conn)
+    key = QueryCache.make_key(DB_NAME, sql, params)
+    return _query_cache.get_or_compute(key, generation, lambda: compute(conn))
+
+def read_rows(sql, params=()):
+    """Cached SELECT returning a list of row tuples."""
+    rows = _cached(sql, params, lambda conn: conn.execute(sql, params).fetchall())
+    return list(rows)
+
+def read_frame(sql, params=()):
+    """Cached SELECT returning a DataFrame (a copy, so callers may modify it)."""
+    df = _cached(sql, params, lambda conn: pd.read_sql_query(sql, conn, params=params))
+    return df.copy()
+
+def query_cache_stats():
+    return _query_cache.stats()
+
+def clear_query_cache():
+    _query_cache.clear()
+
+# --- Expected Rate Cache ---
+# Expected rates keyed on (date, supplier, item), shared by everything in the process (the
+# Tkinter managers, all Streamlit sessions) and kept across grid reloads and unrelated
+# writes. Before each lookup the cache replays the RateChanges rows (migration 8) written
+# since its last look, dropping the entries of changed dates, markup rules and vendors.
+
+EXPECTED_RATE_CACHE_SIZE = 4096
+
+_expected_rate_cache = ExpectedRateCache(max_entries=EXPECTED_RATE_CACHE_SIZE)
+_expected_rate_sync_lock = threading.Lock()
+
+def _sync_expected_rate_cache(conn):
+    """Applies new RateChanges rows to the cache. Returns the Seq it is now current to."""
+    cache = _expected_rate_cache
+    with _expected_rate_sync_lock:
+        if cache.db_name != DB_NAME:
+            cache.clear()
+            cache.db_name = DB_NAME
+            cache.last_change = None
+        if cache.last_change is None:
+            cache.last_change = conn.execute("SELECT IFNULL(MAX(Seq), 0) FROM RateChanges").fetchone()[0]
+            return cache.last_change
+
+        rows = conn.execute(
+            "SELECT Seq, Date, SupplierName, ItemName FROM RateChanges WHERE Seq > ? ORDER BY Seq", (cache.last_change,)
+        ).fetchall()
+        if not rows:
+            return cache.last_change
+        if rows[0][0] != cache.last_change + 1:
+            cache.clear() # Older changes were pruned before this process saw them
+        else:
+            cache.invalidate_dates({d for _, d, _, _ in rows if d is not None})
+            items = {}
+            for _, _, supplier, item in rows:
+                if supplier is not None and item is not None:
+                    items.setdefault(supplier, set()).add(item)
+            for supplier, names in items.items():
+                cache.invalidate_items(supplier, names)
+            for supplier in {supplier for _, d, supplier, item in rows if supplier is not None and item is None}:
+                cache.invalidate_vendor(supplier)
+        cache.last_change = rows[-1][0]
+        return cache.last_change
+
+def cached_expected_rates(date, supplier_name, items, compute):
+    """
+    {item: expected rate} for items of supplier_name on date, from the cache where possible.
+    compute(missing_items) returns the rates of the items not cached, in order.
+    Bypassed inside an open write transaction (uncommitted rates must not be cached).
+    """
+    conn = get_db_connection()
+    if conn.in_transaction or get_schema_version() < 8:
+        return dict(zip(items, compute(list(items))))
+
+    day = date_key(date)
+    change = _sync_expected_rate_cache(conn)
+    rates = {item: _expected_rate_cache.get((day, supplier_name, item)) for item in items}
+    missing = [item for item, rate in rates.items() if rate is None]
+    if missing:
+        for item, rate in zip(missing, compute(missing)):
+            rates[item] = rate
+            _expected_rate_cache.put((day, supplier_name, item), rate, change)
+    return rates
+
+def expected_rate_cache_stats():
+    return _expected_rate_cache.stats()
+
+def clear_expected_rate_cache():
+    _expected_rate_cache.clear()
+
+# --- Vendor Balance Summary ---
+
+# Recomputes LastActivityDate for OLD.SupplierName when its latest row goes away
+_LAST_ACTIVITY_REFRESH = """
+    UPDATE VendorBalance SET LastActivityDate = (
+        SELECT MAX(d) FROM (
+            SELECT MAX(Date) AS d FROM BillEntries WHERE SupplierName = OLD.SupplierName
+            UNION ALL
+            SELECT MAX(Date) FROM VendorLedger WHERE SupplierName = OLD.SupplierName
+        )
+    )
+    WHERE SupplierName = OLD.SupplierName AND LastActivityDate = OLD.Date;
+"""
+
+def _bill_balance_add(row):
+    return f"""
+    INSERT INTO VendorBalance (SupplierName, TotalBilled, NetDue, LastActivityDate)
+    VALUES ({row}.SupplierName, {row}.Qty * {row}.VendorRate, {row}.Qty * {row}.VendorRate, {row}.Date)
+    ON CONFLICT(SupplierName) DO UPDATE SET
+        TotalBilled = TotalBilled + excluded.TotalBilled,
+        NetDue = NetDue + excluded.NetDue,
+        LastActivityDate = MAX(IFNULL(LastActivityDate, ''), excluded.LastActivityDate);
+    """
+
+_BILL_BALANCE_REMOVE = """
+    UPDATE VendorBalance SET
+        TotalBilled = TotalBilled - OLD.Qty * OLD.VendorRate,
+        NetDue = NetDue - OLD.Qty * OLD.VendorRate
+    WHERE SupplierName = OLD.SupplierName;
+""" + _LAST_ACTIVITY_REFRESH
+
+def _ledger_balance_add(row):
+    return f"""
+    INSERT INTO VendorBalance (SupplierName, TotalPaid, LedgerTotal, NetDue, LastActivityDate)
+    VALUES ({row}.SupplierName,
+            CASE WHEN {row}.TransactionType = 'Payment' THEN -{row}.Amount ELSE 0 END,
+            {row}.Amount, {row}.Amount, {row}.Date)
+    ON CONFLICT(SupplierName) DO UPDATE SET
+        TotalPaid = TotalPaid + excluded.TotalPaid,
+        LedgerTotal = LedgerTotal + excluded.LedgerTotal,
+        NetDue = NetDue + excluded.NetDue,
+        LastActivityDate = MAX(IFNULL(LastActivityDate, ''), excluded.LastActivityDate);
+    """
+
+_LEDGER_BALANCE_REMOVE = """
+    UPDATE VendorBalance SET
+        TotalPaid = TotalPaid - CASE WHEN OLD.TransactionType = 'Payment' THEN -OLD.Amount ELSE 0 END,
+        LedgerTotal = LedgerTotal - OLD.Amount,
+        NetDue = NetDue - OLD.Amount
+    WHERE SupplierName = OLD.SupplierName;
+""" + _LAST_ACTIVITY_REFRESH
+
+BALANCE_TRIGGERS = {
+    'trg_bill_entries_balance_insert': f"AFTER INSERT ON BillEntries BEGIN {_bill_balance_add('NEW')} END",
+    'trg_bill_entries_balance_delete': f"AFTER DELETE ON BillEntries BEGIN {_BILL_BALANCE_REMOVE} END",
+    'trg_bill_entries_balance_update': (
+        "AFTER UPDATE OF Date, SupplierName, Qty, VendorRate ON BillEntries "
+        f"BEGIN {_BILL_BALANCE_REMOVE} {_bill_balance_add('NEW')} END"
+    ),
+    'trg_vendor_ledger_balance_insert': f"AFTER INSERT ON VendorLedger BEGIN {_ledger_balance_add('NEW')} END",
+    'trg_vendor_ledger_balance_delete': f"AFTER DELETE ON VendorLedger BEGIN {_LEDGER_BALANCE_REMOVE} END",
+    'trg_vendor_ledger_balance_update': (
+        "AFTER UPDATE OF Date, SupplierName, TransactionType, Amount ON VendorLedger "
+        f"BEGIN {_LEDGER_BALANCE_REMOVE} {_ledger_balance_add('NEW')} END"
+    ),
+    'trg_suppliers_balance_delete': (
+        "AFTER DELETE ON Suppliers "
+        "BEGIN DELETE FROM VendorBalance WHERE SupplierName = OLD.SupplierName; END"
+    ),
+}
+
+def _create_balance_triggers(cursor):
+    for name, body in BALANCE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+def rebuild_vendor_balances():
+    """Recomputes VendorBalance from full history (repairs drift or a restored backup)."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM VendorBalance")
+        conn.execute("""
+            INSERT INTO VendorBalance (SupplierName, TotalBilled, TotalPaid, LedgerTotal, NetDue, LastActivityDate)
+            SELECT n.SupplierName,
+                   IFNULL(b.Billed, 0.0),
+                   IFNULL(l.Paid, 0.0),
+                   IFNULL(l.LedgerTotal, 0.0),
+                   IFNULL(b.Billed, 0.0) + IFNULL(l.LedgerTotal, 0.0),
+                   NULLIF(MAX(IFNULL(b.LastDate, ''), IFNULL(l.LastDate, '')), '')
+            FROM (
+                SELECT SupplierName FROM Suppliers
+                UNION SELECT SupplierName FROM BillEntries
+                UNION SELECT SupplierName FROM VendorLedger
+            ) n
+            LEFT JOIN (
+                SELECT SupplierName, SUM(Qty * VendorRate) AS Billed, MAX(Date) AS LastDate
+                FROM BillEntries GROUP BY SupplierName
+            ) b ON b.SupplierName = n.SupplierName
+            LEFT JOIN (
+                SELECT SupplierName,
+                       SUM(CASE WHEN TransactionType = 'Payment' THEN -Amount ELSE 0 END) AS Paid,
+                       SUM(Amount) AS LedgerTotal,
+                       MAX(Date) AS LastDate
+                FROM VendorLedger GROUP BY SupplierName
+            ) l ON l.SupplierName = n.SupplierName
+        """)
+
+def fetch_vendor_balance(supplier_name):
+    """
+    O(1) balance lookup for one vendor.
+    Returns dict with TotalBilled, TotalPaid, NetDue (rounded to 2 decimals) and LastActivityDate.
+    """
+    rows = read_rows(
+        "SELECT TotalBilled, TotalPaid, NetDue, LastActivityDate FROM VendorBalance WHERE SupplierName = ?",
+        (supplier_name,))
+    row = rows[0] if rows else (0.0, 0.0, 0.0, None)
+    return {
+        'TotalBilled': round(row[0], 2),
+        'TotalPaid': round(row[1], 2),
+        'NetDue': round(row[2], 2),
+        'LastActivityDate': row[3],
+    }
+
+def fetch_total_outstanding():
+    """Sum of NetDue over all current suppliers."""
+    rows = read_rows("""
+        SELECT IFNULL(SUM(NetDue), 0.0) FROM VendorBalance
+        WHERE SupplierName IN (SELECT SupplierName FROM Suppliers)
+    """)
+    return round(rows[0][0], 2)
+
+# --- Vendor Ledger Pages ---
+# A vendor's ledger is the per-day bill totals from BillEntries plus every VendorLedger row,
+# newest first. Pages are fetched by keyset (Date, Seq) where Seq is 0 for the day's bill
+# total and the VendorLedger ID otherwise, so each page reads only its own rows from the
+# (SupplierName, Date) indexes. The running balance of a page is a window SUM() over the
+# page, seeded with the balance at its top edge, which the cursor carries to the next page.
+
+LEDGER_PAGE_SIZE = 50
+
+_LEDGER_PAGE_SQL = """
+    SELECT Date, TransactionType, Amount, Details, Seq,
+           ? - IFNULL(SUM(Amount) OVER (ORDER BY Date DESC, Seq DESC ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0.0) AS Balance
+    FROM (
+        SELECT * FROM (
+            SELECT Date, 0 AS Seq, 'Bill' AS TransactionType, SUM(Qty * VendorRate) AS Amount, 'Bill Total' AS Details
+            FROM BillEntries
+            WHERE SupplierName = ? AND Date >= ? AND Date <= ? AND (Date < ? OR 0 < ?)
+            GROUP BY Date ORDER BY Date DESC LIMIT ?
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT Date, ID AS Seq, TransactionType, Amount, Details
+            FROM VendorLedger
+            WHERE SupplierName = ? AND Date >= ? AND Date <= ? AND (Date < ? OR ID < ?)
+            ORDER BY Date DESC, ID DESC LIMIT ?
+        )
+        ORDER BY Date DESC, Seq DESC
+        LIMIT ?
+    )
+    ORDER BY Date DESC, Seq DESC
+"""
+
+def _ledger_balance_through(supplier_name, end_date):
+    """Balance including every ledger row dated on or before end_date (None = all of them)."""
+    rows = read_rows("SELECT NetDue FROM VendorBalance WHERE SupplierName = ?", (supplier_name,))
+    balance = rows[0][0] if rows else 0.0
+    if end_date is None:
+        return balance
+    later = read_rows("""
+        SELECT (SELECT IFNULL(SUM(Qty * VendorRate), 0.0) FROM BillEntries WHERE SupplierName = ? AND Date > ?)
+             + (SELECT IFNULL(SUM(Amount), 0.0) FROM VendorLedger WHERE SupplierName = ? AND Date > ?)
+    """, (supplier_name, date_key(end_date), supplier_name, date_key(end_date)))
+    return balance - later[0][0]
+
+def fetch_ledger_page(supplier_name, start_date=None, end_date=None, cursor=None, limit=LEDGER_PAGE_SIZE):
+    """
+    One page of a vendor's ledger, newest first, optionally bounded to [start_date, end_date].
+    cursor: None for the first page, else the previous page's 'next_cursor'.
+    Returns a dict:
+        rows: [(Date, TransactionType, Amount, Details, Balance)], Balance = running balance after the row
+        next_cursor: pass back for the following (older) page, None when this was the last one
+    """
+    if cursor is None:
+        # Above every real key: all rows up to end_date
+        top_date = '9999-12-31' if end_date is None else date_key(end_date)
+        top_seq = 2 ** 62
+        top_balance = _ledger_balance_through(supplier_name, end_date)
+    else:
+        top_date, top_seq, top_balance = cursor
+
+    start = '' if start_date is None else date_key(start_date)
+    rows = read_rows(_LEDGER_PAGE_SQL, (
+        top_balance,
+        supplier_name, start, top_date, top_date, top_seq, limit,
+        supplier_name, start, top_date, top_date, top_seq, limit,
+        limit,
+    ))
+
+    next_cursor = None
+    if len(rows) == limit:
+        last_date, _, last_amount, _, last_seq, last_balance = rows[-1]
+        next_cursor = (last_date, last_seq, last_balance - last_amount)
+    return {
+        'rows': [(date, tx_type, amount, details, balance) for date, tx_type, amount, details, _, balance in rows],
+        'next_cursor': next_cursor,
+    }
 
 # --- Vendor/Supplier Utilities ---
 
 def fetch_suppliers_and_items():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     # Changed table name to Suppliers
-    cursor.execute("SELECT SupplierName FROM Suppliers ORDER BY SupplierName")
-    suppliers = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    suppliers = [row[0] for row in read_rows("SELECT SupplierName FROM Suppliers ORDER BY SupplierName")]
     return suppliers, {}
 
+SUPPLIER_COLUMNS = "SupplierID, SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired"
+
+def fetch_supplier_page(cursor=None, limit=100):
+    """
+    One page of Suppliers rows (SUPPLIER_COLUMNS) by name, a keyset over the unique name index.
+    cursor: None for the first page, else the previous page's 'next_cursor' (its last name).
+    """
+    if cursor is None:
+        rows = read_rows(f"SELECT {SUPPLIER_COLUMNS} FROM Suppliers ORDER BY SupplierName LIMIT ?", (limit,))
+    else:
+        rows = read_rows(f"SELECT {SUPPLIER_COLUMNS} FROM Suppliers WHERE SupplierName > ? ORDER BY SupplierName LIMIT ?",
+                         (cursor, limit))
+    return {'rows': rows, 'next_cursor': rows[-1][1] if len(rows) == limit else None}
+
 def fetch_vendor_type(vendor_name):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     # Changed table name to Suppliers and column to VendorType
-    cursor.execute("SELECT VendorType FROM Suppliers WHERE SupplierName = ?", (vendor_name,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
+    rows = read_rows("SELECT VendorType FROM Suppliers WHERE SupplierName = ?", (vendor_name,))
+    return rows[0][0] if rows else None
 
 def delete_vendor_and_cleanup(supplier_id, supplier_name):
     """
     Deletes a vendor and cascades the deletion to Markups, BillEntries, 
     and VendorLedger to maintain DB integrity.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        # 1. Delete Ledger Entries
-        cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ?", (supplier_name,))
-        # 2. Delete Bill Entries
-        cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ?", (supplier_name,))
-        # 3. Delete Markup Rules
-        cursor.execute("DELETE FROM Markups WHERE SupplierName = ?", (supplier_name,))
-        # 4. Delete the Supplier
-        cursor.execute("DELETE FROM Suppliers WHERE SupplierID = ?", (supplier_id,))
-        
-        conn.commit()
+        with transaction() as conn:
+            cursor = conn.cursor()
+            # 1. Delete Ledger Entries
+            cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ?", (supplier_name,))
+            # 2. Delete Bill Entries
+            cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ?", (supplier_name,))
+            # 3. Delete Markup Rules
+            cursor.execute("DELETE FROM Markups WHERE SupplierName = ?", (supplier_name,))
+            # 4. Delete the Supplier
+            cursor.execute("DELETE FROM Suppliers WHERE SupplierID = ?", (supplier_id,))
         return True
     except Exception as e:
         print(f"Error deleting vendor: {e}")
-        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 def insert_default_markups(vendor_name, default_rules):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
     rules_to_insert = []
     # Adapting default rules to the schema used in vendor_management.py
     # Schema: SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2
@@ -152,80 +1067,322 @@ def insert_default_markups(vendor_name, default_rules):
         ))
 
     try:
-        cursor.executemany("""
-            INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, rules_to_insert)
-        conn.commit()
+        with transaction() as conn:
+            conn.executemany("""
+                INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rules_to_insert)
         return True
     except Exception as e:
         print(f"Error inserting default markups: {e}")
-        conn.rollback()
         return False
-    finally:
-        conn.close()
+
+def _normalize_rule(item_name, base_type, op1, val1, op2, val2):
+    """Editor/DB rule values in one comparable form: blanks and NaN become None, values float."""
+    def text(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        value = str(value).strip()
+        return value or None
+
+    def number(value):
+        value = pd.to_numeric(value, errors='coerce')
+        return None if pd.isna(value) else float(value)
+
+    return (text(item_name), text(base_type), text(op1), number(val1), text(op2), number(val2))
+
+def diff_markup_rules(before, after):
+    """
+    Keyed diff of one vendor's markup rules.
+    before/after: iterables of (ItemID, ItemName, BaseType, Op1, Val1, Op2, Val2); ItemID is
+    None/NaN for rows added in the editor. Rows without an ItemName are ignored.
+    A new row reusing the name of a deleted row is treated as an update, so its ItemID survives.
+    Returns {'insert': [rule], 'update': {item_id: rule}, 'delete': {item_id: item_name}}.
+    """
+    old = {}
+    for item_id, *rule in before:
+        rule = _normalize_rule(*rule)
+        if rule[0] is not None:
+            old[int(item_id)] = rule
+
+    kept, inserts = {}, []
+    for item_id, *rule in after:
+        rule = _normalize_rule(*rule)
+        if rule[0] is None:
+            continue
+        if item_id is not None and not pd.isna(item_id) and int(item_id) in old:
+            kept[int(item_id)] = rule
+        else:
+            inserts.append(rule)
+
+    deletes = {item_id: rule[0] for item_id, rule in old.items() if item_id not in kept}
+    deleted_by_name = {name: item_id for item_id, name in deletes.items()}
+    for rule in list(inserts):
+        item_id = deleted_by_name.pop(rule[0], None)
+        if item_id is not None:
+            inserts.remove(rule)
+            del deletes[item_id]
+            kept[item_id] = rule
+
+    updates = {item_id: rule for item_id, rule in kept.items() if rule != old[item_id]}
+    return {'insert': inserts, 'update': updates, 'delete': deletes}
+
+def save_markup_rules(supplier_name, before, after):
+    """
+    Applies only the changed rules (see diff_markup_rules) in one transaction.
+    Returns the sorted item names whose rule changed; a rename reports both names.
+    """
+    before = list(before)
+    diff = diff_markup_rules(before, after)
+    old_names = {int(item_id): name for item_id, name, *_ in before if name is not None and not pd.isna(item_id)}
+
+    with transaction() as conn:
+        conn.executemany("DELETE FROM Markups WHERE ItemID = ?", [(item_id,) for item_id in diff['delete']])
+        conn.executemany("""
+            UPDATE Markups SET ItemName=?, BaseRateType=?, MarkupOperator1=?, MarkupValue1=?, MarkupOperator2=?, MarkupValue2=?
+            WHERE ItemID = ? AND SupplierName = ?
+        """, [(*rule, item_id, supplier_name) for item_id, rule in diff['update'].items()])
+        conn.executemany("""
+            INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(supplier_name, *rule) for rule in diff['insert']])
+
+    changed = set(diff['delete'].values()) | {rule[0] for rule in diff['insert']}
+    for item_id, rule in diff['update'].items():
+        changed.update((old_names.get(item_id), rule[0]))
+    changed.discard(None)
+    return sorted(changed)
 
 def fetch_items_for_supplier(supplier_name):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT ItemName FROM Markups WHERE SupplierName = ? ORDER BY ItemName", (supplier_name,))
-    items = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    rows = read_rows("SELECT ItemName FROM Markups WHERE SupplierName = ? ORDER BY ItemName", (supplier_name,))
+    items = [row[0] for row in rows]
     return items
 
 # --- Rate Calculation Utilities ---
 
 def fetch_rate_and_rule(date, supplier_name, item_name):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
     # 1. Fetch Raw Rates
-    cursor.execute("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (date,))
-    raw_rates = cursor.fetchone() 
+    raw_rates = query_one("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (date_key(date),))
 
     # 2. Fetch Markup Rule (Matching schema in vendor_management.py)
-    cursor.execute("""
+    rule = query_one("""
         SELECT BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2
         FROM Markups 
         WHERE SupplierName = ? AND ItemName = ?
     """, (supplier_name, item_name))
-    rule = cursor.fetchone() 
 
-    conn.close()
     return raw_rates, rule
 
+def fetch_bill_context(date, supplier_name):
+    """
+    Everything the bill grid needs for one vendor/date, in a single joined query:
+    the day's paper rates, every markup rule of the vendor and any saved BillEntries.
+    Returns a dict:
+        raw_rates: (Tandoor, Boiler, Egg) or None if no rates for the date
+        items: item names (sorted)
+        rules: item -> (BaseType, Op1, Val1, Op2, Val2)
+        expected_rates: item -> expected rate (0.0 when rates are missing)
+        existing: item -> (Qty, VendorRate, ExpectedRate, Variance, Status) for saved entries
+    """
+    rows = query_all("""
+        SELECT m.ItemName, m.BaseRateType, m.MarkupOperator1, m.MarkupValue1, m.MarkupOperator2, m.MarkupValue2,
+               r.TandoorRate, r.BoilerRate, r.EggRate,
+               b.ID, b.Qty, b.VendorRate, b.ExpectedRate, b.Variance, b.Status
+        FROM Markups m
+        LEFT JOIN RawData r ON r.Date = :date
+        LEFT JOIN BillEntries b ON b.Date = :date AND b.SupplierName = m.SupplierName AND b.ItemName = m.ItemName
+        WHERE m.SupplierName = :supplier
+        ORDER BY m.ItemName
+    """, {'date': date_key(date), 'supplier': supplier_name})
+
+    context = {'raw_rates': None, 'items': [], 'rules': {}, 'expected_rates': {}, 'existing': {}}
+    if not rows:
+        return context
+
+    if rows[0][6] is not None:
+        context['raw_rates'] = tuple(rows[0][6:9])
+
+    for row in rows:
+        item = row[0]
+        context['items'].append(item)
+        context['rules'][item] = tuple(row[1:6])
+        if row[9] is not None:
+            context['existing'][item] = tuple(row[10:15])
+
+    def compute(items):
+        if context['raw_rates'] is None:
+            return [0.0] * len(items)
+        rules = [context['rules'][item] for item in items]
+        return calculate_expected_rates([context['raw_rates']] * len(rules), *zip(*rules)).tolist()
+
+    context['expected_rates'] = cached_expected_rates(date, supplier_name, context['items'], compute)
+
+    return context
+
+# --- Markup Engine ---
+# One vectorized kernel evaluates any number of (raw rates, rule) pairs at once. Callers
+# pair them row by row (e.g. bills joined to their date's rates and their rule), so only
+# the pairs that exist are priced. calculate_expected_rate() is a thin wrapper over it,
+# so bulk and per-row paths agree.
+
+RATE_TYPES = ('TandoorRate', 'BoilerRate', 'EggRate')
+RULE_COLUMNS = ['BaseRateType', 'MarkupOperator1', 'MarkupValue1', 'MarkupOperator2', 'MarkupValue2']
+
+def _as_operands(values):
+    """Markup values as floats; None/NULL become NaN (meaning 'no operand')."""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+def _apply_markup_op(rates, ops, operands):
+    """Vector form of the old apply_op: missing operand, unknown op and x/0 all pass the rate through."""
+    has_operand = ~np.isnan(operands)
+    result = rates.copy()
+
+    mask = has_operand & (ops == '+')
+    result[mask] = rates[mask] + operands[mask]
+    mask = has_operand & (ops == '-')
+    result[mask] = rates[mask] - operands[mask]
+    mask = has_operand & (ops == '*')
+    result[mask] = rates[mask] * operands[mask]
+    mask = has_operand & (ops == '/') & (operands != 0)
+    result[mask] = rates[mask] / operands[mask]
+    return result
+
+def calculate_expected_rates(raw_rates, base_types, op1, val1, op2, val2):
+    """
+    Vectorized markup kernel. Row i pairs raw_rates[i] with rule i.
+    raw_rates: (N, 3) array of (Tandoor, Boiler, Egg); a NaN row means 'no rate data'
+    base_types, op1, val1, op2, val2: length-N sequences (rule columns)
+    Returns a float array of expected rates (missing data -> 0.0).
+    """
+    raw_rates = np.asarray(raw_rates, dtype=float).reshape(-1, len(RATE_TYPES))
+    base_types = np.asarray(base_types, dtype=object)
+
+    # Determine Base (unknown BaseRateType -> 0.0)
+    rates = np.zeros(len(base_types), dtype=float)
+    for col, rate_type in enumerate(RATE_TYPES):
+        mask = base_types == rate_type
+        rates[mask] = raw_rates[mask, col]
+
+    # Apply Op1, then Op2 (a blank Op2/Val2 passes through)
+    rates = _apply_markup_op(rates, np.asarray(op1, dtype=object), _as_operands(val1))
+    rates = _apply_markup_op(rates, np.asarray(op2, dtype=object), _as_operands(val2))
+
+    # Clamp at 0 (NaN from missing rates also lands here)
+    rates = np.where(rates > 0.0, rates, 0.0)
+    return round2(rates)
+
+# --- Bill Recalculation ---
+
+def recalculate_bill_entries(dates):
+    """
+    Recomputes ExpectedRate, Variance and Status of every BillEntries row on the given dates
+    from the current RawData and Markups: one joined SELECT, one vectorized pass and one
+    batched UPDATE, however many dates and rows are involved.
+    Joins the caller's transaction if one is open.
+    Returns {date: updated_count}.
+    """
+    date_keys = sorted({date_key(d) for d in dates})
+    if not date_keys:
+        return {}
+
+    with transaction() as conn:
+        df = pd.read_sql_query("""
+            SELECT b.ID, b.Date, b.Qty, b.VendorRate,
+                   r.TandoorRate, r.BoilerRate, r.EggRate,
+                   m.BaseRateType, m.MarkupOperator1, m.MarkupValue1, m.MarkupOperator2, m.MarkupValue2
+            FROM BillEntries b
+            LEFT JOIN RawData r ON r.Date = b.Date
+            LEFT JOIN Markups m ON m.SupplierName = b.SupplierName AND m.ItemName = b.ItemName
+            WHERE b.Date IN (SELECT value FROM json_each(?))
+        """, conn, params=(json.dumps(date_keys),))
+
+        if df.empty:
+            return {}
+
+        expected = calculate_expected_rates(
+            df[list(RATE_TYPES)].to_numpy(dtype=float), *(df[col].to_numpy(dtype=object) for col in RULE_COLUMNS)
+        )
+        # Saved Qty is already the net quantity
+        rows = compute_bill_rows(df['Qty'].to_numpy(), 0.0, expected, df['VendorRate'].to_numpy())
+
+        conn.executemany(
+            "UPDATE BillEntries SET ExpectedRate = ?, Variance = ?, Status = ? WHERE ID = ?",
+            zip(expected.tolist(), rows['variance'].tolist(), rows['status'].tolist(), df['ID'].tolist())
+        )
+
+    return df.groupby('Date').size().to_dict()
+
+# --- Rate History Editing ---
+
+def _rate_frame(rows):
+    """RawData rows as a frame indexed by 'YYYY-MM-DD' date; blank dates are dropped, blank rates are NaN."""
+    df = pd.DataFrame(list(rows), columns=['Date', *RATE_TYPES])
+    df['Date'] = [None if pd.isna(d) or str(d).strip() == '' else date_key(d) for d in df['Date']]
+    df = df[df['Date'].notna()].drop_duplicates(subset='Date', keep='last').set_index('Date')
+    return df.apply(pd.to_numeric, errors='coerce').astype(float)
+
+def diff_raw_rates(before, after):
+    """
+    Keyed diff of RawData rows by Date. before/after: iterables of (Date, Tandoor, Boiler, Egg).
+    Returns {'upsert': [row], 'delete': [date]} for new or changed dates and removed dates.
+    """
+    old = _rate_frame(before)
+    new = _rate_frame(after)
+
+    aligned = old.reindex(new.index)
+    same = ((aligned == new) | (aligned.isna() & new.isna())).all(axis=1) & new.index.isin(old.index)
+    upserts = new[~same].sort_index()
+    upserts = upserts.astype(object).where(upserts.notna(), None)
+
+    return {
+        'upsert': list(upserts.itertuples(index=True, name=None)),
+        'delete': sorted(old.index.difference(new.index)),
+    }
+
+def save_raw_rates(before, after):
+    """
+    Writes only the changed RawData dates and recomputes the BillEntries of exactly those
+    dates, all in one transaction. Returns (changed_dates, bills_updated).
+    """
+    diff = diff_raw_rates(before, after)
+    changed_dates = sorted({row[0] for row in diff['upsert']} | set(diff['delete']))
+    if not changed_dates:
+        return [], 0
+
+    with transaction() as conn:
+        conn.executemany("DELETE FROM RawData WHERE Date = ?", [(date,) for date in diff['delete']])
+        conn.executemany("""
+            INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
+            ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
+        """, diff['upsert'])
+        bills_updated = sum(recalculate_bill_entries(changed_dates).values())
+
+    return changed_dates, bills_updated
+
 def calculate_expected_rate(raw_rates, rule):
     """
     Calculates rate based on dynamic operators.
     raw_rates: (Tandoor, Boiler, Egg)
     rule: (BaseType, Op1, Val1, Op2, Val2)
+    Thin wrapper over calculate_expected_rates() for a single pair.
     """
     if not raw_rates or not rule:
         return 0.0
 
-    Tandoor, Boiler, Egg = raw_rates
     BaseType, Op1, Val1, Op2, Val2 = rule
-    
-    # Determine Base
-    rate = 0.0
-    if BaseType == 'TandoorRate': rate = Tandoor
-    elif BaseType == 'BoilerRate': rate = Boiler
-    elif BaseType == 'EggRate': rate = Egg
-    
-    # Helper to apply math
-    def apply_op(current_val, op, operand):
-        if operand is None: return current_val
-        if op == '+': return current_val + operand
-        if op == '-': return current_val - operand
-        if op == '*': return current_val * operand
-        if op == '/': return current_val / operand if operand != 0 else current_val
-        return current_val
-
-    # Apply Op1
-    rate = apply_op(rate, Op1, Val1)
-    
-    # Apply Op2 (if exists)
-    if Op2 and Val2 is not None:
-        rate = apply_op(rate, Op2, Val2)
+    expected = calculate_expected_rates([raw_rates], [BaseType], [Op1], [Val1], [Op2], [Val2])
+    return float(expected[0])
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chicken tracker database maintenance.")
+    parser.add_argument('command', choices=['rebuild-balances'])
+    parser.add_argument('--db', default=DB_NAME, help="Database file (default: %(default)s)")
+    args = parser.parse_args()
 
-    return round(max(0.0, rate), 2)
\ No newline at end of file
+    DB_NAME = args.db
+    initialize_db()
+    if args.command == 'rebuild-balances':
+        rebuild_vendor_balances()
+        print("VendorBalance rebuilt.")
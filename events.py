@@ -0,0 +1,53 @@
+import sys
+
+# --- Event Bus ---
+# Publish/subscribe between the tabs of the Tkinter app. A tab that changes data publishes
+# what changed; the tabs showing that data subscribe and refresh themselves. Events are not
+# delivered at once: every publish made before Tk goes idle is collected, and one after_idle
+# flush then calls each handler once with all of them. A burst of saves (or a handler that
+# publishes in turn) therefore refreshes each tab at most once, and never re-enters it.
+
+SUPPLIERS_CHANGED = 'suppliers_changed' # () - a supplier was added, edited, renamed or removed
+RATES_CHANGED = 'rates_changed'         # (date,) - the paper rates of a date were saved
+MARKUPS_CHANGED = 'markups_changed'     # (vendor,) - markup rules of a vendor were added or edited
+BILL_SAVED = 'bill_saved'               # (vendor, date) - a bill (and its ledger entry) was saved
+
+EVENTS = (SUPPLIERS_CHANGED, RATES_CHANGED, MARKUPS_CHANGED, BILL_SAVED) # Flush order
+
+class EventBus:
+    """
+    Coalescing event bus on a Tk root. Handlers are called as handler(payloads), where
+    payloads lists the distinct argument tuples published since the last flush, in order
+    (e.g. [('2025-11-20',), ('2025-11-21',)] for rates_changed; [()] for suppliers_changed).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._handlers = {event: [] for event in EVENTS}
+        self._pending = {} # Key: event -> {payload tuple: None}, an ordered set
+        self._flush_id = None # after_idle id of the scheduled flush
+
+    def subscribe(self, event, handler):
+        self._handlers[event].append(handler)
+
+    def publish(self, event, *args):
+        if event not in self._handlers:
+            raise ValueError(f"Unknown event: {event}")
+        self._pending.setdefault(event, {})[args] = None
+        if self._flush_id is None:
+            self._flush_id = self.root.after_idle(self._flush)
+
+    def _flush(self):
+        self._flush_id = None
+        pending, self._pending = self._pending, {}
+        # Events published by the handlers below go into the next flush
+        for event in EVENTS:
+            if event not in pending:
+                continue
+            payloads = list(pending[event])
+            for handler in self._handlers[event]:
+                try:
+                    handler(payloads)
+                except Exception:
+                    # One failing tab must not keep the others stale
+                    self.root.report_callback_exception(*sys.exc_info())
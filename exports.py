@@ -0,0 +1,161 @@
+import os
+import csv
+import math
+import argparse
+from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+import chicken_db
+
+# Rows fetched from SQLite and handed to the writer at a time. Memory use depends on this,
+# not on the size of the date range.
+CHUNK_ROWS = 5000
+
+# --- Layouts ---
+# Columns, row selection and file naming of each report. 'full_data' and 'variance_report'
+# match the workbooks shipped in the repo (Chicken_Bills_Full_Data_Export_*.xlsx,
+# Chicken_Bills_Variance_Report_*.xlsx). Every ORDER BY is served by an index, sorting at
+# most one day (or one vendor-day) of rows at a time, so SQLite streams the result as well.
+
+EXPORT_LAYOUTS = {
+    'full_data': {
+        'title': "Full Data Export",
+        'file_prefix': "Chicken_Bills_Full_Data_Export",
+        'sql': """
+            SELECT ID AS EntryID, Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status
+            FROM BillEntries
+            WHERE Date >= ? AND Date <= ?
+            ORDER BY Date DESC, ID DESC
+        """,
+    },
+    'variance_report': {
+        'title': "Variance Report",
+        'file_prefix': "Chicken_Bills_Variance_Report",
+        'sql': """
+            SELECT Date, ItemName, SupplierName, Qty, VendorRate, ExpectedRate, Variance, Status
+            FROM BillEntries
+            WHERE Date >= ? AND Date <= ? AND Variance != 0
+            ORDER BY Date DESC, ID DESC
+        """,
+    },
+    'vendor_ledger': {
+        'title': "Vendor Ledger",
+        'file_prefix': "Chicken_Vendor_Ledger_Export",
+        'sql': """
+            SELECT SupplierName, Date, TransactionType, Amount, Details
+            FROM VendorLedger
+            WHERE Date >= ? AND Date <= ?
+            ORDER BY SupplierName, Date, ID
+        """,
+    },
+}
+EXPORT_MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+EXPORT_FORMATS = tuple(EXPORT_MIME_TYPES)
+
+def _open_cursor(layout, start, end):
+    """Cursor over the layout's rows in [start, end] (either may be None) and its header."""
+    sql = EXPORT_LAYOUTS[layout]['sql']
+    lo = '' if start is None else chicken_db.date_key(start)
+    hi = '9999-12-31' if end is None else chicken_db.date_key(end)
+    cursor = chicken_db.get_db_connection().cursor()
+    cursor.execute(sql, (lo, hi))
+    return cursor, [col[0] for col in cursor.description]
+
+def _chunks(cursor, chunk_rows):
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+# --- Writers ---
+
+def write_csv(layout, out, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """Streams the layout into out, a text file opened with newline=''. Returns the row count."""
+    cursor, header = _open_cursor(layout, start, end)
+    writer = csv.writer(out)
+    writer.writerow(header)
+    count = 0
+    for rows in _chunks(cursor, chunk_rows):
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def write_xlsx(layout, out, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """Streams the layout into an XLSX workbook at out, a path or binary file. Returns the row count."""
+    cursor, header = _open_cursor(layout, start, end)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    header_cells = []
+    for name in header:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    count = 0
+    try:
+        for rows in _chunks(cursor, chunk_rows):
+            if count + len(rows) >= XLSX_MAX_ROWS: # The header takes one row
+                cursor.close()
+                raise ValueError(f"More than {XLSX_MAX_ROWS:,} rows do not fit in an Excel sheet; export as CSV instead.")
+            for row in rows:
+                sheet.append([_xlsx_value(value) for value in row])
+            count += len(rows)
+    except BaseException:
+        sheet.close() # Ends the sheet's temporary file (openpyxl deletes it at exit)
+        raise
+    workbook.save(out)
+    return count
+
+# --- Write-only XLSX ---
+# openpyxl's write-only workbook writes each appended row to a temporary file instead of
+# keeping the cell objects, so the sheet never sits in memory as a whole.
+
+# Excel cannot open sheets longer than this
+XLSX_MAX_ROWS = 1048576
+
+def _xlsx_value(value):
+    """The value as a cell can hold it: no NaN/inf floats, no control characters in text."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+def export_file_name(layout, fmt, now=None):
+    """e.g. Chicken_Bills_Variance_Report_20251126_165545.xlsx"""
+    stamp = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+    return f"{EXPORT_LAYOUTS[layout]['file_prefix']}_{stamp}.{fmt}"
+
+def export_report(layout, fmt, directory, start=None, end=None):
+    """Writes the report into directory under its standard name. Returns (path, row count)."""
+    path = os.path.join(directory, export_file_name(layout, fmt))
+    if fmt == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            count = write_csv(layout, f, start, end)
+    else:
+        count = write_xlsx(layout, path, start, end)
+    return path, count
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export a report from the database.")
+    parser.add_argument('layout', choices=list(EXPORT_LAYOUTS))
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=EXPORT_FORMATS[0])
+    parser.add_argument('--start', help="First date (default: all history)")
+    parser.add_argument('--end', help="Last date (default: all history)")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--db', default=chicken_db.DB_NAME, help="Database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    chicken_db.DB_NAME = args.db
+    chicken_db.initialize_db()
+    path, count = export_report(args.layout, args.format, args.output_dir, args.start, args.end)
+    print(f"{count} rows written to {path}")
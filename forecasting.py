@@ -0,0 +1,315 @@
+import argparse
+import threading
+import time
+from collections import deque
+from datetime import date as date_cls, timedelta
+from math import comb
+import pandas as pd
+import numpy as np
+import chicken_db
+
+DEFAULT_DEGREE = 2
+DEFAULT_WINDOW_DAYS = 90
+MIN_POINTS = 5
+# Day offsets are kept relative to an anchor that is moved forward once it falls this
+# far behind, so the running power sums stay small (x**4 of a raw ordinal is ~1e23).
+REBASE_SPAN_DAYS = 366
+
+def _to_day(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.Timestamp(value).toordinal()
+
+# --- Single Series ---
+
+class RateTrend:
+    """
+    Least-squares polynomial trend of one rate series over a trailing window of days.
+    Keeps running sums of x**k and x**k * y, so adding, replacing or expiring a day is O(1)
+    and fitting only solves a (degree+1)-square system.
+    """
+
+    def __init__(self, degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS):
+        if window_days is not None and window_days < 1:
+            raise ValueError(f"window_days must be None (all history) or at least 1, not {window_days!r}")
+        self.degree = degree
+        self.window_days = window_days
+        self._days = deque() # sorted day ordinals inside the window
+        self._values = {} # day -> value
+        self._anchor = None
+        self._x_sums = np.zeros(2 * degree + 1) # sum of x**k
+        self._xy_sums = np.zeros(degree + 1) # sum of x**k * y
+        self._coeffs = None # cached fit, reset by every change
+        order = 2 * degree + 1
+        self._binomial = np.array([[comb(k, j) for j in range(order)] for k in range(order)], dtype=float)
+        self._exponents = np.subtract.outer(np.arange(order), np.arange(order)).clip(min=0)
+
+    def __len__(self):
+        return len(self._days)
+
+    @property
+    def last_day(self):
+        return self._days[-1] if self._days else None
+
+    def _accumulate(self, day, value, sign):
+        x = float(day - self._anchor)
+        powers = x ** np.arange(2 * self.degree + 1)
+        self._x_sums += sign * powers
+        self._xy_sums += sign * value * powers[:self.degree + 1]
+
+    def _rebase(self, anchor):
+        self._anchor = anchor
+        self._x_sums[:] = 0.0
+        self._xy_sums[:] = 0.0
+        for day in self._days:
+            self._accumulate(day, self._values[day], 1.0)
+
+    def update(self, day, value):
+        """Adds (or replaces) the value for a day and expires days that left the window."""
+        day = _to_day(day)
+        if value is None or pd.isna(value):
+            return self.remove(day)
+        value = float(value)
+
+        if day in self._values:
+            self._accumulate(day, self._values[day], -1.0)
+        else:
+            if self._days and day < self._days[-1]:
+                # Back-dated edit: rare, keep the deque sorted
+                if self.window_days is not None and day <= self._days[-1] - self.window_days:
+                    return
+                position = next(i for i, d in enumerate(self._days) if d > day)
+                self._days.insert(position, day)
+            else:
+                self._days.append(day)
+        self._values[day] = value
+
+        if self._anchor is None or day < self._anchor:
+            self._rebase(day)
+        else:
+            self._accumulate(day, value, 1.0)
+        self._expire()
+        self._coeffs = None
+
+    def remove(self, day):
+        day = _to_day(day)
+        if day not in self._values:
+            return
+        self._accumulate(day, self._values.pop(day), -1.0)
+        self._days.remove(day)
+        self._coeffs = None
+
+    def _expire(self):
+        if self.window_days is not None:
+            cutoff = self._days[-1] - self.window_days
+            while self._days[0] <= cutoff:
+                old = self._days.popleft()
+                self._accumulate(old, self._values.pop(old), -1.0)
+        if self._days and self._days[-1] - self._anchor > REBASE_SPAN_DAYS:
+            self._rebase(self._days[-1])
+
+    def _fit(self):
+        """
+        Solves the normal equations in centred, scaled coordinates u = (x - c) / s.
+        The raw sums are re-expressed about c with the binomial expansion, which keeps
+        the system well conditioned no matter how long the history is.
+        """
+        n = len(self._days)
+        if n == 0:
+            return None
+        c = self._x_sums[1] / n
+        s = max((self._days[-1] - self._days[0]) / 2.0, 1.0)
+
+        order = 2 * self.degree + 1
+        # shift[k, j] = C(k, j) * (-c)**(k - j), lower triangular
+        shift = self._binomial * (-c) ** self._exponents
+        scale = s ** np.arange(order)
+        u_sums = shift @ self._x_sums / scale
+        uy_sums = shift[:self.degree + 1, :self.degree + 1] @ self._xy_sums / scale[:self.degree + 1]
+
+        # Fewer distinct days than coefficients: drop to the highest degree they support
+        degree = min(self.degree, n - 1)
+        normal = np.array([[u_sums[i + j] for j in range(degree + 1)] for i in range(degree + 1)])
+        coeffs = np.linalg.lstsq(normal, uy_sums[:degree + 1], rcond=None)[0]
+        return c, s, coeffs
+
+    def predict(self, day):
+        if self._coeffs is None:
+            self._coeffs = self._fit()
+        if self._coeffs is None:
+            return None
+        c, s, coeffs = self._coeffs
+        u = (_to_day(day) - self._anchor - c) / s
+        return float(np.polyval(coeffs[::-1], u))
+
+# --- Daily Rates ---
+
+class RateForecaster:
+    """One RateTrend per RawData rate column, fed a day at a time."""
+
+    def __init__(self, degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS):
+        self.degree = degree
+        self.window_days = window_days
+        self.trends = {rate_type: RateTrend(degree, window_days) for rate_type in chicken_db.RATE_TYPES}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS):
+        """Builds a forecaster from a frame with Date plus the RATE_TYPES columns."""
+        forecaster = cls(degree, window_days)
+        for row in df[['Date', *chicken_db.RATE_TYPES]].itertuples(index=False):
+            forecaster.update(*row)
+        return forecaster
+
+    def __len__(self):
+        return min(len(trend) for trend in self.trends.values())
+
+    @property
+    def last_day(self):
+        days = [trend.last_day for trend in self.trends.values() if trend.last_day is not None]
+        return max(days) if days else None
+
+    def update(self, date, tandoor, boiler, egg):
+        with self._lock:
+            for trend, value in zip(self.trends.values(), (tandoor, boiler, egg)):
+                trend.update(date, value)
+
+    def forecast(self, horizon_days=1):
+        """
+        Predicted rates for the horizon_days following the latest known day.
+        Returns a DataFrame indexed by Date with one column per rate type.
+        """
+        with self._lock:
+            last_day = self.last_day
+            if last_day is None:
+                return pd.DataFrame(columns=list(chicken_db.RATE_TYPES))
+            days = [last_day + step for step in range(1, horizon_days + 1)]
+            data = {
+                rate_type: [trend.predict(day) for day in days]
+                for rate_type, trend in self.trends.items()
+            }
+        index = pd.Index([date_cls.fromordinal(day) for day in days], name='Date')
+        return pd.DataFrame(data, index=index)
+
+# --- Model Cache ---
+# Fitted forecasters are shared across reruns and sessions, stamped with the DataVersion
+# generation. record_rates() advances them in O(1) after a day's rates are saved; any
+# other write (history edits, imports) makes the next get_rate_forecaster() reload.
+
+_models = {} # (db, degree, window_days) -> (generation, RateForecaster)
+_models_lock = threading.Lock()
+
+def load_rate_forecaster(degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS):
+    """Fits a forecaster from RawData, reading only the trailing window."""
+    conn = chicken_db.get_db_connection()
+    if window_days is None:
+        df = pd.read_sql_query("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date", conn)
+    else:
+        last = conn.execute("SELECT MAX(Date) FROM RawData").fetchone()[0]
+        start = (pd.Timestamp(last) - timedelta(days=window_days - 1)).strftime('%Y-%m-%d') if last else ''
+        df = pd.read_sql_query(
+            "SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date >= ? ORDER BY Date",
+            conn, params=(start,))
+    return RateForecaster.from_frame(df, degree, window_days)
+
+def get_rate_forecaster(degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS):
+    """Cached forecaster for the current database contents."""
+    generation = chicken_db.get_data_generation()
+    key = (chicken_db.DB_NAME, degree, window_days)
+    with _models_lock:
+        cached = _models.get(key)
+        if cached is not None and generation is not None and cached[0] == generation:
+            return cached[1]
+
+    forecaster = load_rate_forecaster(degree, window_days)
+    with _models_lock:
+        _models[key] = (generation, forecaster)
+    return forecaster
+
+def record_rates(date, tandoor, boiler, egg):
+    """
+    Call after committing one day's rates. Cached models that were current just before
+    that commit are updated in place; anything else is dropped and reloaded on demand.
+    """
+    generation = chicken_db.get_data_generation()
+    with _models_lock:
+        for key, (model_generation, forecaster) in list(_models.items()):
+            if key[0] != chicken_db.DB_NAME:
+                continue
+            if generation is not None and model_generation is not None and generation == model_generation + 1:
+                forecaster.update(date, tandoor, boiler, egg)
+                _models[key] = (generation, forecaster)
+            else:
+                del _models[key]
+
+def clear_model_cache():
+    with _models_lock:
+        _models.clear()
+
+# --- Backtest ---
+
+def _polyfit_forecast(days, values, target_day, degree):
+    """The dashboard's previous approach: refit on all history with raw ordinals."""
+    coeffs = np.polyfit(days, values, degree)
+    return float(np.poly1d(coeffs)(target_day))
+
+def backtest(df, horizon_days=1, degree=DEFAULT_DEGREE, window_days=DEFAULT_WINDOW_DAYS, min_points=MIN_POINTS):
+    """
+    Walk-forward comparison on a RawData-shaped frame: after each day, both methods
+    predict the rates horizon_days ahead and are scored against the actual values.
+    Returns a DataFrame with MAE per rate type and total seconds for each method.
+    """
+    df = df.dropna(subset=list(chicken_db.RATE_TYPES)).copy()
+    df['Day'] = pd.to_datetime(df['Date']).map(pd.Timestamp.toordinal)
+    df = df.sort_values('Day').drop_duplicates(subset='Day', keep='last').reset_index(drop=True)
+    days = df['Day'].to_numpy()
+    actual = {rate_type: dict(zip(days, df[rate_type].to_numpy(dtype=float))) for rate_type in chicken_db.RATE_TYPES}
+
+    errors = {('polyfit', rate_type): [] for rate_type in chicken_db.RATE_TYPES}
+    errors.update({('incremental', rate_type): [] for rate_type in chicken_db.RATE_TYPES})
+    seconds = {'polyfit': 0.0, 'incremental': 0.0}
+    forecaster = RateForecaster(degree, window_days)
+
+    for i, row in enumerate(df.itertuples(index=False)):
+        started = time.perf_counter()
+        forecaster.update(row.Day, row.TandoorRate, row.BoilerRate, row.EggRate)
+        target = row.Day + horizon_days
+        incremental = {rate_type: trend.predict(target) for rate_type, trend in forecaster.trends.items()}
+        seconds['incremental'] += time.perf_counter() - started
+
+        if i + 1 < min_points:
+            continue
+
+        started = time.perf_counter()
+        polyfit = {
+            rate_type: _polyfit_forecast(days[:i + 1], df[rate_type].to_numpy(dtype=float)[:i + 1], target, degree)
+            for rate_type in chicken_db.RATE_TYPES
+        }
+        seconds['polyfit'] += time.perf_counter() - started
+
+        for rate_type in chicken_db.RATE_TYPES:
+            if target in actual[rate_type]:
+                errors[('polyfit', rate_type)].append(abs(polyfit[rate_type] - actual[rate_type][target]))
+                errors[('incremental', rate_type)].append(abs(incremental[rate_type] - actual[rate_type][target]))
+
+    rows = []
+    for method in ('polyfit', 'incremental'):
+        row = {'Method': method}
+        for rate_type in chicken_db.RATE_TYPES:
+            scored = errors[(method, rate_type)]
+            row[f'{rate_type}MAE'] = float(np.mean(scored)) if scored else None
+        row['Seconds'] = seconds[method]
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('Method')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest the rate forecaster against full-history polyfit.")
+    parser.add_argument('--db', default=chicken_db.DB_NAME, help="Database file (default: %(default)s)")
+    parser.add_argument('--horizon', type=int, default=1, help="Days ahead to predict")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_DAYS, help="Trailing window in days (0 = all history)")
+    parser.add_argument('--degree', type=int, default=DEFAULT_DEGREE)
+    args = parser.parse_args()
+
+    chicken_db.DB_NAME = args.db
+    rates = pd.read_sql_query("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date", chicken_db.get_db_connection())
+    print(backtest(rates, args.horizon, args.degree, args.window or None).to_string())
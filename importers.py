@@ -0,0 +1,386 @@
+import io
+import os
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+import pandas as pd
+import numpy as np
+import chicken_db
+import bill_math
+
+# --- Shared Parsing Helpers ---
+
+def parse_dates(values):
+    """
+    Parses a whole column of dates with chicken_db.date_key, once per distinct value, so
+    imports accept exactly what every other write site accepts (ISO or DATE_FORMATS).
+    Returns a Series of 'YYYY-MM-DD' strings with None where the value is not a date.
+    """
+    raw = pd.Series(values)
+    keys = {value: chicken_db._date_key_or_none(value) for value in raw.dropna().unique()}
+    return pd.Series([keys.get(value) for value in raw], index=raw.index, dtype=object)
+
+def _describe_rejects(df, mask, reason):
+    """(row number, reason) tuples for rejected rows; row numbers match the CSV (header = line 1)."""
+    return [(int(i) + 2, reason) for i in df.index[mask]]
+
+# --- Daily Rates Import ---
+
+RATE_IMPORT_COLUMNS = ['Date', 'TandoorRate', 'BoilerRate', 'EggRate']
+
+def prepare_rates(df, col_date, col_tandoor, col_boiler, col_egg):
+    """
+    Validates a daily-rates CSV as whole columns.
+    Returns (rates, rejects): a clean frame with RATE_IMPORT_COLUMNS (one row per date,
+    the last occurrence wins) and a list of (csv_line, reason) for skipped rows.
+    """
+    rates = pd.DataFrame({
+        'Date': parse_dates(df[col_date]),
+        'TandoorRate': pd.to_numeric(df[col_tandoor], errors='coerce'),
+        'BoilerRate': pd.to_numeric(df[col_boiler], errors='coerce'),
+        'EggRate': pd.to_numeric(df[col_egg], errors='coerce'),
+    }, index=df.index)
+
+    rejects = []
+    bad_date = rates['Date'].isna().to_numpy()
+    rejects += _describe_rejects(df, bad_date, "unparseable date")
+
+    values = rates[RATE_IMPORT_COLUMNS[1:]].to_numpy(dtype=float)
+    bad_rate = ~bad_date & (np.isnan(values).any(axis=1) | (values < 0).any(axis=1))
+    rejects += _describe_rejects(df, bad_rate, "missing or negative rate")
+
+    rates = rates[~(bad_date | bad_rate)]
+    rates = rates.drop_duplicates(subset='Date', keep='last').sort_values('Date')
+    return rates.reset_index(drop=True), sorted(rejects)
+
+def import_rates(rates):
+    """
+    Upserts prepared rates into RawData with one executemany, then recomputes the
+    bills of all touched dates in one pass. Everything runs in a single transaction.
+    Returns (rows_imported, bills_updated).
+    """
+    if rates.empty:
+        return 0, 0
+
+    rows = list(zip(
+        rates['Date'].tolist(),
+        rates['TandoorRate'].tolist(),
+        rates['BoilerRate'].tolist(),
+        rates['EggRate'].tolist()
+    ))
+
+    with chicken_db.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
+            ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
+        """, rows)
+        bills_updated = sum(chicken_db.recalculate_bill_entries(rates['Date']).values())
+
+    return len(rows), bills_updated
+
+# --- Wide-Format Bill Import ---
+
+def prepare_wide_bills(df, col_date, item_cols, supplier_name):
+    """
+    Melts a wide bill CSV (one row per date, one quantity column per item) into
+    long BillEntries rows. The column header is used as the item name.
+    Returns (bills, dates, rejects): bills has Date, SupplierName, ItemName, Qty for every
+    positive quantity; dates are all valid dates in the file (their old bills get replaced).
+    """
+    dates = parse_dates(df[col_date])
+    rejects = _describe_rejects(df, dates.isna().to_numpy(), "unparseable date")
+
+    wide = df[item_cols].copy()
+    wide.insert(0, 'Date', dates)
+    # A date listed twice: the later row replaces the earlier one, as a re-import would
+    wide = wide[wide['Date'].notna()].drop_duplicates(subset='Date', keep='last')
+
+    bills = wide.melt(id_vars='Date', value_vars=item_cols, var_name='ItemName', value_name='Qty')
+    bills['Qty'] = pd.to_numeric(bills['Qty'], errors='coerce').fillna(0.0)
+    bills = bills[bills['Qty'] > 0]
+    bills.insert(1, 'SupplierName', supplier_name)
+
+    return bills.sort_values(['Date', 'ItemName']).reset_index(drop=True), sorted(wide['Date'].tolist()), rejects
+
+def import_wide_bills(bills, dates, supplier_name):
+    """
+    Prices melted bill rows against RawData/Markups and writes them in one transaction:
+    one delete of the affected (supplier, date) set, one executemany for BillEntries and
+    one for the per-date VendorLedger bills. Vendor Rate defaults to the Expected Rate.
+    Returns (dates_imported, entries_inserted).
+    """
+    if not dates:
+        return 0, 0
+
+    dates_json = json.dumps(list(dates))
+
+    with chicken_db.transaction() as conn:
+        if not bills.empty:
+            rates = pd.read_sql_query(
+                "SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date IN (SELECT value FROM json_each(?))",
+                conn, params=(dates_json,))
+            rules = pd.read_sql_query(
+                "SELECT ItemName, " + ", ".join(chicken_db.RULE_COLUMNS) + " FROM Markups WHERE SupplierName = ?",
+                conn, params=(supplier_name,))
+            priced = bills.merge(rates, on='Date', how='left').merge(rules, on='ItemName', how='left')
+
+            expected = chicken_db.calculate_expected_rates(
+                priced[list(chicken_db.RATE_TYPES)].to_numpy(dtype=float),
+                *(priced[col].to_numpy(dtype=object) for col in chicken_db.RULE_COLUMNS)
+            )
+            qty = priced['Qty'].to_numpy(dtype=float)
+            vendor_rate = expected # Smart default: assume correct billing, verify later
+            amounts = bill_math.compute_bill_rows(qty, 0.0, expected, vendor_rate)
+            priced['VendorAmount'] = amounts['vendor_amount']
+
+            entry_rows = list(zip(
+                priced['Date'].tolist(), priced['SupplierName'].tolist(), priced['ItemName'].tolist(),
+                qty.tolist(), vendor_rate.tolist(), expected.tolist(),
+                amounts['variance'].tolist(), amounts['status'].tolist()
+            ))
+            totals = priced.groupby('Date', sort=True)['VendorAmount'].sum()
+            ledger_rows = [
+                (date, supplier_name, 'Bill', float(total), f"Imported Bill for {date}")
+                for date, total in totals.items()
+            ]
+        else:
+            entry_rows, ledger_rows = [], []
+
+        conn.execute(
+            "DELETE FROM BillEntries WHERE SupplierName = ? AND Date IN (SELECT value FROM json_each(?))",
+            (supplier_name, dates_json))
+        conn.execute(
+            "DELETE FROM VendorLedger WHERE SupplierName = ? AND TransactionType = 'Bill' AND Date IN (SELECT value FROM json_each(?))",
+            (supplier_name, dates_json))
+
+        conn.executemany("""
+            INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, entry_rows)
+        conn.executemany("""
+            INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+            VALUES (?, ?, ?, ?, ?)
+        """, ledger_rows)
+
+    return len(dates), len(entry_rows)
+
+# --- Import Jobs ---
+# Bodies for jobs.JobRunner.submit(): parse and validate on the job thread, then write in
+# batches of dates through job.write(). Each batch is its own transaction, so progress is
+# visible and a cancelled job stops between batches with every earlier batch complete.
+
+IMPORT_BATCH_DATES = 100
+MAX_REPORTED_REJECTS = 100
+
+def _reject_summary(rejects):
+    return {'rejected': len(rejects), 'rejects': rejects[:MAX_REPORTED_REJECTS]}
+
+def rates_import_job(job, df, col_date, col_tandoor, col_boiler, col_egg):
+    """Job body: prepare_rates() then import_rates() per batch."""
+    rates, rejects = prepare_rates(df, col_date, col_tandoor, col_boiler, col_egg)
+    job.set_progress(0, len(rates), "Importing rates")
+
+    imported = bills_updated = 0
+    for start in range(0, len(rates), IMPORT_BATCH_DATES):
+        job.check_cancelled()
+        batch_imported, batch_updated = job.write(import_rates, rates.iloc[start:start + IMPORT_BATCH_DATES])
+        imported += batch_imported
+        bills_updated += batch_updated
+        job.set_progress(imported)
+    return {'imported': imported, 'bills_updated': bills_updated, **_reject_summary(rejects)}
+
+def wide_bills_import_job(job, df, col_date, item_cols, supplier_name):
+    """Job body: prepare_wide_bills() then import_wide_bills() per batch of dates."""
+    bills, dates, rejects = prepare_wide_bills(df, col_date, item_cols, supplier_name)
+    job.set_progress(0, len(dates), f"Importing bills for {supplier_name}")
+
+    imported_dates = entries = 0
+    for start in range(0, len(dates), IMPORT_BATCH_DATES):
+        job.check_cancelled()
+        batch_dates = dates[start:start + IMPORT_BATCH_DATES]
+        batch_bills = bills[bills['Date'].isin(batch_dates)]
+        batch_imported, batch_entries = job.write(import_wide_bills, batch_bills, batch_dates, supplier_name)
+        imported_dates += batch_imported
+        entries += batch_entries
+        job.set_progress(imported_dates)
+    return {'dates_imported': imported_dates, 'entries_inserted': entries, **_reject_summary(rejects)}
+
+# --- Multi-File Import ---
+# A folder of rate sheets (like Paper Rate.csv) and per-supplier bill files (like Bill.csv).
+# Files are read and validated in parallel worker processes, one file per task; the calling
+# process is the only writer. It commits finished files in submission order, rate sheets
+# first (so bills are priced with the new rates), every file that is ready in one
+# transaction, while the workers keep parsing the rest.
+
+FILE_KINDS = ('rates', 'wide_bills')
+RATE_COLUMN_KEYWORDS = {'TandoorRate': 'tandoor', 'BoilerRate': 'boiler', 'EggRate': 'egg'}
+
+def guess_column(columns, keywords):
+    """First column whose name contains one of the keywords (case-insensitive), or None."""
+    for col in columns:
+        if any(k.lower() in str(col).lower() for k in keywords):
+            return col
+    return None
+
+def detect_file_kind(columns):
+    """'rates' for a date column plus exactly one Tandoor, Boiler and Egg column, else 'wide_bills'."""
+    others = [col for col in columns if col != guess_column(columns, ['date'])]
+    if len(others) == len(RATE_COLUMN_KEYWORDS) and all(
+            guess_column(others, [keyword]) for keyword in RATE_COLUMN_KEYWORDS.values()):
+        return 'rates'
+    return 'wide_bills'
+
+def supplier_for_file(file_name, suppliers):
+    """The longest supplier name contained in the file name (case-insensitive), or None."""
+    stem = os.path.splitext(os.path.basename(file_name))[0].lower()
+    matches = [name for name in suppliers if name.lower() in stem]
+    return max(matches, key=len) if matches else None
+
+def _read_source(source, **kwargs):
+    return pd.read_csv(io.BytesIO(source) if isinstance(source, bytes) else source, **kwargs)
+
+def parse_import_file(spec):
+    """
+    Worker task: reads and validates one file. spec has 'name', 'source' (a path or the
+    file's bytes), 'kind' (None = detect) and 'supplier' for bill files. Touches no database.
+    """
+    df = _read_source(spec['source'])
+    kind = spec.get('kind') or detect_file_kind(df.columns)
+    col_date = guess_column(df.columns, ['date'])
+    if col_date is None:
+        raise ValueError("no Date column")
+
+    if kind == 'rates':
+        rate_cols = [guess_column(df.columns, [keyword]) for keyword in RATE_COLUMN_KEYWORDS.values()]
+        if None in rate_cols:
+            raise ValueError("needs Tandoor, Boiler and Egg columns")
+        rates, rejects = prepare_rates(df, col_date, *rate_cols)
+        return {'kind': kind, 'rates': rates, 'rows': len(rates), 'rejects': rejects}
+
+    if not spec.get('supplier'):
+        raise ValueError("no supplier for this bill file")
+    item_cols = [col for col in df.columns if col != col_date]
+    bills, dates, rejects = prepare_wide_bills(df, col_date, item_cols, spec['supplier'])
+    return {'kind': kind, 'bills': bills, 'dates': dates, 'rows': len(dates), 'rejects': rejects}
+
+def _detect_spec_kind(spec):
+    """Kind from the header row alone; unreadable files are left to the worker to report."""
+    try:
+        return detect_file_kind(_read_source(spec['source'], nrows=0).columns)
+    except Exception:
+        return 'wide_bills'
+
+def _write_parsed(parsed):
+    """
+    Commits parsed files in one transaction, each as its own import, so the totals are
+    those of importing the files one by one whichever files happened to be ready together.
+    """
+    totals = {'rates_imported': 0, 'bills_updated': 0, 'bill_dates_imported': 0, 'entries_inserted': 0}
+    with chicken_db.transaction():
+        for item in parsed:
+            if item['kind'] == 'rates':
+                imported, updated = import_rates(item['rates'])
+                totals['rates_imported'] += imported
+                totals['bills_updated'] += updated
+            else:
+                dates_imported, entries = import_wide_bills(item['bills'], item['dates'], item['supplier'])
+                totals['bill_dates_imported'] += dates_imported
+                totals['entries_inserted'] += entries
+    return totals
+
+def import_files(specs, workers=None, write=None, progress=None):
+    """
+    Parses specs (see parse_import_file) in a process pool and writes them as described
+    above. write(fn, *args) runs the writes (default: directly; jobs pass job.write) and
+    progress(files_done, files_total) is called after every commit.
+    Returns {'files': [per-file summary], 'rates_imported', 'bills_updated', ...}.
+    A file that fails to parse is reported and skipped; the others are still imported.
+    """
+    write = write or (lambda fn, *args: fn(*args))
+    specs = [spec if spec.get('kind') else {**spec, 'kind': _detect_spec_kind(spec)} for spec in specs]
+    # Rate sheets first; a stable sort keeps the given order within each kind
+    specs = sorted(specs, key=lambda spec: spec['kind'] != 'rates')
+    summaries = [{'name': spec['name'], 'kind': spec.get('kind'), 'supplier': spec.get('supplier'),
+                  'rows': 0, 'rejected': 0, 'rejects': [], 'error': None} for spec in specs]
+    totals = {'rates_imported': 0, 'bills_updated': 0, 'bill_dates_imported': 0, 'entries_inserted': 0}
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+
+    # spawn: forking the Streamlit server (with its threads) is not safe
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    try:
+        if pool:
+            futures = [pool.submit(parse_import_file, spec) for spec in specs]
+        written = 0
+        while written < len(specs):
+            if pool:
+                wait([futures[written]])
+                ready = []
+                while written + len(ready) < len(specs) and futures[written + len(ready)].done():
+                    ready.append(written + len(ready))
+            else:
+                ready = [written]
+
+            parsed = []
+            for i in ready:
+                summary = summaries[i]
+                try:
+                    result = futures[i].result() if pool else parse_import_file(specs[i])
+                except Exception as e:
+                    summary['error'] = f"{type(e).__name__}: {e}"
+                    continue
+                summary.update(kind=result['kind'], rows=result['rows'], **_reject_summary(result['rejects']))
+                parsed.append({**result, 'supplier': specs[i].get('supplier')})
+            if parsed:
+                for key, value in write(_write_parsed, parsed).items():
+                    totals[key] += value
+            written += len(ready)
+            if progress:
+                progress(written, len(specs))
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+    return {'files': summaries, **totals}
+
+def files_import_job(job, specs, workers=None):
+    """Job body: import_files() with progress per commit and cancellation between commits."""
+    job.set_progress(0, len(specs), "Importing files")
+
+    def progress(done, total):
+        job.set_progress(done)
+        if done < total:
+            job.check_cancelled()
+
+    return import_files(specs, workers, write=job.write, progress=progress)
+
+def file_specs(paths, supplier=None, suppliers=()):
+    """Specs for CSV files and folders of CSV files; bill files get supplier, else the one named in the file name."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.csv'))
+        else:
+            files.append(path)
+    return [{'name': os.path.basename(path), 'source': path, 'kind': None,
+             'supplier': supplier or supplier_for_file(path, suppliers)} for path in files]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import rate sheets and per-supplier wide bill CSVs.")
+    parser.add_argument('paths', nargs='+', help="CSV files or folders of CSV files")
+    parser.add_argument('--supplier', help="Supplier of every bill file (default: the supplier named in each file name)")
+    parser.add_argument('--workers', type=int, help="Parser processes (default: one per CPU)")
+    parser.add_argument('--db', default=chicken_db.DB_NAME, help="Database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    chicken_db.DB_NAME = args.db
+    chicken_db.initialize_db()
+    suppliers, _ = chicken_db.fetch_suppliers_and_items()
+    summary = import_files(file_specs(args.paths, args.supplier, suppliers), args.workers)
+    for f in summary['files']:
+        if f['error']:
+            print(f"{f['name']}: FAILED ({f['error']})")
+        else:
+            print(f"{f['name']}: {f['kind']}{' for ' + f['supplier'] if f['kind'] == 'wide_bills' else ''}, "
+                  f"{f['rows']} rows, {f['rejected']} skipped")
+    print(f"Rates imported: {summary['rates_imported']} (bills recalculated: {summary['bills_updated']}); "
+          f"bill dates imported: {summary['bill_dates_imported']} ({summary['entries_inserted']} entries)")
@@ -0,0 +1,280 @@
+import json
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+import chicken_db
+
+# --- Background Jobs ---
+# Long imports and recomputes run as jobs on a small thread pool, so the Streamlit script
+# returns at once and polls the job instead of blocking (and being rerun mid-import).
+# Job bodies parse and price on the pool, but every database write goes through
+# job.write(), which runs it on the runner's single writer thread: jobs never contend
+# with each other for the SQLite write lock. A job's record (status, progress, result)
+# lives in memory while it runs and is saved to the Jobs table when it starts and ends.
+# Several processes (Streamlit servers) may share the table: each row names its owner
+# runner, which refreshes the row's heartbeat while the job is unfinished. Only rows whose
+# heartbeat has gone stale, i.e. whose process has exited, are marked interrupted.
+
+JOB_WORKERS = 2
+HEARTBEAT_SECONDS = 10
+STALE_AFTER_SECONDS = 60 # Unfinished rows without a heartbeat for this long are reclaimed
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_INTERRUPTED = 'interrupted' # Process ended while the job was queued or running
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED, STATUS_INTERRUPTED)
+
+def _now(offset_seconds=0):
+    return (datetime.now() + timedelta(seconds=offset_seconds)).isoformat(timespec='seconds')
+
+class JobCancelled(Exception):
+    """Raised by Job.check_cancelled() once cancellation was requested."""
+
+class Job:
+    """One submitted job. The body receives it as its first argument."""
+
+    def __init__(self, runner, kind, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.status = STATUS_QUEUED
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self._runner = runner
+        self._cancel_requested = threading.Event()
+
+    # --- Called from the job body ---
+
+    def set_progress(self, done, total=None, message=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """Call between steps; stops the job there if cancel() was requested."""
+        if self._cancel_requested.is_set():
+            raise JobCancelled()
+
+    def write(self, fn, *args, **kwargs):
+        """Runs fn on the writer thread (fn opens its own transaction) and returns its result."""
+        return self._runner.run_write(fn, *args, **kwargs)
+
+    # --- Status ---
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    def snapshot(self):
+        return {
+            'id': self.id, 'kind': self.kind, 'label': self.label, 'status': self.status,
+            'done': self.done, 'total': self.total, 'message': self.message,
+            'result': self.result, 'error': self.error,
+            'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at,
+        }
+
+# --- Job Records ---
+
+_JOB_COLUMNS = "JobID, Kind, Label, Status, ProgressDone, ProgressTotal, Message, Result, Error, CreatedAt, StartedAt, FinishedAt"
+
+def _save_job(record, owner):
+    with chicken_db.transaction() as conn:
+        conn.execute(f"""
+            INSERT INTO Jobs ({_JOB_COLUMNS}, Owner, HeartbeatAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(JobID) DO UPDATE SET
+                Status = excluded.Status, ProgressDone = excluded.ProgressDone, ProgressTotal = excluded.ProgressTotal,
+                Message = excluded.Message, Result = excluded.Result, Error = excluded.Error,
+                StartedAt = excluded.StartedAt, FinishedAt = excluded.FinishedAt, HeartbeatAt = excluded.HeartbeatAt
+        """, (
+            record['id'], record['kind'], record['label'], record['status'], record['done'], record['total'],
+            record['message'], None if record['result'] is None else json.dumps(record['result'], default=str),
+            record['error'], record['created_at'], record['started_at'], record['finished_at'], owner, _now(),
+        ))
+
+def _beat(owner):
+    """
+    Refreshes the heartbeat of this runner's unfinished jobs. No cached read selects
+    HeartbeatAt, so the beat leaves the write generation (and every cache) alone.
+    """
+    with chicken_db.transaction(bump_generation=False) as conn:
+        conn.execute("UPDATE Jobs SET HeartbeatAt = ? WHERE Owner = ? AND Status IN (?, ?)",
+                     (_now(), owner, STATUS_QUEUED, STATUS_RUNNING))
+
+def _interrupt_stale_jobs(owner):
+    """Marks unfinished jobs of other runners interrupted once their heartbeat is stale (their process exited)."""
+    with chicken_db.transaction() as conn:
+        conn.execute("""
+            UPDATE Jobs SET Status = ?, FinishedAt = ?
+            WHERE Status IN (?, ?) AND Owner IS NOT ?
+              AND COALESCE(HeartbeatAt, StartedAt, CreatedAt) < ?
+        """, (STATUS_INTERRUPTED, _now(), STATUS_QUEUED, STATUS_RUNNING, owner, _now(-STALE_AFTER_SECONDS)))
+
+def _record_from_row(row):
+    (job_id, kind, label, status, done, total, message, result, error, created_at, started_at, finished_at) = row
+    return {
+        'id': job_id, 'kind': kind, 'label': label, 'status': status,
+        'done': done, 'total': total, 'message': message,
+        'result': None if result is None else json.loads(result), 'error': error,
+        'created_at': created_at, 'started_at': started_at, 'finished_at': finished_at,
+    }
+
+# --- Runner ---
+
+class JobRunner:
+    """Thread pool for job bodies plus one writer thread that runs every job write in order."""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:12]}"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name='job-writer', daemon=True)
+        self._writer.start()
+        self._jobs = {} # Key: job id -> Job (submitted by this process)
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.run_write(_interrupt_stale_jobs, self.owner)
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(HEARTBEAT_SECONDS):
+            with self._lock:
+                unfinished = any(job.status not in FINISHED_STATUSES for job in self._jobs.values())
+            try:
+                if unfinished:
+                    self.run_write(_beat, self.owner)
+                self.run_write(_interrupt_stale_jobs, self.owner)
+            except Exception:
+                pass # Database busy or closed; try again on the next beat
+
+    def _writer_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        chicken_db.close_db_connection()
+
+    def run_write(self, fn, *args, **kwargs):
+        """Runs fn on the writer thread, waits for it and returns its result (or raises its error)."""
+        if threading.current_thread() is self._writer:
+            return fn(*args, **kwargs)
+        future = Future()
+        self._writes.put((future, fn, args, kwargs))
+        return future.result()
+
+    def submit(self, kind, label, body, *args, **kwargs):
+        """
+        Queues body(job, *args, **kwargs) and returns the job id at once.
+        The body reports with job.set_progress(), calls job.check_cancelled() between steps,
+        writes through job.write() and returns a JSON-serializable result.
+        """
+        job = Job(self, kind, label)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.run_write(_save_job, job.snapshot(), self.owner)
+        future = self._pool.submit(self._run, job, body, args, kwargs)
+        with self._lock:
+            self._futures[job.id] = future
+        return job.id
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = _now()
+        self.run_write(_save_job, job.snapshot(), self.owner)
+
+    def _run(self, job, body, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, STATUS_CANCELLED)
+            return
+        job.status = STATUS_RUNNING
+        job.started_at = _now()
+        self.run_write(_save_job, job.snapshot(), self.owner)
+        try:
+            job.result = body(job, *args, **kwargs)
+            status = STATUS_SUCCEEDED
+        except JobCancelled:
+            status = STATUS_CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            status = STATUS_FAILED
+        finally:
+            # Pool threads are reused; give back their connection (and any read snapshot)
+            chicken_db.close_db_connection()
+        self._finish(job, status)
+
+    def cancel(self, job_id):
+        """
+        Requests cancellation. A queued job never starts; a running one stops at its next
+        check_cancelled(). Writes it already committed stay. Returns False if not running here.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+        job._cancel_requested.set()
+        if future is not None and future.cancel():
+            self._finish(job, STATUS_CANCELLED)
+        return True
+
+    def get(self, job_id):
+        """Status dict of a job (live if it belongs to this process, else its saved record), or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        rows = chicken_db.read_rows(f"SELECT {_JOB_COLUMNS} FROM Jobs WHERE JobID = ?", (job_id,))
+        return _record_from_row(rows[0]) if rows else None
+
+    def recent(self, kinds=None, limit=10):
+        """Newest jobs first, optionally only of the given kinds."""
+        sql = f"SELECT {_JOB_COLUMNS} FROM Jobs"
+        params = ()
+        if kinds:
+            sql += f" WHERE Kind IN ({', '.join('?' * len(kinds))})"
+            params = tuple(kinds)
+        rows = chicken_db.read_rows(sql + " ORDER BY CreatedAt DESC, rowid DESC LIMIT ?", (*params, limit))
+        with self._lock:
+            live = {job_id: job.snapshot() for job_id, job in self._jobs.items()}
+        return [live.get(row[0]) or _record_from_row(row) for row in rows]
+
+    def shutdown(self, wait=True):
+        self._stopping.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._writes.put(None)
+        if wait:
+            self._writer.join()
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """The process-wide runner, started on first use (shared by all Streamlit sessions)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            chicken_db.initialize_db()
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+
+class QueryCache:
+    """
+    LRU cache of read-query results, keyed on (database, sql, params) and stamped with
+    the database write generation at the time they were computed. An entry is only
+    served while the generation is unchanged, so any committed write (from this
+    process or another one) invalidates everything older than it.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (generation, value, compute_seconds)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0 # misses caused by a newer generation
+        self.bypassed = 0 # reads inside an open write transaction
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(db_name, sql, params):
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        return (db_name, sql, tuple(params))
+
+    def get_or_compute(self, key, generation, compute):
+        """Returns the cached value for key at this generation, or stores compute()'s result."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == generation:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += entry[2]
+                    return entry[1]
+                self.stale += 1
+            self.misses += 1
+
+        started = time.perf_counter()
+        value = compute()
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._entries[key] = (generation, value, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def count_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'bypassed': self.bypassed,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'saved_seconds': self.saved_seconds,
+            }
+
+class ExpectedRateCache:
+    """
+    Bounded LRU of expected rates keyed on (date, supplier, item). Unlike QueryCache it is
+    not dropped on every write: entries are invalidated only when their date's paper rates,
+    their markup rule or their vendor change (see chicken_db.cached_expected_rates, used by
+    fetch_bill_context).
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # (date, supplier, item) -> expected rate
+        self._lock = threading.Lock()
+        self.db_name = None
+        self.last_change = None # Last RateChanges Seq applied (see chicken_db)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        """Cached rate or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, change=None):
+        """
+        Stores value. change: the last_change the value was computed after; if changes were
+        applied since, the value may predate one of them and is not stored.
+        """
+        with self._lock:
+            if change is not None and change != self.last_change:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop(self, matches):
+        with self._lock:
+            keys = [key for key in self._entries if matches(key)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidated += len(keys)
+        return len(keys)
+
+    # --- Invalidation hooks ---
+
+    def invalidate_dates(self, dates):
+        """Paper rates of these dates changed."""
+        dates = set(dates)
+        return self._drop(lambda key: key[0] in dates)
+
+    def invalidate_items(self, supplier, items):
+        """Markup rules of these items of the supplier changed."""
+        items = set(items)
+        return self._drop(lambda key: key[1] == supplier and key[2] in items)
+
+    def invalidate_vendor(self, supplier):
+        """The vendor was deleted or renamed."""
+        return self._drop(lambda key: key[1] == supplier)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidated': self.invalidated,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
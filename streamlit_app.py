@@ -7,6 +7,7 @@ st.set_page_config(
 )
 
 # Initialize database
+chicken_db.reset_profile()
 chicken_db.initialize_db()
 
 st.title("🐔 Chicken Rate & Billing Tracker")
@@ -20,16 +21,41 @@ tabs = st.tabs([
 
 with tabs[0]:
     import views.daily_rates as daily_rates
-    daily_rates.render()
+    with chicken_db.profile_render("daily_rates"):
+        daily_rates.render()
 
 with tabs[1]:
     import views.bill_entry as bill_entry
-    bill_entry.render()
+    with chicken_db.profile_render("bill_entry"):
+        bill_entry.render()
 
 with tabs[2]:
     import views.vendor_management as vendor_management
-    vendor_management.render()
+    with chicken_db.profile_render("vendor_management"):
+        vendor_management.render()
 
 with tabs[3]:
     import views.dashboard as dashboard
-    dashboard.render()
+    with chicken_db.profile_render("dashboard"):
+        dashboard.render()
+
+# Performance panel (only with CHICKEN_TRACKER_PROFILE=1 set before launching)
+if chicken_db.PROFILE_ENABLED:
+    with st.expander("Performance"):
+        renders = chicken_db.profile_renders()
+        st.write(f"**Last rerun:** {sum(r['ms'] for r in renders):,.1f} ms across {len(renders)} views")
+        st.dataframe(renders, use_container_width=True, hide_index=True,
+                     column_config={"ms": st.column_config.NumberColumn("Render ms", format="%.1f"),
+                                    "db_ms": st.column_config.NumberColumn("DB ms", format="%.1f")})
+        
+        st.write("**Top queries**")
+        st.dataframe(chicken_db.profile_top_queries(), use_container_width=True, hide_index=True,
+                     column_config={"total_ms": st.column_config.NumberColumn("Total ms", format="%.2f"),
+                                    "max_ms": st.column_config.NumberColumn("Max ms", format="%.2f")})
+        
+        cache = chicken_db.query_cache_stats()
+        st.caption(f"Query cache: {cache['hits']} hits / {cache['misses']} misses "
+                   f"({cache['hit_rate']:.0%}), {cache['saved_seconds'] * 1000:,.0f} ms saved since start.")
+        rates = chicken_db.expected_rate_cache_stats()
+        st.caption(f"Expected-rate cache: {rates['entries']} entries, {rates['hits']} hits / {rates['misses']} misses "
+                   f"({rates['hit_rate']:.0%}), {rates['invalidated']} invalidated by rate/markup changes.")
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+import unittest
+import chicken_db
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test against a fresh, fully migrated database in a temporary directory."""
+
+    schema_version = None # Stop migrating at this user_version (None: run every migration)
+
+    def setUp(self):
+        self._db_dir = tempfile.mkdtemp()
+        self._saved_db_name = chicken_db.DB_NAME
+        chicken_db.DB_NAME = os.path.join(self._db_dir, 'test.db')
+        if self.schema_version is None:
+            chicken_db.initialize_db()
+        else:
+            with chicken_db.transaction() as conn:
+                cursor = conn.cursor()
+                for version, _, step in chicken_db.MIGRATIONS[:self.schema_version]:
+                    step(cursor)
+                    cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+    def tearDown(self):
+        chicken_db.close_db_connection()
+        chicken_db.DB_NAME = self._saved_db_name
+        shutil.rmtree(self._db_dir, ignore_errors=True)
+
+    def add_supplier(self, name, vendor_type='Chicken'):
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO Suppliers (SupplierName, VendorType) VALUES (?, ?)", (name, vendor_type))
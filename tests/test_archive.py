@@ -0,0 +1,80 @@
+import unittest
+import pandas as pd
+import archive
+import chicken_db
+from tests.support import DatabaseTestCase
+
+@unittest.skipUnless(archive.ARCHIVE_AVAILABLE, "the columnar archive needs pyarrow")
+class ArchiveTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        archive.clear_range_cache()
+        self.add_supplier('V')
+        self.add_supplier('W')
+        days = [f"2024-{month:02d}-{day:02d}" for month in (1, 2, 3) for day in (1, 15, 28)]
+        with chicken_db.transaction() as conn:
+            conn.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)",
+                             [(d, 100.0 + i, 90.0 + i, 500.0 + i) for i, d in enumerate(days)])
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(d, s, item, 2.0, 120.0 + i, 120.0, 2.0 * i, 'Okay' if i == 0 else 'Variance')
+                  for i, d in enumerate(days) for s in ('V', 'W') for item in ('Tandoori', 'Egg')])
+            conn.executemany("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES (?, ?, ?, ?, ?)",
+                             [(d, 'V', 'Payment', -100.0 - i, None if i % 2 else f"Paid {d}") for i, d in enumerate(days)])
+
+    def live(self, table, start=None, end=None, filters=()):
+        # read_range() puts Date first
+        columns = ['Date'] + [name for name, _ in archive.ARCHIVE_SCHEMAS[table] if name != 'Date']
+        lo = '' if start is None else start
+        hi = '9999-99' if end is None else (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        return archive._conform(table, archive._read_live(table, columns, lo, hi, list(filters)))
+
+    def stale_months(self):
+        return chicken_db.query_all("SELECT TableName, Month FROM ArchivedMonths WHERE Stale = 1 ORDER BY 1, 2")
+
+    def test_round_trip_matches_live_rows(self):
+        exported = archive.archive_closed_months(before='2024-03-10')
+        self.assertEqual(exported, [(table, month, rows) for table, rows in (('RawData', 3), ('BillEntries', 12), ('VendorLedger', 3))
+                                    for month in ('2024-01', '2024-02')])
+        self.assertEqual(archive.pending_months(before='2024-03-10'), [])
+
+        for table in chicken_db.ARCHIVED_TABLES:
+            for start, end in ((None, None), ('2024-01-15', '2024-02-15'), ('2024-02-20', '2024-03-20')):
+                with self.subTest(table=table, start=start, end=end):
+                    pd.testing.assert_frame_equal(archive.read_range(table, start, end), self.live(table, start, end))
+
+        frame = archive.read_range('BillEntries', filters=[('SupplierName', '=', 'W'), ('Variance', '!=', 0)])
+        pd.testing.assert_frame_equal(frame, self.live('BillEntries', filters=[('SupplierName', '=', 'W'), ('Variance', '!=', 0)]))
+        self.assertEqual(str(frame['Date'].dtype), 'datetime64[ns]')
+        self.assertEqual(str(frame['SupplierName'].dtype), 'category')
+
+    def test_writes_to_archived_months_mark_them_stale(self):
+        archive.archive_closed_months(before='2024-03-10')
+        self.assertEqual(self.stale_months(), [])
+
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES ('2024-01-20', 1, 1, 1)")
+        self.assertEqual(self.stale_months(), [('RawData', '2024-01')])
+
+        with chicken_db.transaction() as conn:
+            conn.execute("DELETE FROM VendorLedger WHERE Date = '2024-02-15'")
+        # A row moved from an archived month to an open one stales only the archived one
+        with chicken_db.transaction() as conn:
+            conn.execute("UPDATE BillEntries SET Date = '2024-03-02' WHERE Date = '2024-02-01' AND SupplierName = 'V' AND ItemName = 'Egg'")
+        self.assertEqual(self.stale_months(), [('BillEntries', '2024-02'), ('RawData', '2024-01'), ('VendorLedger', '2024-02')])
+
+        # Stale months are read from SQLite, so the edits show up at once
+        for table in chicken_db.ARCHIVED_TABLES:
+            pd.testing.assert_frame_equal(archive.read_range(table), self.live(table))
+
+        # Re-exporting makes them fresh again
+        self.assertEqual(sorted(archive.pending_months(before='2024-03-10')),
+                         [('BillEntries', '2024-02'), ('RawData', '2024-01'), ('VendorLedger', '2024-02')])
+        archive.archive_closed_months(before='2024-03-10')
+        self.assertEqual(self.stale_months(), [])
+        for table in chicken_db.ARCHIVED_TABLES:
+            pd.testing.assert_frame_equal(archive.read_range(table), self.live(table))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+import bill_math
+
+# --- Reference ---
+# The per-row math of the Tkinter grid that compute_bill_rows() replaced.
+
+def reference_bill_row(q_recv, q_dmg, e_rate, v_rate):
+    """(net_qty, exp_amount, vendor_amount, variance, status) of one row."""
+    net_qty = max(0.0, q_recv - q_dmg)
+    exp_amount = round(net_qty * e_rate, 2)
+    vendor_amount = round(net_qty * v_rate, 2)
+    variance_amount = round(vendor_amount - exp_amount, 2)
+
+    status = 'N/A'
+    if net_qty > 0.0 and e_rate > 0.0:
+        variance_pct = (variance_amount / exp_amount) * 100 if exp_amount else 0.0
+        if variance_pct > 5.0:
+            status = 'HIGH (+)'
+        elif variance_pct < -5.0:
+            status = 'LOW (-)'
+        elif variance_amount != 0.0:
+            status = 'Variance'
+        else:
+            status = 'Okay'
+    elif e_rate == 0.0:
+        status = 'No Rate Data'
+    return net_qty, exp_amount, vendor_amount, variance_amount, status
+
+def random_inputs(rng, n):
+    def column(low, high, zero_share):
+        values = np.round(rng.uniform(low, high, n), 2)
+        values[rng.random(n) < zero_share] = 0.0
+        return values
+    return column(0, 50, 0.1), column(0, 10, 0.5), column(0, 700, 0.1), column(0, 750, 0.1)
+
+class ComputeBillRowsTest(unittest.TestCase):
+    def test_matches_per_row_math(self):
+        rng = np.random.default_rng(11)
+        qty_recv, qty_dmg, expected_rate, vendor_rate = random_inputs(rng, 20000)
+        # Vendor rate equal to (or within 5% of) the expected rate exercises every status
+        vendor_rate[::4] = expected_rate[::4]
+        vendor_rate[1::4] = np.round(expected_rate[1::4] * 1.03, 2)
+
+        rows = bill_math.compute_bill_rows(qty_recv, qty_dmg, expected_rate, vendor_rate)
+        for i in range(len(qty_recv)):
+            # Python floats, as the Tkinter grid had: round() on np.float64 would be numpy's rounding
+            reference = reference_bill_row(float(qty_recv[i]), float(qty_dmg[i]), float(expected_rate[i]), float(vendor_rate[i]))
+            actual = (float(rows['net_qty'][i]), float(rows['exp_amount'][i]), float(rows['vendor_amount'][i]),
+                      float(rows['variance'][i]), str(rows['status'][i]))
+            self.assertEqual(actual, reference, f"row {i}")
+        self.assertEqual(set(rows['status']), {bill_math.STATUS_HIGH, bill_math.STATUS_LOW, bill_math.STATUS_VARIANCE,
+                                               bill_math.STATUS_OKAY, bill_math.STATUS_NO_RATE, bill_math.STATUS_NO_QTY})
+
+    def test_round2_matches_builtin_round(self):
+        rng = np.random.default_rng(12)
+        values = np.concatenate([rng.uniform(-1000, 1000, 10000), np.arange(0, 100, 0.005)])
+        np.testing.assert_array_equal(bill_math.round2(values), [round(float(v), 2) for v in values])
+
+class StatusOrderTest(unittest.TestCase):
+    """
+    The precedence both bill grids share. The Streamlit grid used to check the quantity
+    first ('N/A' for a row without quantity, even without a rate) and said 'No Rate'.
+    """
+
+    def status(self, qty_recv, expected_rate, vendor_rate):
+        return str(bill_math.compute_bill_rows(qty_recv, 0.0, expected_rate, vendor_rate)['status'][0])
+
+    def test_missing_rate_wins_over_missing_quantity(self):
+        self.assertEqual(self.status(0.0, 0.0, 0.0), bill_math.STATUS_NO_RATE)
+        self.assertEqual(self.status(0.0, 0.0, 120.0), 'No Rate Data')
+
+    def test_rate_without_quantity(self):
+        self.assertEqual(self.status(0.0, 100.0, 120.0), bill_math.STATUS_NO_QTY)
+        self.assertEqual(bill_math.STATUS_NO_QTY, 'N/A')
+
+    def test_quantity_without_rate(self):
+        self.assertEqual(self.status(3.0, 0.0, 120.0), bill_math.STATUS_NO_RATE)
+
+    def test_priced_rows_are_graded_by_variance(self):
+        self.assertEqual(self.status(2.0, 100.0, 106.0), bill_math.STATUS_HIGH)
+        self.assertEqual(self.status(2.0, 100.0, 94.0), bill_math.STATUS_LOW)
+        self.assertEqual(self.status(2.0, 100.0, 101.0), bill_math.STATUS_VARIANCE)
+        self.assertEqual(self.status(2.0, 100.0, 100.0), bill_math.STATUS_OKAY)
+
+if __name__ == '__main__':
+    unittest.main()
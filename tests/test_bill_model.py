@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import bill_math
+from tests.test_bill_math import random_inputs
+
+class BillModelTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(13)
+        qty_recv, _, expected_rate, vendor_rate = random_inputs(rng, 300)
+        self.items = [f"Item {i}" for i in range(300)]
+        self.model = bill_math.BillModel(self.items, expected_rate, qty_recv=qty_recv, vendor_rate=vendor_rate)
+        self.rng = rng
+
+    def assert_matches_fresh_compute(self):
+        m = self.model
+        fresh = bill_math.compute_bill_rows(m.qty_recv, m.qty_dmg, m.expected_rate, m.vendor_rate)
+        for field in ('net_qty', *bill_math.BILL_AMOUNT_FIELDS):
+            np.testing.assert_array_equal(getattr(m, field), fresh[field])
+        np.testing.assert_array_equal(m.status.astype(str), fresh['status'])
+        self.assertEqual(m.total_exp_amount, round(sum(round(float(v), 2) for v in fresh['exp_amount']), 2))
+        self.assertEqual(m.total_vendor_amount, round(sum(round(float(v), 2) for v in fresh['vendor_amount']), 2))
+        self.assertEqual(m.total_variance, round(sum(round(float(v), 2) for v in fresh['variance']), 2))
+
+    def test_initial_rows(self):
+        self.assert_matches_fresh_compute()
+
+    def test_running_totals_after_many_edits(self):
+        for _ in range(5000):
+            item = self.items[self.rng.integers(len(self.items))]
+            field = bill_math.BILL_INPUT_FIELDS[self.rng.integers(3)]
+            self.model.set_input(item, field, round(float(self.rng.uniform(0, 60)), 2))
+        self.assert_matches_fresh_compute()
+
+    def test_set_input_rejects_derived_fields(self):
+        with self.assertRaises(ValueError):
+            self.model.set_input(self.items[0], 'net_qty', 1.0)
+
+    def test_entries_are_rows_with_net_quantity(self):
+        item = self.items[0]
+        self.model.set_input(item, 'qty_recv', 4.0)
+        self.model.set_input(item, 'qty_dmg', 4.0)
+        entries = self.model.entries()
+        self.assertNotIn(item, [entry[0] for entry in entries])
+        self.assertEqual(len(entries), int((self.model.net_qty > 0).sum()))
+
+        i = self.model.index(self.items[1])
+        self.model.set_input(self.items[1], 'qty_recv', 2.5)
+        name, qty, vendor_rate, expected_rate, variance, status = dict((e[0], e) for e in self.model.entries())[self.items[1]]
+        self.assertEqual((qty, vendor_rate, expected_rate), (2.5, self.model.vendor_rate[i], self.model.expected_rate[i]))
+        self.assertEqual((variance, status), (self.model.variance[i], self.model.status[i]))
+
+    def test_empty_model(self):
+        model = bill_math.BillModel([], [])
+        self.assertEqual((len(model), model.total_vendor_amount, model.entries()), (0, 0.0, []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import sqlite3
+import unittest
+import chicken_db
+from tests.support import DatabaseTestCase
+
+class NormalizeDatesTest(DatabaseTestCase):
+    """Migration 5 on a version-4 database holding several spellings of the same dates."""
+
+    schema_version = 4
+
+    def setUp(self):
+        super().setUp()
+        self.add_supplier('V')
+        with chicken_db.transaction() as conn:
+            # Inserted oldest first: of two spellings of one key, the later row survives
+            conn.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)", [
+                ('29/9/2024', 100.0, 45.0, 5.0),
+                ('30-09-24', 101.0, 46.0, 5.5),
+                ('2024-10-01', 102.0, 47.0, 6.0),
+                ('01/10/2024', 103.0, 48.0, 6.5), # Same day as 2024-10-01
+            ])
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, 'V', ?, ?, ?, 0, 0, 'Okay')
+            """, [
+                ('29/9/2024', 'Tandoori', 2.0, 100.0),
+                ('2024-09-29', 'Tandoori', 3.0, 110.0), # Same bill item, other spelling
+                ('29-09-2024', 'Boiler', 1.0, 50.0),
+                ('30-09-24', 'Egg', 10.0, 6.0),
+            ])
+            conn.executemany("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES (?, 'V', ?, ?, ?)", [
+                ('29/9/2024', 'Bill', 200.0, 'Total Bill Amount for 29/9/2024'),
+                ('2024-09-29', 'Bill', 330.0, 'Total Bill Amount for 2024-09-29'),
+                ('29-09-2024', 'Bill', 50.0, 'Total Bill Amount for 29-09-2024'),
+                ('29/09/24', 'Payment', -100.0, 'Cash'),
+                ('30-09-24', 'Bill', 60.0, 'Total Bill Amount for 30-09-24'),
+            ])
+
+    def migrate(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            applied = chicken_db.migrate()
+        self.assertEqual(applied[0], 5)
+        return output.getvalue()
+
+    def test_newest_spelling_survives(self):
+        output = self.migrate()
+        rates = chicken_db.query_all("SELECT Date, TandoorRate FROM RawData ORDER BY Date")
+        self.assertEqual(rates, [('2024-09-29', 100.0), ('2024-09-30', 101.0), ('2024-10-01', 103.0)])
+        bills = chicken_db.query_all("SELECT Date, ItemName, Qty, VendorRate FROM BillEntries ORDER BY Date, ItemName")
+        self.assertEqual(bills, [
+            ('2024-09-29', 'Boiler', 1.0, 50.0),
+            ('2024-09-29', 'Tandoori', 3.0, 110.0),
+            ('2024-09-30', 'Egg', 10.0, 6.0),
+        ])
+        self.assertIn("dropped 1 RawData row(s)", output)
+        self.assertIn("dropped 1 BillEntries row(s)", output)
+        self.assertIn("'29/9/2024', 'V', 'Tandoori'", output)
+
+    def test_collapsed_bills_merge_in_the_ledger(self):
+        output = self.migrate()
+        ledger = chicken_db.query_all("SELECT Date, TransactionType, Amount, Details FROM VendorLedger ORDER BY Date, TransactionType")
+        self.assertEqual(ledger, [
+            ('2024-09-29', 'Bill', 380.0, 'Total Bill Amount for 2024-09-29'), # 3 x 110 + 1 x 50
+            ('2024-09-29', 'Payment', -100.0, 'Cash'),
+            ('2024-09-30', 'Bill', 60.0, 'Total Bill Amount for 30-09-24'),   # Not collapsed, kept as is
+        ])
+        self.assertIn("merged 3 VendorLedger bill row(s) of 1 vendor/date(s)", output)
+
+        balance = chicken_db.query_one("SELECT TotalBilled, LedgerTotal, LastActivityDate FROM VendorBalance WHERE SupplierName = 'V'")
+        self.assertEqual(balance, (440.0, 340.0, '2024-09-30'))
+
+    def test_dates_round_trip_through_date_key(self):
+        self.migrate()
+        for table in ('RawData', 'BillEntries', 'VendorLedger'):
+            for (stored,) in chicken_db.query_all(f"SELECT DISTINCT Date FROM {table}"):
+                self.assertEqual(chicken_db.date_key(stored), stored)
+        for spelling in ('29/9/2024', '29-09-2024', '29/09/24', '2024-09-29'):
+            self.assertEqual(chicken_db.date_key(spelling), '2024-09-29')
+
+    def test_check_rejects_non_iso_dates(self):
+        self.migrate()
+        with self.assertRaises(sqlite3.IntegrityError):
+            with chicken_db.transaction() as conn:
+                conn.execute("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES ('02/10/2024', 1, 1, 1)")
+        with self.assertRaises(sqlite3.IntegrityError):
+            with chicken_db.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount) VALUES ('2024-10-2', 'V', 'Payment', -1)
+                """)
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES ('2024-10-02', 1, 1, 1)")
+
+    def test_unparseable_date_aborts_untouched(self):
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES ('sometime', 1, 1, 1)")
+        with self.assertRaises(ValueError):
+            chicken_db.migrate()
+        self.assertEqual(chicken_db.get_schema_version(), 4)
+        self.assertEqual(chicken_db.query_one("SELECT COUNT(*) FROM RawData")[0], 5)
+
+if __name__ == '__main__':
+    unittest.main()
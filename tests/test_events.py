@@ -0,0 +1,88 @@
+import unittest
+import events
+
+class FakeRoot:
+    """Stands in for the Tk root: after_idle callbacks run when idle() is called."""
+
+    def __init__(self):
+        self.idle_callbacks = []
+        self.reported = []
+
+    def after_idle(self, callback):
+        self.idle_callbacks.append(callback)
+        return f"after#{len(self.idle_callbacks)}"
+
+    def report_callback_exception(self, exc_type, exc, tb):
+        self.reported.append(exc)
+
+    def idle(self):
+        while self.idle_callbacks:
+            self.idle_callbacks.pop(0)()
+
+class EventBusTest(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.bus = events.EventBus(self.root)
+        self.calls = []
+
+    def record(self, name):
+        return lambda payloads: self.calls.append((name, payloads))
+
+    def test_burst_is_delivered_once_per_handler(self):
+        self.bus.subscribe(events.SUPPLIERS_CHANGED, self.record('suppliers'))
+        self.bus.subscribe(events.RATES_CHANGED, self.record('rates'))
+        for _ in range(5):
+            self.bus.publish(events.SUPPLIERS_CHANGED)
+        for date in ('2024-01-02', '2024-01-01', '2024-01-02'):
+            self.bus.publish(events.RATES_CHANGED, date)
+
+        self.assertEqual(len(self.root.idle_callbacks), 1) # One flush scheduled for the whole burst
+        self.assertEqual(self.calls, [])
+        self.root.idle()
+        self.assertEqual(self.calls, [
+            ('suppliers', [()]),
+            ('rates', [('2024-01-02',), ('2024-01-01',)]),
+        ])
+
+    def test_events_flush_in_fixed_order(self):
+        for event in events.EVENTS:
+            self.bus.subscribe(event, self.record(event))
+        self.bus.publish(events.BILL_SAVED, 'V', '2024-01-01')
+        self.bus.publish(events.MARKUPS_CHANGED, 'V')
+        self.bus.publish(events.SUPPLIERS_CHANGED)
+        self.root.idle()
+        self.assertEqual([name for name, _ in self.calls], [events.SUPPLIERS_CHANGED, events.MARKUPS_CHANGED, events.BILL_SAVED])
+
+    def test_publish_from_handler_goes_to_next_flush(self):
+        def on_suppliers(payloads):
+            self.calls.append(('suppliers', payloads))
+            self.bus.publish(events.SUPPLIERS_CHANGED) # Would recurse if delivered at once
+            self.bus.publish(events.MARKUPS_CHANGED, 'V')
+        self.bus.subscribe(events.SUPPLIERS_CHANGED, on_suppliers)
+        self.bus.subscribe(events.MARKUPS_CHANGED, self.record('markups'))
+
+        self.bus.publish(events.SUPPLIERS_CHANGED)
+        self.root.idle_callbacks.pop(0)()
+        self.assertEqual(self.calls, [('suppliers', [()])])
+        self.assertEqual(len(self.root.idle_callbacks), 1)
+
+        self.root.idle_callbacks.pop(0)()
+        self.assertEqual(self.calls, [('suppliers', [()]), ('suppliers', [()]), ('markups', [('V',)])])
+
+    def test_failing_handler_does_not_stop_the_others(self):
+        def broken(payloads):
+            raise RuntimeError("boom")
+        self.bus.subscribe(events.RATES_CHANGED, broken)
+        self.bus.subscribe(events.RATES_CHANGED, self.record('rates'))
+        self.bus.publish(events.RATES_CHANGED, '2024-01-01')
+        self.root.idle()
+        self.assertEqual(self.calls, [('rates', [('2024-01-01',)])])
+        self.assertEqual([str(exc) for exc in self.root.reported], ["boom"])
+
+    def test_unknown_event_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.bus.publish('rate_changed', '2024-01-01')
+        self.assertEqual(self.root.idle_callbacks, [])
+
+if __name__ == '__main__':
+    unittest.main()
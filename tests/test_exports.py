@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+import unittest
+from datetime import datetime
+from openpyxl import load_workbook
+import chicken_db
+import exports
+from tests.support import DatabaseTestCase
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The workbooks shipped in the repo, as produced by the exports the layouts replace
+SHIPPED_WORKBOOKS = {
+    'full_data': "Chicken_Bills_Full_Data_Export_20251126_164132.xlsx",
+    'variance_report': "Chicken_Bills_Variance_Report_20251126_165545.xlsx",
+}
+
+class ExportTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_supplier('V')
+        with chicken_db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, 'V', ?, ?, ?, ?, ?, ?)
+            """, [
+                ('2024-03-01', 'Tandoori', 2.0, 150.0, 150.0, 0.0, 'Okay'),
+                ('2024-03-02', 'Wings\x07', 1.5, 160.0, 150.0, 15.0, 'HIGH (+)'),
+                ('2024-03-03', 'Egg', 30.0, 6.0, 6.5, -15.0, 'LOW (-)'),
+            ])
+            conn.execute("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES ('2024-03-02', 'V', 'Payment', -100, NULL)")
+        self.out_dir = os.path.join(self._db_dir, 'out')
+        os.makedirs(self.out_dir)
+
+    def read_xlsx(self, path):
+        sheet = load_workbook(path).active
+        return [[cell.value for cell in row] for row in sheet.iter_rows()], sheet
+
+    def test_headers_match_the_shipped_workbooks(self):
+        for layout, name in SHIPPED_WORKBOOKS.items():
+            with self.subTest(layout=layout):
+                shipped, shipped_sheet = self.read_xlsx(os.path.join(REPO_DIR, name))
+                path, _ = exports.export_report(layout, 'xlsx', self.out_dir)
+                exported, sheet = self.read_xlsx(path)
+                self.assertEqual(exported[0], shipped[0])
+                self.assertEqual(sheet.title, shipped_sheet.title)
+                self.assertTrue(all(cell.font.b for cell in sheet[1]))
+                self.assertTrue(os.path.basename(path).startswith(name.rsplit('_', 2)[0] + '_'))
+
+    def test_xlsx_rows_newest_first(self):
+        path, count = exports.export_report('variance_report', 'xlsx', self.out_dir, start='2024-03-01', end='03/03/2024')
+        rows, _ = self.read_xlsx(path)
+        self.assertEqual(count, 2)
+        self.assertEqual(rows[1:], [
+            ['2024-03-03', 'Egg', 'V', 30, 6, 6.5, -15, 'LOW (-)'],
+            ['2024-03-02', 'Wings', 'V', 1.5, 160, 150, 15, 'HIGH (+)'], # Control character dropped
+        ])
+
+    def test_csv_matches_the_xlsx(self):
+        for layout in exports.EXPORT_LAYOUTS:
+            with self.subTest(layout=layout):
+                out = io.StringIO(newline='')
+                count = exports.write_csv(layout, out, chunk_rows=2)
+                csv_rows = list(csv.reader(io.StringIO(out.getvalue())))
+                path, xlsx_count = exports.export_report(layout, 'xlsx', self.out_dir)
+                xlsx_rows, _ = self.read_xlsx(path)
+                self.assertEqual(count, xlsx_count)
+                self.assertEqual(csv_rows[0], xlsx_rows[0])
+                self.assertEqual(len(csv_rows), count + 1)
+                os.remove(path)
+
+    def test_too_many_rows_for_a_sheet(self):
+        saved = exports.XLSX_MAX_ROWS
+        exports.XLSX_MAX_ROWS = 3
+        try:
+            with self.assertRaises(ValueError):
+                exports.write_xlsx('full_data', io.BytesIO())
+        finally:
+            exports.XLSX_MAX_ROWS = saved
+
+    def test_file_name(self):
+        name = exports.export_file_name('variance_report', 'xlsx', now=datetime(2025, 11, 26, 16, 55, 45))
+        self.assertEqual(name, SHIPPED_WORKBOOKS['variance_report'])
+
+if __name__ == '__main__':
+    unittest.main()
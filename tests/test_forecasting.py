@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import forecasting
+
+def refit(points, degree, window_days):
+    """A new RateTrend fed the given {day: value} points in day order."""
+    trend = forecasting.RateTrend(degree, window_days)
+    for day in sorted(points):
+        trend.update(day, points[day])
+    return trend
+
+class RateTrendTest(unittest.TestCase):
+    def assert_same_fit(self, trend, points, degree=2, window_days=None):
+        fresh = refit(points, degree, window_days)
+        self.assertEqual(len(trend), len(fresh))
+        target = max(points) + 1
+        self.assertAlmostEqual(trend.predict(target), fresh.predict(target), places=6)
+        # And against a plain least-squares fit of the same points
+        days = np.array(sorted(points), dtype=float)
+        values = np.array([points[d] for d in sorted(points)])
+        expected = np.polyval(np.polyfit(days - days[0], values, min(degree, len(days) - 1)), target - days[0])
+        self.assertAlmostEqual(trend.predict(target), expected, places=4)
+
+    def test_updates_replacements_and_removals_match_a_refit(self):
+        rng = np.random.default_rng(10)
+        start = 738000
+        trend = forecasting.RateTrend(window_days=None)
+        points = {}
+        for step in range(600):
+            action = rng.random()
+            if action < 0.15 and points:
+                day = int(rng.choice(list(points)))
+                trend.remove(day)
+                del points[day]
+            elif action < 0.3 and points:
+                day = int(rng.choice(list(points))) # Replace a value
+                points[day] = float(rng.uniform(100, 200))
+                trend.update(day, points[day])
+            else:
+                day = start + step
+                points[day] = float(100 + 0.05 * step + rng.normal(0, 3))
+                trend.update(day, points[day])
+            if step % 50 == 49:
+                self.assert_same_fit(trend, points)
+
+    def test_window_expiry_matches_a_refit_of_the_window(self):
+        rng = np.random.default_rng(11)
+        start = 738000
+        trend = forecasting.RateTrend(window_days=30)
+        points = {}
+        for step in range(0, 400, 2): # Every other day, so the window holds 15 days
+            day = start + step
+            points[day] = float(120 + 10 * np.sin(step / 40) + rng.normal(0, 1))
+            trend.update(day, points[day])
+        window = {day: value for day, value in points.items() if day > max(points) - 30}
+        self.assertEqual(len(window), 15)
+        self.assert_same_fit(trend, window, window_days=30)
+
+    def test_back_dated_edits(self):
+        trend = forecasting.RateTrend(window_days=30)
+        points = {738000 + d: 100.0 + d for d in range(0, 40, 3)}
+        for day, value in points.items():
+            trend.update(day, value)
+        trend.update(738000, 1.0) # Older than the window: ignored
+        trend.update(738035, 50.0) # Inside it: inserted in order
+        points[738035] = 50.0
+        window = {day: value for day, value in points.items() if day > max(points) - 30}
+        self.assert_same_fit(trend, window, window_days=30)
+
+    def test_missing_values_remove_the_day(self):
+        trend = refit({1: 10.0, 2: 11.0, 3: 12.5}, 2, None)
+        trend.update(2, None)
+        self.assertEqual(len(trend), 2)
+        self.assertAlmostEqual(trend.predict(4), 13.75)
+        self.assertIsNone(forecasting.RateTrend().predict(1))
+
+    def test_window_must_be_positive(self):
+        for window_days in (0, -5):
+            with self.assertRaises(ValueError):
+                forecasting.RateTrend(window_days=window_days)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import io
+import unittest
+import pandas as pd
+import chicken_db
+import importers
+from tests.support import DatabaseTestCase
+
+def csv_frame(text):
+    return pd.read_csv(io.StringIO(text))
+
+RATES_CSV = """Date,Tandoor,Boiler,Egg
+29/9/2024,131,118,580
+2024-09-30,132,119,585
+2024-13-01,1,1,1
+1/2/3,1,1,1
+1/10/2024,133,,590
+2/10/2024,134,-5,590
+30/09/24,140,120,600
+"""
+
+class RateImportTest(DatabaseTestCase):
+    def test_parse_errors_are_reported_by_csv_line(self):
+        rates, rejects = importers.prepare_rates(csv_frame(RATES_CSV), 'Date', 'Tandoor', 'Boiler', 'Egg')
+        self.assertEqual(rejects, [
+            (4, "unparseable date"), (5, "unparseable date"),
+            (6, "missing or negative rate"), (7, "missing or negative rate"),
+        ])
+        # 30/09/24 repeats 2024-09-30 further down the file: the later row wins
+        self.assertEqual(rates.values.tolist(), [
+            ['2024-09-29', 131.0, 118.0, 580.0],
+            ['2024-09-30', 140.0, 120.0, 600.0],
+        ])
+
+    def test_import_upserts_and_recomputes_bills(self):
+        self.add_supplier('V')
+        chicken_db.insert_default_markups('V', [('Tandoori', 'TandoorRate', '+', 20.0, None, None)])
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES ('2024-09-29', 1, 1, 1)")
+            conn.execute("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES ('2024-09-29', 'V', 'Tandoori', 2, 151, 21, 260, 'HIGH (+)')
+            """)
+
+        rates, _ = importers.prepare_rates(csv_frame(RATES_CSV), 'Date', 'Tandoor', 'Boiler', 'Egg')
+        self.assertEqual(importers.import_rates(rates), (2, 1))
+        self.assertEqual(chicken_db.query_all("SELECT Date, TandoorRate FROM RawData ORDER BY Date"),
+                         [('2024-09-29', 131.0), ('2024-09-30', 140.0)])
+        self.assertEqual(chicken_db.query_one("SELECT ExpectedRate, Variance, Status FROM BillEntries"), (151.0, 0.0, 'Okay'))
+
+    def test_empty_import(self):
+        rates, rejects = importers.prepare_rates(csv_frame("Date,Tandoor,Boiler,Egg\nnope,1,1,1\n"), 'Date', 'Tandoor', 'Boiler', 'Egg')
+        self.assertEqual((len(rates), rejects), (0, [(2, "unparseable date")]))
+        self.assertEqual(importers.import_rates(rates), (0, 0))
+
+BILLS_CSV = """Date,Tandoori,Wings,Egg
+29/09/24,4.5,2,0
+30/09/24,7,,150
+31/09/24,1,1,1
+01/10/24,2,0,0
+"""
+
+class WideBillImportTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_supplier('V')
+        # Wings has no markup rule; Egg is priced from the egg rate
+        chicken_db.insert_default_markups('V', [
+            ('Tandoori', 'TandoorRate', '+', 20.0, None, None),
+            ('Egg', 'EggRate', '/', 100.0, '+', 0.5),
+        ])
+        with chicken_db.transaction() as conn:
+            conn.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)",
+                             [('2024-09-29', 131.0, 118.0, 580.0), ('2024-09-30', 132.0, 119.0, 600.0)])
+
+    def import_csv(self, text=BILLS_CSV):
+        df = csv_frame(text)
+        bills, dates, rejects = importers.prepare_wide_bills(df, 'Date', ['Tandoori', 'Wings', 'Egg'], 'V')
+        return importers.import_wide_bills(bills, dates, 'V'), rejects
+
+    def test_melts_prices_and_reports_rejects(self):
+        (dates_imported, entries), rejects = self.import_csv()
+        self.assertEqual(rejects, [(4, "unparseable date")])
+        self.assertEqual((dates_imported, entries), (3, 5))
+
+        rows = chicken_db.query_all("""
+            SELECT Date, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status FROM BillEntries ORDER BY Date, ItemName
+        """)
+        self.assertEqual(rows, [
+            ('2024-09-29', 'Tandoori', 4.5, 151.0, 151.0, 0.0, 'Okay'),
+            ('2024-09-29', 'Wings', 2.0, 0.0, 0.0, 0.0, 'No Rate Data'), # No markup rule
+            ('2024-09-30', 'Egg', 150.0, 6.5, 6.5, 0.0, 'Okay'),
+            ('2024-09-30', 'Tandoori', 7.0, 152.0, 152.0, 0.0, 'Okay'),
+            ('2024-10-01', 'Tandoori', 2.0, 0.0, 0.0, 0.0, 'No Rate Data'), # No paper rates that day
+        ])
+        ledger = chicken_db.query_all("SELECT Date, TransactionType, Amount FROM VendorLedger ORDER BY Date")
+        self.assertEqual(ledger, [('2024-09-29', 'Bill', 679.5), ('2024-09-30', 'Bill', 2039.0), ('2024-10-01', 'Bill', 0.0)])
+
+    def test_reimport_replaces_the_dates_bills(self):
+        self.import_csv()
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount) VALUES ('2024-09-29', 'V', 'Payment', -100)")
+        (dates_imported, entries), _ = self.import_csv("Date,Tandoori,Wings,Egg\n29/09/24,1,0,0\n")
+        self.assertEqual((dates_imported, entries), (1, 1))
+
+        rows = chicken_db.query_all("SELECT Date, ItemName, Qty FROM BillEntries WHERE Date = '2024-09-29'")
+        self.assertEqual(rows, [('2024-09-29', 'Tandoori', 1.0)])
+        ledger = chicken_db.query_all("SELECT TransactionType, Amount FROM VendorLedger WHERE Date = '2024-09-29' ORDER BY Amount")
+        self.assertEqual(ledger, [('Payment', -100.0), ('Bill', 151.0)]) # Payments are kept
+        self.assertEqual(chicken_db.query_one("SELECT COUNT(*) FROM BillEntries")[0], 4) # Other dates untouched
+
+IMPORT_TABLES = {
+    'RawData': "SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date",
+    'BillEntries': "SELECT Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status FROM BillEntries ORDER BY Date, SupplierName, ItemName",
+    'VendorLedger': "SELECT Date, SupplierName, TransactionType, Amount, Details FROM VendorLedger ORDER BY Date, SupplierName",
+    'VendorBalance': "SELECT SupplierName, TotalBilled, NetDue, LastActivityDate FROM VendorBalance ORDER BY SupplierName",
+}
+
+FILES = {
+    'rates_sep.csv': "Date,Tandoor,Boiler,Egg\n29/9/2024,131,118,580\n30/9/2024,131,118,580\n",
+    'rates_oct.csv': "Date,Tandoor Rate,Boiler Rate,Egg Rate\n1/10/2024,133,116,590\n30/9/2024,132,117,585\n",
+    'bill_V.csv': "Date,Tandoori,Wings\n29/09/24,4.3,2\n30/09/24,7.1,0\n01/10/24,5.8,1\n",
+    'bill_W.csv': "Date,Tandoori,Boiler\n30/09/24,3,2\nbad,1,1\n01/10/24,0,4\n",
+}
+
+class FileImportTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_vendors()
+
+    def create_vendors(self):
+        for name in ('V', 'W'):
+            self.add_supplier(name)
+            chicken_db.insert_default_markups(name, [
+                ('Tandoori', 'TandoorRate', '+', 20.0, None, None),
+                ('Boiler', 'BoilerRate', '*', 1.1, None, None),
+            ])
+
+    def specs(self):
+        # Bill files listed first: rate sheets must still be written before them
+        names = ['bill_V.csv', 'rates_sep.csv', 'bill_W.csv', 'rates_oct.csv']
+        return [{'name': name, 'source': FILES[name].encode(), 'kind': None,
+                 'supplier': importers.supplier_for_file(name, ['V', 'W'])} for name in names]
+
+    def snapshot(self):
+        return {table: chicken_db.query_all(sql) for table, sql in IMPORT_TABLES.items()}
+
+    def import_sequentially(self):
+        """The files imported one at a time with the single-file importers, rate sheets first."""
+        totals = {'rates_imported': 0, 'bills_updated': 0, 'bill_dates_imported': 0, 'entries_inserted': 0}
+        for name in ('rates_sep.csv', 'rates_oct.csv'):
+            df = csv_frame(FILES[name])
+            rates, _ = importers.prepare_rates(df, 'Date', *df.columns[1:])
+            imported, updated = importers.import_rates(rates)
+            totals['rates_imported'] += imported
+            totals['bills_updated'] += updated
+        for name, supplier in (('bill_V.csv', 'V'), ('bill_W.csv', 'W')):
+            df = csv_frame(FILES[name])
+            bills, dates, _ = importers.prepare_wide_bills(df, 'Date', list(df.columns[1:]), supplier)
+            dates_imported, entries = importers.import_wide_bills(bills, dates, supplier)
+            totals['bill_dates_imported'] += dates_imported
+            totals['entries_inserted'] += entries
+        return totals
+
+    def test_pool_import_matches_sequential_imports(self):
+        progress = []
+        summary = importers.import_files(self.specs(), workers=2, progress=lambda done, total: progress.append((done, total)))
+        pooled = self.snapshot()
+
+        chicken_db.DB_NAME = chicken_db.DB_NAME.replace('test.db', 'sequential.db')
+        chicken_db.initialize_db()
+        self.create_vendors()
+        totals = self.import_sequentially()
+
+        # However the files were batched into commits (30/9 is in both rate sheets; the later one wins)
+        self.assertEqual({key: summary[key] for key in totals}, totals)
+        self.assertEqual(pooled, self.snapshot())
+        self.assertEqual(progress[-1], (4, 4))
+        self.assertEqual([(f['name'], f['kind'], f['supplier'], f['rows'], f['rejected'], f['error']) for f in summary['files']], [
+            ('rates_sep.csv', 'rates', None, 2, 0, None),
+            ('rates_oct.csv', 'rates', None, 2, 0, None),
+            ('bill_V.csv', 'wide_bills', 'V', 3, 0, None),
+            ('bill_W.csv', 'wide_bills', 'W', 2, 1, None),
+        ])
+
+    def test_totals_do_not_depend_on_batching(self):
+        parsed = [importers.parse_import_file({'name': name, 'source': FILES[name].encode(), 'kind': None})
+                  for name in ('rates_sep.csv', 'rates_oct.csv')]
+        together = importers._write_parsed(parsed)
+        one_by_one = [importers._write_parsed([item]) for item in parsed]
+        self.assertEqual(together, {key: sum(t[key] for t in one_by_one) for key in together})
+        self.assertEqual(chicken_db.query_one("SELECT TandoorRate FROM RawData WHERE Date = '2024-09-30'")[0], 132.0)
+
+    def test_failed_files_are_reported_and_skipped(self):
+        specs = [
+            {'name': 'no_date.csv', 'source': b"Day,Tandoor,Boiler,Egg\n1,1,1,1\n", 'kind': None, 'supplier': None},
+            {'name': 'bill_unknown.csv', 'source': FILES['bill_V.csv'].encode(), 'kind': None, 'supplier': None},
+            {'name': 'rates_sep.csv', 'source': FILES['rates_sep.csv'].encode(), 'kind': None, 'supplier': None},
+        ]
+        summary = importers.import_files(specs, workers=1)
+        errors = {f['name']: f['error'] for f in summary['files']}
+        self.assertEqual(errors, {
+            'no_date.csv': "ValueError: no Date column",
+            'bill_unknown.csv': "ValueError: no supplier for this bill file",
+            'rates_sep.csv': None,
+        })
+        self.assertEqual((summary['rates_imported'], summary['entries_inserted']), (2, 0))
+
+if __name__ == '__main__':
+    unittest.main()
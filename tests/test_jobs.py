@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+import chicken_db
+import jobs
+from tests.support import DatabaseTestCase
+
+class JobRunnerTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.runner = jobs.JobRunner(workers=1)
+
+    def tearDown(self):
+        self.runner.shutdown()
+        super().tearDown()
+
+    def test_heartbeat_keeps_the_write_generation(self):
+        started, release = threading.Event(), threading.Event()
+        job_id = self.runner.submit('test', 'Waits', lambda job: started.set() or release.wait(5))
+        try:
+            started.wait(5)
+            generation = chicken_db.get_data_generation()
+            self.runner.run_write(jobs._beat, self.runner.owner)
+            self.assertEqual(chicken_db.get_data_generation(), generation)
+            heartbeat = chicken_db.query_one("SELECT HeartbeatAt FROM Jobs WHERE JobID = ?", (job_id,))[0]
+            self.assertIsNotNone(heartbeat)
+        finally:
+            release.set()
+
+    def wait(self, job_id):
+        """The job's record once its finished status is saved (the live record changes first)."""
+        deadline = time.monotonic() + 5
+        while self.saved(job_id)[0] not in jobs.FINISHED_STATUSES:
+            self.assertLess(time.monotonic(), deadline, "job did not finish")
+            time.sleep(0.01)
+        return self.runner.get(job_id)
+
+    def saved(self, job_id):
+        return chicken_db.query_one("SELECT Status, Error, Result, Owner FROM Jobs WHERE JobID = ?", (job_id,))
+
+    def test_success(self):
+        def body(job, supplier):
+            job.set_progress(0, 1, "Adding")
+            job.write(self.add_supplier, supplier)
+            job.set_progress(1)
+            return {'added': supplier}
+
+        job_id = self.runner.submit('test', 'Adds a supplier', body, 'A')
+        record = self.wait(job_id)
+        self.assertEqual((record['status'], record['done'], record['total'], record['result'], record['error']),
+                         (jobs.STATUS_SUCCEEDED, 1, 1, {'added': 'A'}, None))
+        self.assertEqual(self.saved(job_id), (jobs.STATUS_SUCCEEDED, None, '{"added": "A"}', self.runner.owner))
+        self.assertEqual(chicken_db.query_one("SELECT SupplierName FROM Suppliers")[0], 'A')
+
+    def test_failure(self):
+        def body(job):
+            raise ValueError("bad file")
+
+        job_id = self.runner.submit('test', 'Fails', body)
+        record = self.wait(job_id)
+        self.assertEqual((record['status'], record['error']), (jobs.STATUS_FAILED, "ValueError: bad file"))
+        self.assertEqual(self.saved(job_id)[:2], (jobs.STATUS_FAILED, "ValueError: bad file"))
+        self.assertEqual([r['id'] for r in self.runner.recent(kinds=['test'])], [job_id])
+
+    def test_cancel_between_steps(self):
+        started, release = threading.Event(), threading.Event()
+
+        def body(job):
+            started.set()
+            release.wait(5)
+            job.check_cancelled()
+            return 'not reached'
+
+        job_id = self.runner.submit('test', 'Cancelled', body)
+        started.wait(5)
+        self.assertTrue(self.runner.cancel(job_id))
+        release.set()
+        self.assertEqual(self.wait(job_id)['status'], jobs.STATUS_CANCELLED)
+        self.assertFalse(self.runner.cancel(job_id))
+
+    def test_stale_jobs_of_other_runners_are_interrupted(self):
+        with chicken_db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO Jobs (JobID, Kind, Label, Status, CreatedAt, Owner, HeartbeatAt) VALUES (?, 'test', '', 'running', ?, ?, ?)
+            """, [
+                ('dead', jobs._now(-3600), 'gone:1', jobs._now(-jobs.STALE_AFTER_SECONDS - 5)),
+                ('alive', jobs._now(-3600), 'other:1', jobs._now()),
+                ('legacy', jobs._now(-3600), None, None), # From before migration 9
+            ])
+        self.runner.run_write(jobs._interrupt_stale_jobs, self.runner.owner)
+        statuses = dict(chicken_db.query_all("SELECT JobID, Status FROM Jobs"))
+        self.assertEqual(statuses, {'dead': jobs.STATUS_INTERRUPTED, 'alive': 'running', 'legacy': jobs.STATUS_INTERRUPTED})
+
+if __name__ == '__main__':
+    unittest.main()
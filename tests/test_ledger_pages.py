@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+import chicken_db
+from tests.support import DatabaseTestCase
+
+class LedgerPageTest(DatabaseTestCase):
+    """Keyset pages of fetch_ledger_page against a running balance computed in Python."""
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(21)
+        self.add_supplier('V')
+        self.add_supplier('Other')
+        dates = [f"2024-05-{day:02d}" for day in range(1, 21)]
+        bills, ledger = [], []
+        for date in dates:
+            # Some days have bill items, some a payment or adjustment, some both (same-date ties)
+            if rng.random() < 0.7:
+                for item in ('Tandoori', 'Boiler', 'Egg')[:rng.integers(1, 4)]:
+                    bills.append((date, 'V', item, round(float(rng.uniform(1, 20)), 2), round(float(rng.uniform(100, 300)), 2)))
+            for _ in range(rng.integers(0, 3)):
+                ledger.append((date, 'V', 'Payment', -round(float(rng.uniform(100, 3000)), 2), f"Paid {date}"))
+        ledger.append((dates[3], 'Other', 'Payment', -999.0, "Another vendor"))
+        with chicken_db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, ?, ?, ?, ?, 0, 0, 'Okay')
+            """, bills)
+            conn.executemany("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES (?, ?, ?, ?, ?)", ledger)
+        self.dates = dates
+
+    def expected_rows(self, start=None, end=None):
+        """(Date, TransactionType, Amount, Balance) newest first, Balance = balance after the row."""
+        bills = chicken_db.query_all("""
+            SELECT Date, 0, 'Bill', SUM(Qty * VendorRate) FROM BillEntries WHERE SupplierName = 'V' GROUP BY Date
+        """)
+        ledger = chicken_db.query_all("SELECT Date, ID, TransactionType, Amount FROM VendorLedger WHERE SupplierName = 'V'")
+        rows = sorted(bills + ledger, key=lambda row: (row[0], row[1]), reverse=True)
+        rows = [row for row in rows if end is None or row[0] <= end]
+        balance = sum(row[3] for row in rows)
+        result = []
+        for date, _, tx_type, amount in rows:
+            if start is None or date >= start:
+                result.append((date, tx_type, amount, balance))
+            balance -= amount
+        return result
+
+    def all_pages(self, limit, start=None, end=None):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page = chicken_db.fetch_ledger_page('V', start, end, cursor=cursor, limit=limit)
+            self.assertLessEqual(len(page['rows']), limit)
+            rows += page['rows']
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                return rows, pages
+
+    def assert_rows_equal(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for (date, tx_type, amount, _, balance), (e_date, e_type, e_amount, e_balance) in zip(actual, expected):
+            self.assertEqual((date, tx_type), (e_date, e_type))
+            self.assertAlmostEqual(amount, e_amount, places=6)
+            self.assertAlmostEqual(balance, e_balance, places=6)
+
+    def test_pages_join_into_the_full_ledger(self):
+        expected = self.expected_rows()
+        self.assertAlmostEqual(expected[0][3], chicken_db.fetch_vendor_balance('V')['NetDue'], delta=0.005) # Rounded for display
+        for limit in (1, 2, 3, 7, len(expected) - 1, len(expected), len(expected) + 1, 500):
+            with self.subTest(limit=limit):
+                rows, pages = self.all_pages(limit)
+                self.assert_rows_equal(rows, expected)
+                self.assertLessEqual(pages, len(expected) // limit + 1)
+
+    def test_date_window(self):
+        start, end = self.dates[5], self.dates[14]
+        expected = self.expected_rows(start, end)
+        for limit in (1, 4, 50):
+            with self.subTest(limit=limit):
+                rows, _ = self.all_pages(limit, start, end)
+                self.assert_rows_equal(rows, expected)
+
+    def test_unknown_vendor_is_empty(self):
+        self.assertEqual(chicken_db.fetch_ledger_page('Nobody'), {'rows': [], 'next_cursor': None})
+
+if __name__ == '__main__':
+    unittest.main()
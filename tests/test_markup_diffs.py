@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+import chicken_db
+from tests.support import DatabaseTestCase
+
+RULE_QUERY = """
+    SELECT ItemID, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2
+    FROM Markups WHERE SupplierName = ? ORDER BY ItemID
+"""
+
+def apply_markup_diff(before, diff):
+    """before's rules keyed by ItemID with the diff applied; inserts get keys new-0, new-1, ..."""
+    rules = {int(item_id): chicken_db._normalize_rule(*rule) for item_id, *rule in before}
+    for item_id in diff['delete']:
+        del rules[item_id]
+    rules.update(diff['update'])
+    rules.update({f"new-{i}": rule for i, rule in enumerate(diff['insert'])})
+    return rules
+
+class MarkupDiffTest(unittest.TestCase):
+    BEFORE = [
+        (1, 'Tandoori', 'TandoorRate', '+', 20.0, None, None),
+        (2, 'Boiler', 'BoilerRate', '+', 25.0, None, None),
+        (3, 'Egg', 'EggRate', '/', 10.0, '+', 5.0),
+        (4, 'Wings', 'TandoorRate', '+', 15.0, None, None),
+    ]
+
+    def test_unchanged_rules_give_empty_diff(self):
+        # Editor values come back as strings/NaN; they normalize to the stored values
+        after = [(1, 'Tandoori ', 'TandoorRate', '+', '20', '', np.nan), *self.BEFORE[1:]]
+        self.assertEqual(chicken_db.diff_markup_rules(self.BEFORE, after), {'insert': [], 'update': {}, 'delete': {}})
+
+    def test_round_trip(self):
+        after = [
+            (1, 'Tandoori', 'TandoorRate', '+', 22.0, None, None),    # Update
+            (3, 'Egg', 'EggRate', '/', 10.0, '+', 5.0),               # Unchanged
+            (None, 'Boneless', 'TandoorRate', '+', 95.0, None, None), # Insert
+            (np.nan, 'Wings', 'TandoorRate', '+', 16.0, None, None),  # Re-added under a deleted name
+            (None, '', 'TandoorRate', '+', 1.0, None, None),          # Blank row, ignored
+        ]
+        diff = chicken_db.diff_markup_rules(self.BEFORE, after)
+        self.assertEqual(diff['delete'], {2: 'Boiler'})
+        self.assertEqual(sorted(diff['update']), [1, 4]) # Wings keeps its ItemID
+        self.assertEqual([rule[0] for rule in diff['insert']], ['Boneless'])
+
+        expected = sorted(chicken_db._normalize_rule(*rule) for _, *rule in after if rule[0])
+        self.assertEqual(sorted(apply_markup_diff(self.BEFORE, diff).values()), expected)
+
+class SaveMarkupRulesTest(DatabaseTestCase):
+    def test_save_writes_only_the_diff(self):
+        self.add_supplier('V')
+        chicken_db.insert_default_markups('V', [rule[1:] for rule in MarkupDiffTest.BEFORE])
+        before = chicken_db.query_all(RULE_QUERY, ('V',))
+        ids = {row[1]: row[0] for row in before}
+
+        after = [
+            (ids['Tandoori'], 'Tandoori', 'TandoorRate', '+', 22.0, None, None),
+            (ids['Egg'], 'Egg', 'EggRate', '/', 10.0, '+', 5.0),
+            (ids['Wings'], 'Spl Wings', 'TandoorRate', '+', 15.0, None, None), # Rename
+            (None, 'Boneless', 'TandoorRate', '+', 95.0, None, None),
+        ]
+        changed = chicken_db.save_markup_rules('V', before, after)
+        self.assertEqual(changed, ['Boiler', 'Boneless', 'Spl Wings', 'Tandoori', 'Wings'])
+
+        saved = chicken_db.query_all(RULE_QUERY, ('V',))
+        self.assertEqual(sorted(row[1:] for row in saved), sorted(chicken_db._normalize_rule(*row[1:]) for row in after))
+        saved_ids = {row[1]: row[0] for row in saved}
+        for name, old_name in (('Tandoori', 'Tandoori'), ('Egg', 'Egg'), ('Spl Wings', 'Wings')):
+            self.assertEqual(saved_ids[name], ids[old_name]) # Updated in place
+
+        # Saving the saved state again changes nothing
+        self.assertEqual(chicken_db.save_markup_rules('V', saved, saved), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import chicken_db
+
+# --- Reference ---
+# The per-row calculate_expected_rate the vectorized engine replaced, kept verbatim.
+
+def reference_expected_rate(raw_rates, rule):
+    if not raw_rates or not rule:
+        return 0.0
+
+    Tandoor, Boiler, Egg = raw_rates
+    BaseType, Op1, Val1, Op2, Val2 = rule
+
+    rate = 0.0
+    if BaseType == 'TandoorRate': rate = Tandoor
+    elif BaseType == 'BoilerRate': rate = Boiler
+    elif BaseType == 'EggRate': rate = Egg
+
+    def apply_op(current_val, op, operand):
+        if operand is None: return current_val
+        if op == '+': return current_val + operand
+        if op == '-': return current_val - operand
+        if op == '*': return current_val * operand
+        if op == '/': return current_val / operand if operand != 0 else current_val
+        return current_val
+
+    rate = apply_op(rate, Op1, Val1)
+    if Op2 and Val2 is not None:
+        rate = apply_op(rate, Op2, Val2)
+
+    return round(max(0.0, rate), 2)
+
+BASE_TYPES = ['TandoorRate', 'BoilerRate', 'EggRate', 'Unknown', None]
+OPERATORS = ['+', '-', '*', '/', '%', None]
+
+def random_rule(rng, base_types=BASE_TYPES):
+    def operand():
+        return None if rng.random() < 0.15 else float(rng.choice([0.0, round(rng.uniform(-50, 150), 2)]))
+    return (rng.choice(base_types), rng.choice(OPERATORS), operand(), rng.choice(OPERATORS), operand())
+
+class MarkupEngineTest(unittest.TestCase):
+    def test_kernel_matches_per_row_formula(self):
+        rng = np.random.default_rng(2)
+        raw = [tuple(round(float(v), 2) for v in rng.uniform(0, 700, 3)) for _ in range(5000)]
+        rules = [random_rule(rng) for _ in range(5000)]
+
+        expected = chicken_db.calculate_expected_rates(raw, *zip(*rules))
+        reference = [reference_expected_rate(r, rule) for r, rule in zip(raw, rules)]
+        np.testing.assert_array_equal(expected, reference)
+
+    def test_missing_rates_give_zero(self):
+        rule = ('TandoorRate', '+', 20.0, None, None)
+        self.assertEqual(chicken_db.calculate_expected_rate(None, rule), 0.0)
+        self.assertEqual(chicken_db.calculate_expected_rate((100.0, 90.0, 500.0), None), 0.0)
+        nan_row = [(np.nan, np.nan, np.nan)]
+        self.assertEqual(chicken_db.calculate_expected_rates(nan_row, ['TandoorRate'], ['+'], [20.0], [None], [None])[0], 0.0)
+
+    def test_single_pair_wrapper(self):
+        rng = np.random.default_rng(3)
+        for _ in range(500):
+            raw = tuple(round(float(v), 2) for v in rng.uniform(0, 700, 3))
+            rule = random_rule(rng)
+            self.assertEqual(chicken_db.calculate_expected_rate(raw, rule), reference_expected_rate(raw, rule))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sqlite3
+import unittest
+from unittest import mock
+import chicken_db
+
+class ProfileTest(unittest.TestCase):
+    """The traced connection the profile flag switches on, used directly on an in-memory database."""
+
+    def setUp(self):
+        chicken_db.reset_profile()
+        self.conn = sqlite3.connect(':memory:', factory=chicken_db._TracedConnection)
+        self.conn.set_trace_callback(chicken_db._trace_statement)
+        self.conn.execute("CREATE TABLE T (ID INTEGER PRIMARY KEY, Value REAL)")
+        self.conn.execute("CREATE TABLE Log (Value REAL)")
+        self.conn.execute("CREATE TRIGGER trg_log AFTER INSERT ON T BEGIN INSERT INTO Log VALUES (NEW.Value); END")
+        chicken_db.reset_profile()
+
+    def tearDown(self):
+        self.conn.close()
+        chicken_db.reset_profile()
+
+    def test_statements_are_grouped_with_batch_size_and_rows(self):
+        insert = "INSERT INTO T (Value) VALUES (?)"
+        self.conn.executemany(insert, [(i,) for i in range(10)])
+        for _ in range(3):
+            self.conn.execute("SELECT Value FROM T WHERE Value >= ?", (5,)).fetchall()
+
+        top = {entry['sql']: entry for entry in chicken_db.profile_top_queries()}
+        self.assertEqual((top[insert]['calls'], top[insert]['params'], top[insert]['rows']), (1, 10, 10))
+        # The trace callback also counts the trigger body, once per inserted row
+        self.assertGreaterEqual(top[insert]['statements'], 20)
+        select = top["SELECT Value FROM T WHERE Value >= ?"]
+        self.assertEqual((select['calls'], select['params'], select['rows']), (3, 1, 15))
+
+    def test_fetchmany_and_fetchone_count_rows(self):
+        self.conn.executemany("INSERT INTO T (Value) VALUES (?)", [(i,) for i in range(7)])
+        chicken_db.reset_profile()
+        cursor = self.conn.execute("SELECT Value FROM T")
+        while cursor.fetchmany(3):
+            pass
+        self.conn.execute("SELECT COUNT(*) FROM T").fetchone()
+        rows = [entry['rows'] for entry in chicken_db.profile_top_queries()]
+        self.assertEqual(sorted(rows), [1, 7])
+
+    def test_render_timing_counts_its_own_queries(self):
+        with mock.patch.object(chicken_db, 'PROFILE_ENABLED', True):
+            self.conn.execute("SELECT 1").fetchall()
+            with chicken_db.profile_render('Dashboard'):
+                self.conn.execute("SELECT 2").fetchall()
+                self.conn.execute("SELECT 3").fetchall()
+        [render] = chicken_db.profile_renders()
+        self.assertEqual((render['view'], render['queries']), ('Dashboard', 2))
+        self.assertGreaterEqual(render['ms'], render['db_ms'])
+
+    def test_render_timing_is_off_without_the_flag(self):
+        with mock.patch.object(chicken_db, 'PROFILE_ENABLED', False):
+            with chicken_db.profile_render('Dashboard'):
+                pass
+        self.assertEqual(chicken_db.profile_renders(), [])
+
+if __name__ == '__main__':
+    unittest.main()
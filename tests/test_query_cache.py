@@ -0,0 +1,70 @@
+import threading
+import unittest
+import chicken_db
+from query_cache import QueryCache
+from tests.support import DatabaseTestCase
+
+SUPPLIERS_QUERY = "SELECT SupplierName FROM Suppliers ORDER BY SupplierName"
+
+class QueryCacheTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        chicken_db.clear_query_cache()
+        chicken_db._query_cache.reset_stats()
+
+    def stats(self):
+        stats = chicken_db.query_cache_stats()
+        return stats['hits'], stats['misses'], stats['stale'], stats['bypassed']
+
+    def test_reads_are_served_until_a_write_commits(self):
+        self.add_supplier('A')
+        self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [('A',)])
+        self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [('A',)])
+        self.assertEqual(self.stats(), (1, 1, 0, 0))
+
+        generation = chicken_db.get_data_generation()
+        self.add_supplier('B')
+        self.assertEqual(chicken_db.get_data_generation(), generation + 1)
+        self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [('A',), ('B',)])
+        self.assertEqual(self.stats(), (1, 2, 1, 0))
+
+    def test_transaction_without_changes_keeps_the_generation(self):
+        chicken_db.read_rows(SUPPLIERS_QUERY)
+        generation = chicken_db.get_data_generation()
+        with chicken_db.transaction() as conn:
+            conn.execute("UPDATE Suppliers SET PhoneNumber = '1' WHERE SupplierName = 'nobody'")
+        self.assertEqual(chicken_db.get_data_generation(), generation)
+        chicken_db.read_rows(SUPPLIERS_QUERY)
+        self.assertEqual(self.stats(), (1, 1, 0, 0))
+
+    def test_reads_inside_a_transaction_bypass_the_cache(self):
+        self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [])
+        with chicken_db.transaction() as conn:
+            conn.execute("INSERT INTO Suppliers (SupplierName, VendorType) VALUES ('A', 'Chicken')")
+            self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [('A',)]) # Uncommitted
+            frame = chicken_db.read_frame(SUPPLIERS_QUERY)
+            self.assertEqual(frame['SupplierName'].tolist(), ['A'])
+        self.assertEqual(self.stats(), (0, 1, 0, 2))
+        self.assertEqual(chicken_db.read_rows(SUPPLIERS_QUERY), [('A',)])
+
+    def test_writes_on_another_connection_invalidate(self):
+        frame = chicken_db.read_frame(SUPPLIERS_QUERY)
+        frame['SupplierName'] = ['changed'] * len(frame) # Callers get a copy
+        writer = threading.Thread(target=lambda: (self.add_supplier('Other'), chicken_db.close_db_connection()))
+        writer.start()
+        writer.join()
+        self.assertEqual(chicken_db.read_frame(SUPPLIERS_QUERY)['SupplierName'].tolist(), ['Other'])
+
+class QueryCacheEvictionTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = QueryCache(max_entries=2)
+        for key in ('a', 'b'):
+            cache.get_or_compute(key, 1, lambda: key.upper())
+        cache.get_or_compute('a', 1, lambda: 'recomputed') # 'a' is now the most recent
+        cache.get_or_compute('c', 1, lambda: 'C')
+        self.assertEqual(cache.get_or_compute('a', 1, lambda: 'recomputed'), 'A')
+        self.assertEqual(cache.get_or_compute('b', 1, lambda: 'recomputed'), 'recomputed')
+        self.assertEqual(cache.get_or_compute('b', 2, lambda: 'newer'), 'newer')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import chicken_db
+from tests.support import DatabaseTestCase
+
+class RawRateDiffTest(unittest.TestCase):
+    BEFORE = [
+        ('2024-03-01', 100.0, 90.0, 500.0),
+        ('2024-03-02', 101.0, 91.0, 510.0),
+        ('2024-03-03', 102.0, 92.0, 520.0),
+    ]
+
+    def test_round_trip(self):
+        after = [
+            ('01/03/2024', 100.0, 90.0, 500.0), # Same date, other spelling: unchanged
+            ('2024-03-02', 105.0, 91.0, 510.0), # Changed
+            ('2024-03-04', 103.0, 93.0, np.nan), # New, one rate blank
+            ('', 1.0, 1.0, 1.0),                 # Blank date, ignored
+        ]
+        diff = chicken_db.diff_raw_rates(self.BEFORE, after)
+        self.assertEqual(diff, {
+            'upsert': [('2024-03-02', 105.0, 91.0, 510.0), ('2024-03-04', 103.0, 93.0, None)],
+            'delete': ['2024-03-03'],
+        })
+
+        rows = {row[0]: row[1:] for row in self.BEFORE}
+        for date in diff['delete']:
+            del rows[date]
+        rows.update({row[0]: row[1:] for row in diff['upsert']})
+        self.assertEqual(chicken_db.diff_raw_rates(sorted((d, *r) for d, r in rows.items()), after),
+                         {'upsert': [], 'delete': []})
+
+class SaveRawRatesTest(DatabaseTestCase):
+    def test_recomputes_only_changed_dates(self):
+        self.add_supplier('V')
+        chicken_db.insert_default_markups('V', [('Tandoori', 'TandoorRate', '+', 20.0, None, None)])
+        with chicken_db.transaction() as conn:
+            conn.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)", RawRateDiffTest.BEFORE)
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, 'V', 'Tandoori', 2, 125, 0, 0, 'stale')
+            """, [(row[0],) for row in RawRateDiffTest.BEFORE])
+
+        after = [RawRateDiffTest.BEFORE[0], ('2024-03-02', 105.0, 91.0, 510.0), RawRateDiffTest.BEFORE[2]]
+        changed_dates, bills_updated = chicken_db.save_raw_rates(RawRateDiffTest.BEFORE, after)
+        self.assertEqual((changed_dates, bills_updated), (['2024-03-02'], 1))
+
+        bills = dict(chicken_db.query_all("SELECT Date, ExpectedRate FROM BillEntries"))
+        self.assertEqual(bills, {'2024-03-01': 0.0, '2024-03-02': 125.0, '2024-03-03': 0.0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import chicken_db
+from tests.support import DatabaseTestCase
+from tests.test_bill_math import reference_bill_row
+from tests.test_markup_engine import BASE_TYPES, random_rule, reference_expected_rate
+
+class RecalculateBillEntriesTest(DatabaseTestCase):
+    """Set-based recompute of saved bills against the per-row formulas."""
+
+    def test_recompute_matches_per_row(self):
+        rng = np.random.default_rng(4)
+        dates = [f"2024-03-{day:02d}" for day in range(1, 11)]
+        self.add_supplier('V1')
+        self.add_supplier('V2')
+        rules = {(s, f"Item {i}"): random_rule(rng, BASE_TYPES[:4]) for s in ('V1', 'V2') for i in range(6)}
+        with chicken_db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(*key, *rule) for key, rule in rules.items()])
+            # One date has no rates at all
+            conn.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)",
+                             [(d, *(round(float(v), 2) for v in rng.uniform(50, 700, 3))) for d in dates[:-1]])
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, ?, ?, ?, ?, 0, 0, 'stale')
+            """, [(d, s, item, float(rng.choice([0.0, round(rng.uniform(0.5, 40), 2)])), round(float(rng.uniform(0, 800)), 2))
+                  for d in dates for (s, item) in rules])
+
+        updated = chicken_db.recalculate_bill_entries(dates[2:])
+        self.assertEqual(sum(updated.values()), len(dates[2:]) * len(rules))
+
+        rates = {row[0]: row[1:] for row in chicken_db.query_all("SELECT * FROM RawData")}
+        rows = chicken_db.query_all("SELECT Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status FROM BillEntries")
+        for date, supplier, item, qty, vendor_rate, expected_rate, variance, status in rows:
+            if date < dates[2]:
+                self.assertEqual(status, 'stale') # Not among the recomputed dates
+                continue
+            reference = reference_expected_rate(rates.get(date), rules[(supplier, item)])
+            self.assertEqual(expected_rate, reference)
+            # Saved Qty is the net quantity
+            _, _, _, reference_variance, reference_status = reference_bill_row(qty, 0.0, reference, vendor_rate)
+            self.assertEqual((variance, status), (reference_variance, reference_status))
+
+if __name__ == '__main__':
+    unittest.main()
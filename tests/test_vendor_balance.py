@@ -0,0 +1,82 @@
+import unittest
+import chicken_db
+from tests.support import DatabaseTestCase
+
+BALANCE_QUERY = """
+    SELECT SupplierName, TotalBilled, TotalPaid, LedgerTotal, NetDue, LastActivityDate
+    FROM VendorBalance ORDER BY SupplierName
+"""
+
+class VendorBalanceTriggerTest(DatabaseTestCase):
+    """VendorBalance as kept by the triggers against a full rebuild, after every kind of write."""
+
+    def balances(self):
+        # Vendors without any activity only get a row from the rebuild
+        return {row[0]: row[1:] for row in chicken_db.query_all(BALANCE_QUERY) if any(row[1:])}
+
+    def rebuilt_balances(self):
+        conn = chicken_db.get_db_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            chicken_db.rebuild_vendor_balances() # Joins the transaction, rolled back below
+            return self.balances()
+        finally:
+            conn.rollback()
+
+    def assert_balances_match(self, step):
+        kept, rebuilt = self.balances(), self.rebuilt_balances()
+        self.assertEqual(sorted(kept), sorted(rebuilt), step)
+        for vendor, row in rebuilt.items():
+            for field, value, expected in zip(('TotalBilled', 'TotalPaid', 'LedgerTotal', 'NetDue'), kept[vendor], row):
+                self.assertAlmostEqual(value, expected, places=6, msg=f"{step}: {vendor} {field}")
+            self.assertEqual(kept[vendor][-1], row[-1], f"{step}: {vendor} LastActivityDate")
+
+    def write(self, step, sql, params=()):
+        with chicken_db.transaction() as conn:
+            conn.execute(sql, params)
+        self.assert_balances_match(step)
+
+    def test_every_trigger_path(self):
+        for name in ('A', 'B', 'C'):
+            self.add_supplier(name)
+        with chicken_db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                VALUES (?, ?, ?, ?, ?, 0, 0, 'Okay')
+            """, [
+                ('2024-06-01', 'A', 'Tandoori', 3.5, 120.25),
+                ('2024-06-02', 'A', 'Boiler', 2.0, 95.1),
+                ('2024-06-05', 'A', 'Egg', 30.0, 6.3),
+                ('2024-06-03', 'B', 'Tandoori', 1.25, 118.0),
+            ])
+            conn.executemany("INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details) VALUES (?, ?, ?, ?, ?)", [
+                ('2024-06-04', 'A', 'Payment', -500.0, 'Cash'),
+                ('2024-06-06', 'A', 'Adjustment', 12.5, 'Round off'),
+                ('2024-06-07', 'B', 'Payment', -100.0, 'UPI'),
+            ])
+        self.assert_balances_match("inserts")
+
+        self.write("bill qty/rate update", "UPDATE BillEntries SET Qty = 4.0, VendorRate = 121.0 WHERE SupplierName = 'A' AND ItemName = 'Tandoori'")
+        self.write("bill unrelated update", "UPDATE BillEntries SET Status = 'HIGH (+)', ExpectedRate = 1 WHERE SupplierName = 'A'")
+        self.write("bill date moved back", "UPDATE BillEntries SET Date = '2024-05-30' WHERE SupplierName = 'A' AND ItemName = 'Egg'")
+        self.write("bill date moved ahead", "UPDATE BillEntries SET Date = '2024-06-10' WHERE SupplierName = 'A' AND ItemName = 'Boiler'")
+        self.write("bill moved to another vendor", "UPDATE BillEntries SET SupplierName = 'B' WHERE SupplierName = 'A' AND ItemName = 'Boiler'")
+        self.write("latest bill deleted", "DELETE FROM BillEntries WHERE SupplierName = 'B' AND Date = '2024-06-10'")
+
+        self.write("ledger amount update", "UPDATE VendorLedger SET Amount = -650.0 WHERE SupplierName = 'A' AND TransactionType = 'Payment'")
+        self.write("ledger type update", "UPDATE VendorLedger SET TransactionType = 'Payment', Amount = -12.5 WHERE Details = 'Round off'")
+        self.write("ledger date update", "UPDATE VendorLedger SET Date = '2024-05-01' WHERE Details = 'Round off'")
+        self.write("ledger moved to another vendor", "UPDATE VendorLedger SET SupplierName = 'C' WHERE Details = 'UPI'")
+        self.write("latest ledger row deleted", "DELETE FROM VendorLedger WHERE SupplierName = 'A' AND Date = '2024-06-04'")
+        self.write("last row of a vendor deleted", "DELETE FROM VendorLedger WHERE SupplierName = 'C'")
+
+        self.assertTrue(chicken_db.delete_vendor_and_cleanup(
+            chicken_db.query_one("SELECT SupplierID FROM Suppliers WHERE SupplierName = 'B'")[0], 'B'))
+        self.assert_balances_match("vendor deleted with its rows")
+        self.assertIsNone(chicken_db.query_one("SELECT * FROM VendorBalance WHERE SupplierName = 'B'"))
+
+        self.write("supplier deleted", "DELETE FROM Suppliers WHERE SupplierName = 'C'")
+        self.assertEqual(chicken_db.query_all("SELECT SupplierName FROM VendorBalance"), [('A',)])
+
+if __name__ == '__main__':
+    unittest.main()
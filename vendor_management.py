@@ -4,13 +4,20 @@ import sqlite3
 from datetime import datetime
 # Import new utility functions from chicken_db
 from chicken_db import (
-    DB_NAME, 
-    fetch_suppliers_and_items, 
-    calculate_expected_rate, 
+    query_one,
+    query_all,
+    transaction,
     delete_vendor_and_cleanup,
     fetch_vendor_type, # New Import
-    insert_default_markups # New Import
+    insert_default_markups, # New Import
+    fetch_vendor_balance,
+    fetch_ledger_page,
+    fetch_supplier_page,
+    LEDGER_PAGE_SIZE,
+    date_key
 )
+from virtual_tree import VirtualTreeview
+import events
 
 # Placeholder for tkcalendar import (assumed to be available in the environment)
 try:
@@ -33,14 +40,42 @@ DEFAULT_CHICKEN_MARKUP_RULES = [
 # -------------------------------
 
 class VendorManager:
-    def __init__(self, master_app, notebook_frame, suppliers, update_app_data_callback):
+    def __init__(self, master_app, notebook_frame, suppliers, event_bus):
         self.master_app = master_app
         self.frame = notebook_frame
         self.suppliers = suppliers
-        self.update_app_data_callback = update_app_data_callback # Callback to refresh lists in chicken_app
+        self.events = event_bus # Shared with the other tabs (see events.py)
 
         # Setup Tab Contents
         self._setup_vendor_management_tab()
+
+        self.events.subscribe(events.SUPPLIERS_CHANGED, self._on_suppliers_changed)
+        self.events.subscribe(events.MARKUPS_CHANGED, self._on_markups_changed)
+        self.events.subscribe(events.BILL_SAVED, self._on_bill_saved)
+        
+    # --- Event Handlers ---
+    def _on_suppliers_changed(self, payloads):
+        self.load_vendor_list()
+        # A removed or renamed vendor's ledger is no longer valid
+        vendor = self.payment_vendor_var.get()
+        if vendor and vendor not in self.suppliers:
+            self.payment_vendor_var.set('')
+            self.ledger_view.load(lambda cursor, limit: ([], None))
+            self.ledger_due_var.set("Select a Vendor to calculate balance.")
+
+    def refresh(self):
+        """Reloads everything the tab shows, e.g. after changes made outside this app."""
+        self._on_suppliers_changed(())
+        self._load_markups_to_grid()
+        self._load_vendor_ledger(None)
+
+    def _on_markups_changed(self, payloads):
+        if (self.markup_vendor_var.get(),) in payloads:
+            self._load_markups_to_grid()
+
+    def _on_bill_saved(self, payloads):
+        if self.payment_vendor_var.get() in {vendor for vendor, _ in payloads}:
+            self._load_vendor_ledger(None)
         
     # --- Calendar Widget Helper ---
     def _open_calendar_popup(self, date_var):
@@ -98,10 +133,11 @@ class VendorManager:
         list_frame = ttk.LabelFrame(frame, text="Existing Suppliers", padding="10")
         list_frame.pack(side=tk.LEFT, fill='y', padx=10, expand=True)
         
-        # Updated Treeview setup with more columns
-        self.vendor_tree = ttk.Treeview(list_frame, 
+        # Updated Treeview setup with more columns; rows are fetched a page at a time while scrolling
+        self.vendor_list = VirtualTreeview(list_frame, on_select=self._update_due_display_and_load_edit,
             columns=('Name', 'Type', 'Phone', 'PaymentType', 'Frequency', 'MarkupReq'), 
             show='headings', selectmode='browse')
+        self.vendor_tree = self.vendor_list.tree
             
         self.vendor_tree.heading('Name', text='Supplier Name')
         self.vendor_tree.heading('Type', text='Type')
@@ -117,8 +153,7 @@ class VendorManager:
         self.vendor_tree.column('Frequency', width=80, anchor='center')
         self.vendor_tree.column('MarkupReq', width=80, anchor='center')
         
-        self.vendor_tree.pack(fill='both', expand=True)
-        self.vendor_tree.bind('<<TreeviewSelect>>', self._update_due_display_and_load_edit)
+        self.vendor_list.frame.pack(fill='both', expand=True)
         
         self.due_label_var = tk.StringVar(value="Select a vendor to view balance.")
         ttk.Label(list_frame, textvariable=self.due_label_var, foreground="blue", font=('Arial', 10, 'bold')).pack(pady=10)
@@ -182,8 +217,7 @@ class VendorManager:
         self.detail_markup_req_var.set(1)
         self.detail_action_var.set("Add New Supplier")
         self.detail_frame.config(text="Add New Vendor")
-        if self.vendor_tree.selection():
-            self.vendor_tree.selection_remove(self.vendor_tree.selection())
+        self.vendor_list.clear_selection()
 
     def _load_vendor_details_into_form(self, vendor_data):
         """Loads data from a selected vendor into the form for editing."""
@@ -199,23 +233,19 @@ class VendorManager:
 
     def _update_due_display_and_load_edit(self, event):
         """Handles vendor selection: updates due display and loads details for editing."""
-        if not self.vendor_tree.selection(): 
+        if not self.vendor_list.selected(): 
              self.due_label_var.set("Select a vendor to view balance.")
              self._clear_detail_form()
              return
         
-        selected_item = self.vendor_tree.selection()[0]
-        vendor_name = self.vendor_tree.item(selected_item, 'values')[0]
+        selected_item, values = self.vendor_list.selected()
+        vendor_name = values[0]
         
         # 1. Update Due Display
         self._calculate_vendor_due(vendor_name)
         
         # 2. Load Details for Edit
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT SupplierID, SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired FROM Suppliers WHERE SupplierName = ?", (vendor_name,))
-        row = cursor.fetchone()
-        conn.close()
+        row = query_one("SELECT SupplierID, SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired FROM Suppliers WHERE SupplierName = ?", (vendor_name,))
         
         if row:
             vendor_data = {
@@ -231,12 +261,12 @@ class VendorManager:
 
     def _delete_selected_vendor(self):
         """Handles the deletion of the currently selected vendor."""
-        if not self.vendor_tree.selection():
+        if not self.vendor_list.selected():
             messagebox.showwarning("Warning", "Please select a vendor to remove.")
             return
 
-        selected_item = self.vendor_tree.selection()[0]
-        vendor_name = self.vendor_tree.item(selected_item, 'values')[0]
+        selected_item, values = self.vendor_list.selected()
+        vendor_name = values[0]
         supplier_id = int(selected_item) # Treeview iid is the SupplierID
         
         confirmation = messagebox.askyesno(
@@ -249,8 +279,7 @@ class VendorManager:
             if delete_vendor_and_cleanup(supplier_id, vendor_name):
                 messagebox.showinfo("Success", f"Vendor '{vendor_name}' and all associated data have been permanently removed.")
                 self._clear_detail_form()
-                self.load_vendor_list()
-                self.master_app.markup_rules_cache = {} # Clear cache
+                self.events.publish(events.SUPPLIERS_CHANGED)
             else:
                 messagebox.showerror("Error", f"Failed to remove vendor '{vendor_name}'. Check database connection.")
 
@@ -268,70 +297,66 @@ class VendorManager:
             return
 
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            
-            if self.current_supplier_id is None: # Insert
-                cursor.execute("""
-                    INSERT INTO Suppliers (SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (name, phone, payment_type, frequency, v_type, markup_req))
-                messagebox.showinfo("Success", f"Supplier '{name}' added.")
-            else: # Update
-                # Check if the name has changed to prevent IntegrityError if it matches another existing name
-                cursor.execute("SELECT SupplierName FROM Suppliers WHERE SupplierID = ?", (self.current_supplier_id,))
-                old_name = cursor.fetchone()[0]
-                if old_name != name:
-                    cursor.execute("SELECT SupplierID FROM Suppliers WHERE SupplierName = ?", (name,))
-                    if cursor.fetchone():
-                        raise sqlite3.IntegrityError("Name clash during update.")
-                        
-                cursor.execute("""
-                    UPDATE Suppliers SET SupplierName=?, PhoneNumber=?, PreferredPaymentType=?, PaymentFrequency=?, VendorType=?, MarkupRequired=?
-                    WHERE SupplierID=?
-                """, (name, phone, payment_type, frequency, v_type, markup_req, self.current_supplier_id))
-                messagebox.showinfo("Success", f"Supplier '{name}' updated.")
+            with transaction() as conn:
+                cursor = conn.cursor()
+                
+                if self.current_supplier_id is None: # Insert
+                    cursor.execute("""
+                        INSERT INTO Suppliers (SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired) 
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (name, phone, payment_type, frequency, v_type, markup_req))
+                    success_msg = f"Supplier '{name}' added."
+                else: # Update
+                    # Check if the name has changed to prevent IntegrityError if it matches another existing name
+                    cursor.execute("SELECT SupplierName FROM Suppliers WHERE SupplierID = ?", (self.current_supplier_id,))
+                    old_name = cursor.fetchone()[0]
+                    if old_name != name:
+                        cursor.execute("SELECT SupplierID FROM Suppliers WHERE SupplierName = ?", (name,))
+                        if cursor.fetchone():
+                            raise sqlite3.IntegrityError("Name clash during update.")
+                            
+                    cursor.execute("""
+                        UPDATE Suppliers SET SupplierName=?, PhoneNumber=?, PreferredPaymentType=?, PaymentFrequency=?, VendorType=?, MarkupRequired=?
+                        WHERE SupplierID=?
+                    """, (name, phone, payment_type, frequency, v_type, markup_req, self.current_supplier_id))
+                    success_msg = f"Supplier '{name}' updated."
                 
-            conn.commit()
+            messagebox.showinfo("Success", success_msg)
             self._clear_detail_form()
-            self.load_vendor_list() # Reload list and notify main app
+            self.events.publish(events.SUPPLIERS_CHANGED) # Every tab reloads its vendor lists once
             
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", f"Supplier name '{name}' already exists.")
         except Exception as e:
             messagebox.showerror("Error", f"Could not save supplier: {e}")
-        finally:
-            conn.close()
 
 
     def load_vendor_list(self):
-        """Loads all supplier names and details into the vendor list treeview."""
-        # Fetch full details
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT SupplierID, SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired FROM Suppliers ORDER BY SupplierName")
-        rows = cursor.fetchall()
-        conn.close()
-        
-        self.suppliers = [row[1] for row in rows] # Update local list for comboboxes
-        
-        # Clear existing data
-        self.vendor_tree.delete(*self.vendor_tree.get_children())
+        """Shows the first page of the vendor list treeview and refreshes the vendor comboboxes."""
+        self.suppliers = self.master_app.suppliers # Kept current by the app's suppliers_changed handler
+        self.vendor_list.load(self._fetch_vendor_rows)
         
-        for row in rows:
-            supplier_id, name, phone, p_type, freq, v_type, markup_req = row
-            markup_display = 'Yes' if markup_req == 1 else 'No'
-            display_values = (name, v_type, phone if phone else 'N/A', p_type, freq, markup_display)
-            self.vendor_tree.insert('', tk.END, iid=supplier_id, values=display_values)
-            
-        self.update_app_data_callback(self.suppliers) # Notify main app to update comboboxes
-        
-        # Update markup combo if it exists
+        # Update the markup and payment combos if they exist
+        if hasattr(self, 'payment_vendor_combo'):
+            self.payment_vendor_combo['values'] = self.suppliers
         if hasattr(self, 'markup_vendor_combo'):
             self.markup_vendor_combo['values'] = self.suppliers
-            if self.suppliers and not self.markup_vendor_var.get():
-                self.markup_vendor_var.set(self.suppliers[0])
-                self._load_markups_to_grid()
+            if self.markup_vendor_var.get() not in self.suppliers:
+                self.markup_vendor_var.set(self.suppliers[0] if self.suppliers else '')
+                if self.suppliers:
+                    self._load_markups_to_grid()
+                else:
+                    self.markup_tree.delete(*self.markup_tree.get_children())
+
+    def _fetch_vendor_rows(self, cursor, limit):
+        """VirtualTreeview source: one page of suppliers as tree rows (iid = SupplierID)."""
+        page = fetch_supplier_page(cursor, limit)
+        rows = []
+        for supplier_id, name, phone, p_type, freq, v_type, markup_req in page['rows']:
+            markup_display = 'Yes' if markup_req == 1 else 'No'
+            display_values = (name, v_type, phone if phone else 'N/A', p_type, freq, markup_display)
+            rows.append((supplier_id, display_values, ()))
+        return rows, page['next_cursor']
 
     # --- Markup Rules Management Changes ---
     def _setup_markup_management_frame(self, frame):
@@ -372,25 +397,19 @@ class VendorManager:
         vendor = self.markup_vendor_var.get()
         if not vendor: return
 
-        # Get current rules and vendor type
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
         # Check if markup is required and get vendor type
-        cursor.execute("SELECT MarkupRequired, VendorType FROM Suppliers WHERE SupplierName = ?", (vendor,))
-        markup_info = cursor.fetchone()
+        markup_info = query_one("SELECT MarkupRequired, VendorType FROM Suppliers WHERE SupplierName = ?", (vendor,))
         
         is_required = markup_info and markup_info[0] == 1
         vendor_type = markup_info[1] if markup_info else "Unknown"
         
         # 1. Check if rules already exist for this vendor
-        cursor.execute("SELECT COUNT(*) FROM Markups WHERE SupplierName = ?", (vendor,))
-        rule_count = cursor.fetchone()[0]
-        conn.close() # Close connection to perform potential database writes outside this fetch
+        rule_count = query_one("SELECT COUNT(*) FROM Markups WHERE SupplierName = ?", (vendor,))[0]
         
         # 2. Automatically populate defaults if it's a Chicken vendor AND no rules exist
         if rule_count == 0 and vendor_type == 'Chicken' and is_required:
             if insert_default_markups(vendor, DEFAULT_CHICKEN_MARKUP_RULES):
+                self.events.publish(events.MARKUPS_CHANGED, vendor)
                 messagebox.showinfo("Auto-Populated", f"Default markup rules for 'Chicken' vendor '{vendor}' have been automatically created.")
                 # We do not need to call fetch_vendor_type again as we know the type
         
@@ -407,22 +426,14 @@ class VendorManager:
         self.add_markup_button.config(state=tk.NORMAL)
         
         # Original loading logic (or loading the newly inserted rules)
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
         query = "SELECT ItemID, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2 FROM Markups WHERE SupplierName = ?"
-        cursor.execute(query, (vendor,))
-        rows = cursor.fetchall()
-        conn.close()
+        rows = query_all(query, (vendor,))
 
         for row in rows:
             item_id = row[0]
             values = row[1:]
             display_values = [str(v) if v is not None else '' for v in values]
             self.markup_tree.insert('', tk.END, iid=item_id, values=display_values)
-        
-        # Clear the calculation cache in the main app after loading new rules
-        self.master_app.markup_rules_cache = {}
 
     def _start_markup_edit(self, event):
         """Allows in-place editing of markup rules. ItemName is now always editable."""
@@ -543,45 +554,42 @@ class VendorManager:
         item_db = item.strip() # Ensure item name is clean
 
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            
             if not item_db:
                  raise ValueError("Item Name cannot be empty.")
             
-            # Temporary rules (Item ID < 0) need to be treated as new insertions
-            if int(item_id) > 0: # Existing rule (UPDATE)
-                # Check for name change conflict only if item name actually changed
-                # Note: We rely on the values already updated in the treeview for item_db
-                cursor.execute("SELECT ItemName FROM Markups WHERE ItemID = ?", (item_id,))
-                old_item_name = cursor.fetchone()[0]
+            with transaction() as conn:
+                cursor = conn.cursor()
                 
-                if old_item_name != item_db:
-                    cursor.execute("SELECT ItemID FROM Markups WHERE SupplierName = ? AND ItemName = ? AND ItemID != ?", 
-                                   (vendor, item_db, item_id))
+                # Temporary rules (Item ID < 0) need to be treated as new insertions
+                if int(item_id) > 0: # Existing rule (UPDATE)
+                    # Check for name change conflict only if item name actually changed
+                    # Note: We rely on the values already updated in the treeview for item_db
+                    cursor.execute("SELECT ItemName FROM Markups WHERE ItemID = ?", (item_id,))
+                    old_item_name = cursor.fetchone()[0]
+                    
+                    if old_item_name != item_db:
+                        cursor.execute("SELECT ItemID FROM Markups WHERE SupplierName = ? AND ItemName = ? AND ItemID != ?", 
+                                       (vendor, item_db, item_id))
+                        if cursor.fetchone():
+                            raise sqlite3.IntegrityError("Name clash during update.")
+                    
+                    cursor.execute("""
+                        UPDATE Markups SET ItemName=?, BaseRateType=?, MarkupOperator1=?, MarkupValue1=?, MarkupOperator2=?, MarkupValue2=?
+                        WHERE ItemID=? AND SupplierName=?
+                    """, (item_db, base, op1_db, val1_db, op2_db, val2_db, item_id, vendor))
+                else: # New rule (INSERT)
+                    # Check for item existence
+                    cursor.execute("SELECT ItemID FROM Markups WHERE SupplierName = ? AND ItemName = ?", (vendor, item_db))
                     if cursor.fetchone():
-                        raise sqlite3.IntegrityError("Name clash during update.")
-                
-                cursor.execute("""
-                    UPDATE Markups SET ItemName=?, BaseRateType=?, MarkupOperator1=?, MarkupValue1=?, MarkupOperator2=?, MarkupValue2=?
-                    WHERE ItemID=? AND SupplierName=?
-                """, (item_db, base, op1_db, val1_db, op2_db, val2_db, item_id, vendor))
-            else: # New rule (INSERT)
-                # Check for item existence
-                cursor.execute("SELECT ItemID FROM Markups WHERE SupplierName = ? AND ItemName = ?", (vendor, item_db))
-                if cursor.fetchone():
-                    raise sqlite3.IntegrityError("A rule for this Item/Vendor combination already exists.")
-                        
-                cursor.execute("""
-                    INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (vendor, item_db, base, op1_db, val1_db, op2_db, val2_db))
+                        raise sqlite3.IntegrityError("A rule for this Item/Vendor combination already exists.")
+                            
+                    cursor.execute("""
+                        INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (vendor, item_db, base, op1_db, val1_db, op2_db, val2_db))
             
-            conn.commit()
-            self.update_app_data_callback() # Refresh item list in main app
-            self._load_markups_to_grid() # Reload grid
+            self.events.publish(events.MARKUPS_CHANGED, vendor) # Reloads this grid, the item map and an open bill
             messagebox.showinfo("Success", f"Markup for '{item_db}' updated/saved.")
-            self.master_app.markup_rules_cache = {} # Clear cache
             
         except sqlite3.IntegrityError as se:
             messagebox.showerror("Error", f"A rule conflict occurred: {se}")
@@ -589,8 +597,6 @@ class VendorManager:
              messagebox.showerror("Input Error", str(ve))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save markup: {e}")
-        finally:
-            conn.close()
 
     def _add_new_markup_rule(self):
         """Adds a temporary row to the markup grid for a new entry."""
@@ -632,13 +638,16 @@ class VendorManager:
         
         ttk.Button(payment_frame, text="Record Payment", command=self._record_payment).grid(row=3, column=0, columnspan=3, pady=10)
 
-        # Bottom: Ledger View
-        self.ledger_tree = ttk.Treeview(frame, columns=('Date', 'Type', 'Amount', 'Details'), show='headings', selectmode='browse')
+        # Bottom: Ledger View (newest first); older pages are fetched while scrolling down
+        self.ledger_view = VirtualTreeview(frame, page_size=LEDGER_PAGE_SIZE,
+            columns=('Date', 'Type', 'Amount', 'Details', 'Balance'), show='headings', selectmode='browse')
+        self.ledger_tree = self.ledger_view.tree
         self.ledger_tree.heading('Date', text='Date')
         self.ledger_tree.heading('Type', text='Transaction Type')
         self.ledger_tree.heading('Amount', text='Amount')
         self.ledger_tree.heading('Details', text='Details')
-        self.ledger_tree.pack(fill='both', expand=True, pady=10)
+        self.ledger_tree.heading('Balance', text='Running Balance')
+        self.ledger_view.frame.pack(fill='both', expand=True, pady=10)
         
         self.payment_vendor_combo.bind('<<ComboboxSelected>>', self._load_vendor_ledger)
         
@@ -649,83 +658,54 @@ class VendorManager:
     def _record_payment(self):
         vendor = self.payment_vendor_var.get()
         amount = self.payment_amount_var.get()
-        date = self.payment_date_var.get()
         
         if not vendor or amount <= 0:
             messagebox.showwarning("Warning", "Please select a vendor and enter a valid amount.")
             return
 
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
-                VALUES (?, ?, ?, ?, ?)
-            """, (date, vendor, 'Payment', -abs(amount), f"Payment recorded on {date}"))
-            conn.commit()
+            date = date_key(self.payment_date_var.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid Date", str(e))
+            return
+
+        try:
+            with transaction() as conn:
+                conn.execute("""
+                    INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (date, vendor, 'Payment', -abs(amount), f"Payment recorded on {date}"))
             
             messagebox.showinfo("Success", f"Payment of {amount:.2f} recorded for {vendor}.")
             self.payment_amount_var.set(0.0)
-            self._load_vendor_ledger(None) 
-            self.load_vendor_list() # Refresh due in vendor list
+            self._load_vendor_ledger(None) # Also refreshes the due balance
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to record payment: {e}")
-        finally:
-            conn.close()
             
     def _load_vendor_ledger(self, event):
-        """Loads all transactions (Bills and Payments) for the selected vendor."""
+        """Loads the newest page of transactions (Bills and Payments) for the selected vendor."""
         vendor = self.payment_vendor_var.get()
         if not vendor: return
 
-        self.ledger_tree.delete(*self.ledger_tree.get_children())
-        
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        # Sum of Bills (debit)
-        bill_query = """
-            SELECT Date, 'Bill' AS Type, SUM(Qty * VendorRate) AS Amount, 'Bill Total' AS Details
-            FROM BillEntries WHERE SupplierName = ?
-            GROUP BY Date
-        """
-        cursor.execute(bill_query, (vendor,))
-        bills = cursor.fetchall()
-        
-        payment_query = "SELECT Date, TransactionType, Amount, Details FROM VendorLedger WHERE SupplierName = ?"
-        cursor.execute(payment_query, (vendor,))
-        payments = cursor.fetchall()
-        conn.close()
-        
-        all_transactions = bills + [(p[0], p[1], p[2], p[3]) for p in payments]
-        all_transactions.sort(key=lambda x: x[0], reverse=True)
+        self.ledger_view.load(lambda cursor, limit: self._fetch_ledger_rows(vendor, cursor, limit))
         
-        for tx in all_transactions:
-            amount = tx[2]
+        self._calculate_vendor_due(vendor)
+
+    def _fetch_ledger_rows(self, vendor, cursor, limit):
+        """VirtualTreeview source: one keyset page of the vendor's ledger as tree rows."""
+        page = fetch_ledger_page(vendor, cursor=cursor, limit=limit)
+        rows = []
+        for date, tx_type, amount, details, balance in page['rows']:
             tag = 'payment_tx' if amount < 0 else 'bill_tx' 
             display_amount = f"{abs(amount):,.2f}"
-            
-            self.ledger_tree.insert('', tk.END, values=(tx[0], tx[1], display_amount, tx[3]), tags=(tag,))
-        
-        self._calculate_vendor_due(vendor)
+            rows.append((None, (date, tx_type, display_amount, details, f"{balance:,.2f}"), (tag,)))
+        return rows, page['next_cursor']
 
     def _calculate_vendor_due(self, vendor):
         """Calculates the current net due balance for a vendor."""
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        # Sum of Bills (debit)
-        cursor.execute("SELECT IFNULL(SUM(Qty * VendorRate), 0.0) FROM BillEntries WHERE SupplierName = ?", (vendor,))
-        total_bills = cursor.fetchone()[0] or 0.0
-        
-        # Sum of Payments (credit, already stored as negative in ledger)
-        cursor.execute("SELECT IFNULL(SUM(Amount), 0.0) FROM VendorLedger WHERE SupplierName = ?", (vendor,))
-        total_payments = cursor.fetchone()[0] or 0.0
-        
-        conn.close()
-        
-        due_balance = round(total_bills + total_payments, 2)
+        # Bills (debit) plus ledger (payments stored as negative), kept current by DB triggers
+        due_balance = fetch_vendor_balance(vendor)['NetDue']
         
         text = ""
         if due_balance > 0:
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import chicken_db
-import sqlite3
+import importers
+import bill_math
+from views import job_status
 from datetime import datetime
 
 def render():
@@ -11,7 +13,7 @@ def render():
     col1, col2 = st.columns(2)
     
     with col1:
-        bill_date = st.date_input("Bill Date", value=datetime.now())
+        bill_date = chicken_db.date_key(st.date_input("Bill Date", value=datetime.now()))
     
     with col2:
         suppliers, _ = chicken_db.fetch_suppliers_and_items()
@@ -25,8 +27,9 @@ def render():
     current_key = f"{selected_vendor}_{bill_date}"
     
     if 'bill_entry_key' not in st.session_state or st.session_state.bill_entry_key != current_key:
-        # Load items and initial data
-        items = chicken_db.fetch_items_for_supplier(selected_vendor)
+        # Load items, rates and existing entries in one round-trip
+        context = chicken_db.fetch_bill_context(bill_date, selected_vendor)
+        items = context['items']
         
         if not items:
             st.warning(f"No markup rules found for {selected_vendor}. Please add rules in Vendor Management.")
@@ -34,24 +37,15 @@ def render():
             st.session_state.bill_entry_key = current_key
             return
 
-        # Check for existing entries in DB
-        conn = chicken_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT ItemName, Qty, VendorRate, ExpectedRate, Variance, Status FROM BillEntries WHERE SupplierName = ? AND Date = ?", (selected_vendor, bill_date))
-        existing_entries = cursor.fetchall()
-        conn.close()
-        
-        existing_map = {row[0]: row for row in existing_entries}
+        existing_map = context['existing']
 
         data = []
         for item in items:
-            # Fetch expected rate
-            raw_rates, rule = chicken_db.fetch_rate_and_rule(bill_date, selected_vendor, item)
-            expected_rate = chicken_db.calculate_expected_rate(raw_rates, rule)
+            expected_rate = context['expected_rates'][item]
             
             if item in existing_map:
                 # Load existing
-                _, qty, v_rate, exp_rate_db, var, status = existing_map[item]
+                qty, v_rate, exp_rate_db, var, status = existing_map[item]
                 # Note: We don't store Qty Recv/Dmg separately in DB currently, only Net Qty.
                 # So we will assume Qty Recv = Net Qty and Qty Dmg = 0 for re-loading to keep it simple,
                 # or we could add columns to DB. For now, simplified assumption.
@@ -88,21 +82,14 @@ def render():
     # Helper to update calculations
     def recalculate_data():
         df = st.session_state.bill_data
-        df["Net Qty"] = (df["Qty Recv"] - df["Qty Dmg"]).clip(lower=0.0)
-        df["Exp Amount"] = (df["Net Qty"] * df["Expected Rate"]).round(2)
-        df["Vendor Amount"] = (df["Net Qty"] * df["Vendor Rate"]).round(2)
-        df["Variance"] = (df["Vendor Amount"] - df["Exp Amount"]).round(2)
-        
-        def get_status(row):
-            if row["Net Qty"] <= 0: return "N/A"
-            if row["Expected Rate"] == 0: return "No Rate"
-            var_pct = (row["Variance"] / row["Exp Amount"] * 100) if row["Exp Amount"] != 0 else 0
-            if var_pct > 5: return "HIGH (+)"
-            if var_pct < -5: return "LOW (-)"
-            if row["Variance"] != 0: return "Variance"
-            return "Okay"
-
-        df["Status"] = df.apply(get_status, axis=1)
+        # Whole columns at once via the shared kernel (no per-row Python). Status follows the
+        # Tk grid: a missing rate is 'No Rate Data' even without quantity, a rate without one 'N/A'
+        rows = bill_math.compute_bill_rows(df["Qty Recv"], df["Qty Dmg"], df["Expected Rate"], df["Vendor Rate"])
+        df["Net Qty"] = rows['net_qty']
+        df["Exp Amount"] = rows['exp_amount']
+        df["Vendor Amount"] = rows['vendor_amount']
+        df["Variance"] = rows['variance']
+        df["Status"] = rows['status']
         st.session_state.bill_data = df
 
     # --- TAB 1: RECEIVED ---
@@ -195,37 +182,35 @@ def render():
                 st.warning("No entries with positive Net Quantity to save.")
             else:
                 try:
-                    conn = chicken_db.get_db_connection()
-                    cursor = conn.cursor()
-                    
-                    # Check for existing
-                    cursor.execute("SELECT COUNT(*) FROM BillEntries WHERE SupplierName = ? AND Date = ?", (selected_vendor, bill_date))
-                    if cursor.fetchone()[0] > 0:
-                        cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ? AND Date = ?", (selected_vendor, bill_date))
-                        cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ? AND Date = ? AND TransactionType = 'Bill'", (selected_vendor, bill_date))
-                    
-                    # Insert Bill Entries
-                    db_entries = []
-                    for _, row in entries_to_save.iterrows():
-                        db_entries.append((
-                            bill_date, selected_vendor, row["Item Name"], 
-                            row["Net Qty"], row["Vendor Rate"], row["Expected Rate"], 
-                            row["Variance"], row["Status"]
-                        ))
-                    
-                    cursor.executemany("""
-                        INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, db_entries)
-                    
-                    # Insert Ledger Entry
-                    cursor.execute("""
-                        INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (bill_date, selected_vendor, 'Bill', total_bill, f"Total Bill Amount for {bill_date}"))
+                    with chicken_db.transaction() as conn:
+                        cursor = conn.cursor()
+                        
+                        # Check for existing
+                        cursor.execute("SELECT COUNT(*) FROM BillEntries WHERE SupplierName = ? AND Date = ?", (selected_vendor, bill_date))
+                        if cursor.fetchone()[0] > 0:
+                            cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ? AND Date = ?", (selected_vendor, bill_date))
+                            cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ? AND Date = ? AND TransactionType = 'Bill'", (selected_vendor, bill_date))
+                        
+                        # Insert Bill Entries
+                        db_entries = []
+                        for _, row in entries_to_save.iterrows():
+                            db_entries.append((
+                                bill_date, selected_vendor, row["Item Name"], 
+                                row["Net Qty"], row["Vendor Rate"], row["Expected Rate"], 
+                                row["Variance"], row["Status"]
+                            ))
+                        
+                        cursor.executemany("""
+                            INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """, db_entries)
+                        
+                        # Insert Ledger Entry
+                        cursor.execute("""
+                            INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (bill_date, selected_vendor, 'Bill', total_bill, f"Total Bill Amount for {bill_date}"))
                     
-                    conn.commit()
-                    conn.close()
                     st.success(f"Bill saved successfully! Total: ₹{total_bill:,.2f}")
                     
                     # Clear session state
@@ -240,7 +225,26 @@ def render():
     st.subheader("Bulk Import Bills (CSV)")
     
     import_type = st.radio("Import Format", ["Standard (Long Format)", "Wide Format (Item Columns)"])
-    uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
+    uploaded_files = st.file_uploader("Upload CSV", type=["csv"], accept_multiple_files=True)
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    
+    if len(uploaded_files) > 1 and import_type != "Standard (Long Format)":
+        # One file per supplier: every column except Date is an item
+        suppliers, _ = chicken_db.fetch_suppliers_and_items()
+        st.write("Supplier of each file:")
+        file_suppliers = {}
+        for f in uploaded_files:
+            guess = importers.supplier_for_file(f.name, suppliers)
+            file_suppliers[f.name] = st.selectbox(
+                f.name, options=suppliers, index=suppliers.index(guess) if guess else 0, key=f"wide_supplier_{f.name}")
+        
+        if st.button(f"Import {len(uploaded_files)} Wide CSVs"):
+            if not suppliers:
+                st.error("Please add a supplier first.")
+            else:
+                specs = [{'name': f.name, 'source': f.getvalue(), 'kind': 'wide_bills', 'supplier': file_suppliers[f.name]}
+                         for f in uploaded_files]
+                job_status.submit('bill_import_jobs', 'files_import', f"{len(specs)} bill files", importers.files_import_job, specs)
     
     if uploaded_file:
         try:
@@ -278,86 +282,12 @@ def render():
                     if not default_supplier:
                         st.error("Please select a supplier.")
                     else:
-                        conn = chicken_db.get_db_connection()
-                        cursor = conn.cursor()
-                        
-                        progress_bar = st.progress(0)
-                        total_rows = len(df)
-                        
-                        for i, row in df.iterrows():
-                            # Parse Date
-                            raw_date = row[col_date]
-                            try:
-                                bill_date = pd.to_datetime(raw_date, dayfirst=True).strftime('%Y-%m-%d')
-                            except:
-                                try:
-                                    bill_date = pd.to_datetime(raw_date).strftime('%Y-%m-%d')
-                                except:
-                                    st.error(f"Invalid date: {raw_date}")
-                                    continue
-                            
-                            # Check/Delete Existing for this Date/Supplier
-                            # Note: This deletes per row, which is inefficient if multiple rows have same date.
-                            # But usually wide format has unique dates.
-                            cursor.execute("SELECT COUNT(*) FROM BillEntries WHERE SupplierName = ? AND Date = ?", (default_supplier, bill_date))
-                            if cursor.fetchone()[0] > 0:
-                                cursor.execute("DELETE FROM BillEntries WHERE SupplierName = ? AND Date = ?", (default_supplier, bill_date))
-                                cursor.execute("DELETE FROM VendorLedger WHERE SupplierName = ? AND Date = ? AND TransactionType = 'Bill'", (default_supplier, bill_date))
-
-                            total_bill_amount = 0.0
-                            db_entries = []
-                            
-                            for item_col in item_cols:
-                                qty = float(row[item_col]) if pd.notnull(row[item_col]) else 0.0
-                                if qty > 0:
-                                    # Map CSV header to Item Name (simple direct mapping for now)
-                                    # User might need a mapping interface if names differ.
-                                    # For now, assume CSV headers match DB Item Names or are close enough.
-                                    # Ideally, we should check if item exists in DB for this supplier.
-                                    item_name = item_col
-                                    
-                                    # Fetch expected rate
-                                    raw_rates, rule = chicken_db.fetch_rate_and_rule(bill_date, default_supplier, item_name)
-                                    expected_rate = chicken_db.calculate_expected_rate(raw_rates, rule)
-                                    
-                                    # Vendor Rate - Not in CSV, assume equal to Expected Rate or 0?
-                                    # Or maybe we should fetch the last known rate?
-                                    # For now, let's set Vendor Rate = Expected Rate (assuming correct billing)
-                                    # or 0 if we want them to verify.
-                                    # User said "item purchased", usually implies quantity.
-                                    # Let's default Vendor Rate to Expected Rate to minimize variance noise, 
-                                    # but flag it? Or just 0?
-                                    # Let's use Expected Rate as a "smart default".
-                                    v_rate = expected_rate 
-                                    
-                                    exp_amount = round(qty * expected_rate, 2)
-                                    vendor_amount = round(qty * v_rate, 2)
-                                    variance = round(vendor_amount - exp_amount, 2)
-                                    
-                                    status = 'Okay'
-                                    if expected_rate == 0: status = 'No Rate Data'
-                                    
-                                    db_entries.append((
-                                        bill_date, default_supplier, item_name, qty, v_rate, expected_rate, variance, status
-                                    ))
-                                    total_bill_amount += vendor_amount
-                            
-                            if db_entries:
-                                cursor.executemany("""
-                                    INSERT INTO BillEntries (Date, SupplierName, ItemName, Qty, VendorRate, ExpectedRate, Variance, Status)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                """, db_entries)
-                                
-                                cursor.execute("""
-                                    INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
-                                    VALUES (?, ?, ?, ?, ?)
-                                """, (bill_date, default_supplier, 'Bill', total_bill_amount, f"Imported Bill for {bill_date}"))
-                            
-                            progress_bar.progress((i + 1) / total_rows)
-                            
-                        conn.commit()
-                        conn.close()
-                        st.success(f"Imported bills for {total_rows} dates.")
+                        # Map CSV headers directly to Item Names (headers must match the vendor's markup items)
+                        job_status.submit('bill_import_jobs', 'wide_bill_import', f"{uploaded_file.name} for {default_supplier}",
+                                          importers.wide_bills_import_job, df, col_date, item_cols, default_supplier)
                         
         except Exception as e:
             st.error(f"Error processing CSV: {e}")
+
+    job_status.render_jobs('bill_import_jobs', lambda result: (
+        f"Imported bills for {result['bill_dates_imported'] if 'files' in result else result['dates_imported']} dates."))
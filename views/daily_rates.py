@@ -1,21 +1,20 @@
 import streamlit as st
 import pandas as pd
 import chicken_db
-import sqlite3
+import importers
+import forecasting
+from views import job_status
 from datetime import datetime
 
 def render():
     st.header("Daily Rates Entry")
     
     # Date Selection
-    date = st.date_input("Select Date", value=datetime.now())
+    date = chicken_db.date_key(st.date_input("Select Date", value=datetime.now()))
     
     # Pre-fill Logic
-    conn = chicken_db.get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (date,))
-    existing_data = cursor.fetchone()
-    conn.close()
+    rows = chicken_db.read_rows("SELECT TandoorRate, BoilerRate, EggRate FROM RawData WHERE Date = ?", (date,))
+    existing_data = rows[0] if rows else None
     
     default_tandoor = 0.0
     default_boiler = 0.0
@@ -39,20 +38,19 @@ def render():
         
     if st.button("Save Rates"):
         try:
-            conn = chicken_db.get_db_connection()
-            cursor = conn.cursor()
-            
-            # 1. Upsert Rates
-            cursor.execute("""
-                INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
-                ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
-            """, (date, tandoor, boiler, egg))
-            
-            # 2. Update BillEntries
-            updated_count = update_bill_entries_for_date(cursor, date, tandoor, boiler, egg)
+            with chicken_db.transaction() as conn:
+                cursor = conn.cursor()
+                
+                # 1. Upsert Rates
+                cursor.execute("""
+                    INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
+                """, (date, tandoor, boiler, egg))
+                
+                # 2. Recompute the date's BillEntries from the rates just saved
+                updated_count = chicken_db.recalculate_bill_entries([date]).get(chicken_db.date_key(date), 0)
+            forecasting.record_rates(date, tandoor, boiler, egg)
             
-            conn.commit()
-            conn.close()
             st.success(f"Rates for {date} saved successfully! Updated {updated_count} bill entries.")
             
         except Exception as e:
@@ -60,7 +58,15 @@ def render():
 
     st.divider()
     st.subheader("Bulk Import Rates (CSV)")
-    uploaded_file = st.file_uploader("Upload CSV", type=["csv"], help="Upload daily rates CSV")
+    uploaded_files = st.file_uploader("Upload CSV", type=["csv"], accept_multiple_files=True,
+                                      help="Upload a daily rates CSV, or several (e.g. one per month)")
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    
+    if len(uploaded_files) > 1:
+        st.write(f"{len(uploaded_files)} files; columns are matched by name (Date, Tandoor, Boiler, Egg).")
+        if st.button(f"Import {len(uploaded_files)} Files"):
+            specs = [{'name': f.name, 'source': f.getvalue(), 'kind': 'rates', 'supplier': None} for f in uploaded_files]
+            job_status.submit('rate_import_jobs', 'files_import', f"{len(specs)} rate files", importers.files_import_job, specs)
     
     if uploaded_file:
         try:
@@ -84,76 +90,12 @@ def render():
             col_egg = st.selectbox("Egg Rate Column", cols, index=get_index(cols, ['egg']))
             
             if st.button("Import CSV Data"):
-                conn = chicken_db.get_db_connection()
-                cursor = conn.cursor()
-                total_updated = 0
-                
-                progress_bar = st.progress(0)
-                for i, row in df.iterrows():
-                    # Handle Date Formats (d/m/Y or d/m/y)
-                    raw_date = row[col_date]
-                    try:
-                        d_date = pd.to_datetime(raw_date, dayfirst=True).strftime('%Y-%m-%d')
-                    except:
-                        try:
-                            d_date = pd.to_datetime(raw_date).strftime('%Y-%m-%d')
-                        except:
-                            st.error(f"Could not parse date: {raw_date}")
-                            continue
-
-                    d_tandoor = float(row[col_tandoor])
-                    d_boiler = float(row[col_boiler])
-                    d_egg = float(row[col_egg])
-                    
-                    cursor.execute("""
-                        INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)
-                        ON CONFLICT(Date) DO UPDATE SET TandoorRate=excluded.TandoorRate, BoilerRate=excluded.BoilerRate, EggRate=excluded.EggRate
-                    """, (d_date, d_tandoor, d_boiler, d_egg))
-                    
-                    total_updated += update_bill_entries_for_date(cursor, d_date, d_tandoor, d_boiler, d_egg)
-                    progress_bar.progress((i + 1) / len(df))
-                
-                conn.commit()
-                conn.close()
-                st.success(f"Imported {len(df)} rows. Updated {total_updated} related bill entries.")
+                # Runs in the background; progress and the result show below
+                job_status.submit('rate_import_jobs', 'rate_import', f"Rates from {uploaded_file.name}",
+                                  importers.rates_import_job, df, col_date, col_tandoor, col_boiler, col_egg)
         except Exception as e:
             st.error(f"Error processing CSV: {e}")
 
-def update_bill_entries_for_date(cursor, date, tandoor, boiler, egg):
-    """Recalculates ExpectedRate and Variance for all bills on a given date."""
-    cursor.execute("SELECT SupplierName, ItemName, Qty, VendorRate FROM BillEntries WHERE Date = ?", (date,))
-    entries = cursor.fetchall()
-    
-    updated_count = 0
-    raw_rates = (tandoor, boiler, egg)
-    
-    for supplier, item, qty, vendor_rate in entries:
-        cursor.execute("""
-            SELECT BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2
-            FROM Markups 
-            WHERE SupplierName = ? AND ItemName = ?
-        """, (supplier, item))
-        rule = cursor.fetchone()
-        
-        expected_rate = chicken_db.calculate_expected_rate(raw_rates, rule)
-        
-        exp_amount = round(qty * expected_rate, 2)
-        vendor_amount = round(qty * vendor_rate, 2)
-        variance = round(vendor_amount - exp_amount, 2)
-        
-        status = 'Okay'
-        if qty > 0 and expected_rate > 0:
-            var_pct = (variance / exp_amount) * 100 if exp_amount else 0.0
-            if var_pct > 5.0: status = 'HIGH (+)'
-            elif var_pct < -5.0: status = 'LOW (-)'
-            elif variance != 0.0: status = 'Variance'
-        elif expected_rate == 0.0:
-            status = 'No Rate Data'
-        
-        cursor.execute("""
-            UPDATE BillEntries 
-            SET ExpectedRate = ?, Variance = ?, Status = ?
-            WHERE Date = ? AND SupplierName = ? AND ItemName = ?
-        """, (expected_rate, variance, status, date, supplier, item))
-        updated_count += 1
-    return updated_count
\ No newline at end of file
+    job_status.render_jobs('rate_import_jobs', lambda result: (
+        f"Imported {result['rates_imported'] if 'files' in result else result['imported']} rows. "
+        f"Updated {result['bills_updated']} related bill entries."))
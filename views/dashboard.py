@@ -1,12 +1,13 @@
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-import sqlite3
 import chicken_db
-import numpy as np
-from datetime import datetime, timedelta
-
-def get_db_connection():
-    return sqlite3.connect(chicken_db.DB_NAME)
+import forecasting
+import archive
+import exports
+from views import job_status
+from datetime import date
 
 def render():
     st.header("Dashboard")
@@ -25,86 +26,78 @@ def render():
 def render_overview_tab():
     st.subheader("Financial Overview")
     
-    conn = get_db_connection()
-    
-    # 1. Summary Metrics
-    suppliers = pd.read_sql_query("SELECT SupplierName FROM Suppliers", conn)
-    
-    total_due = 0.0
-    
-    if not suppliers.empty:
-        for vendor in suppliers['SupplierName']:
-            cursor = conn.cursor()
-            cursor.execute("SELECT IFNULL(SUM(Qty * VendorRate), 0.0) FROM BillEntries WHERE SupplierName = ?", (vendor,))
-            bill_total = cursor.fetchone()[0]
-            cursor.execute("SELECT IFNULL(SUM(Amount), 0.0) FROM VendorLedger WHERE SupplierName = ?", (vendor,))
-            payment_total = cursor.fetchone()[0]
-            total_due += (bill_total + payment_total)
+    # 1. Summary Metrics (read from the trigger-maintained VendorBalance table)
+    supplier_count = chicken_db.read_rows("SELECT COUNT(*) FROM Suppliers")[0][0]
+    total_due = chicken_db.fetch_total_outstanding()
     
     col1, col2 = st.columns(2)
     col1.metric("Total Outstanding Dues", f"₹{total_due:,.2f}")
-    col2.metric("Active Suppliers", len(suppliers))
+    col2.metric("Active Suppliers", supplier_count)
     
     st.divider()
     
     # 2. Rate Trends
     st.subheader("Daily Rate Trends")
-    df_rates = pd.read_sql_query("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date", conn)
+    df_rates = chicken_db.read_frame("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date")
     
     if not df_rates.empty:
         df_rates['Date'] = pd.to_datetime(df_rates['Date'])
         st.line_chart(df_rates, x='Date', y=['TandoorRate', 'BoilerRate', 'EggRate'])
         
-        # 3. Advanced Prediction (Polynomial Regression)
-        st.subheader("Rate Prediction (Next Day)")
+        # 3. Advanced Prediction (Polynomial Regression over a trailing window)
+        st.subheader("Rate Prediction")
         
-        # Prepare data for prediction
-        df_rates['DateOrdinal'] = df_rates['Date'].map(pd.Timestamp.toordinal)
+        s_col1, s_col2 = st.columns(2)
+        window_days = s_col1.select_slider("Trend Window (days)", options=[30, 60, 90, 180, 365, None], value=forecasting.DEFAULT_WINDOW_DAYS,
+                                           format_func=lambda days: "All" if days is None else str(days),
+                                           help=f"The trend is fitted over the last {forecasting.DEFAULT_WINDOW_DAYS} days by default; "
+                                                "choose All to fit the whole history as earlier versions did.")
+        horizon_days = s_col2.number_input("Days Ahead", min_value=1, max_value=14, value=1)
+        
+        # Cached between reruns; only refitted when RawData changed
+        forecaster = forecasting.get_rate_forecaster(window_days=window_days)
         
         # We need enough data points
-        if len(df_rates) >= 5:
-            X = df_rates['DateOrdinal'].values
-            next_day_ordinal = (df_rates['Date'].max() + timedelta(days=1)).toordinal()
-            
-            def predict_next(y_values):
-                # Fit a 2nd degree polynomial
-                coeffs = np.polyfit(X, y_values, 2)
-                poly = np.poly1d(coeffs)
-                return poly(next_day_ordinal)
-
-            pred_tandoor = predict_next(df_rates['TandoorRate'].values)
-            pred_boiler = predict_next(df_rates['BoilerRate'].values)
-            pred_egg = predict_next(df_rates['EggRate'].values)
+        if len(forecaster) >= forecasting.MIN_POINTS:
+            df_pred = forecaster.forecast(int(horizon_days))
+            next_day = df_pred.iloc[0]
             
             p_col1, p_col2, p_col3 = st.columns(3)
-            p_col1.metric("Predicted Tandoor", f"₹{pred_tandoor:.2f}")
-            p_col2.metric("Predicted Boiler", f"₹{pred_boiler:.2f}")
-            p_col3.metric("Predicted Egg", f"₹{pred_egg:.2f}")
-            st.caption("Prediction based on Polynomial Regression (Degree 2). Model updates automatically with new data.")
+            p_col1.metric("Predicted Tandoor", f"₹{next_day['TandoorRate']:.2f}")
+            p_col2.metric("Predicted Boiler", f"₹{next_day['BoilerRate']:.2f}")
+            p_col3.metric("Predicted Egg", f"₹{next_day['EggRate']:.2f}")
+            if horizon_days > 1:
+                st.dataframe(df_pred.round(2), use_container_width=True)
+            st.caption(f"Prediction based on Polynomial Regression (Degree {forecasting.DEFAULT_DEGREE}) over {'all history' if window_days is None else f'the last {window_days} days'}. Model updates automatically with new data.")
         else:
-            st.warning("Need at least 5 days of data for accurate prediction.")
+            st.warning(f"Need at least {forecasting.MIN_POINTS} days of data in the trend window for accurate prediction.")
     else:
         st.info("No rate data available for trends.")
-        
-    conn.close()
 
 def render_variance_tab():
     st.subheader("Variance & Pilferage Analysis")
     
-    conn = get_db_connection()
-    
-    # Fetch all bill entries with variance
-    query = """
-        SELECT Date, SupplierName, ItemName, ExpectedRate, VendorRate, Variance, (Variance/ExpectedRate)*100 as VariancePct
-        FROM BillEntries 
-        WHERE Variance != 0
-        ORDER BY Date DESC
-    """
-    df_var = pd.read_sql_query(query, conn)
-    conn.close()
+    bounds = chicken_db.read_rows("SELECT MIN(Date), MAX(Date) FROM BillEntries")[0]
+    if bounds[0] is None:
+        st.info("No variance records found.")
+        return
+
+    period = st.date_input("Period", value=(date.fromisoformat(bounds[0]), date.fromisoformat(bounds[1])), key="variance_period")
+    if len(period) != 2:
+        st.info("Select the end of the period.")
+        return
+    render_export_controls(period)
+
+    # Closed months are read from the columnar archive when it has them (see archive.py)
+    df_var = archive.read_range('BillEntries', period[0], period[1],
+                                columns=['SupplierName', 'ItemName', 'ExpectedRate', 'VendorRate', 'Variance'],
+                                filters=[('Variance', '!=', 0.0)])
+    df_var = df_var.sort_values('Date', ascending=False, kind='stable')
+    df_var['VariancePct'] = (df_var['Variance'] / df_var['ExpectedRate'].where(df_var['ExpectedRate'] != 0)) * 100
     
     if df_var.empty:
         st.info("No variance records found.")
+        render_archive_controls()
         return
         
     # Filter options
@@ -113,6 +106,7 @@ def render_variance_tab():
     
     if selected_vendor != "All":
         df_var = df_var[df_var['SupplierName'] == selected_vendor]
+    df_var = df_var.assign(SupplierName=df_var['SupplierName'].cat.remove_unused_categories())
         
     # Chart
     st.bar_chart(df_var, x='Date', y='Variance', color='SupplierName')
@@ -121,6 +115,7 @@ def render_variance_tab():
     st.dataframe(
         df_var,
         column_config={
+            "Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
             "Variance": st.column_config.NumberColumn(format="₹%.2f"),
             "VariancePct": st.column_config.NumberColumn("Variance %", format="%.1f%%"),
             "ExpectedRate": st.column_config.NumberColumn(format="₹%.2f"),
@@ -130,13 +125,59 @@ def render_variance_tab():
         hide_index=True
     )
 
+    render_archive_controls()
+
+def render_export_controls(period):
+    with st.expander("Export Report"):
+        e_col1, e_col2 = st.columns(2)
+        layout = e_col1.selectbox("Layout", list(exports.EXPORT_LAYOUTS), key="export_layout",
+                                  format_func=lambda key: exports.EXPORT_LAYOUTS[key]['title'])
+        fmt = e_col2.selectbox("Format", exports.EXPORT_FORMATS, key="export_format")
+
+        if st.button("Prepare Export"):
+            try:
+                # Streamed from the database into a file; only the finished file is held for download
+                previous = st.session_state.get('export_file')
+                if previous and os.path.exists(previous):
+                    os.remove(previous)
+                if 'export_dir' not in st.session_state:
+                    st.session_state.export_dir = tempfile.mkdtemp(prefix='chicken_exports_')
+                path, count = exports.export_report(layout, fmt, st.session_state.export_dir, period[0], period[1])
+                st.session_state.export_file = path
+                st.session_state.export_rows = count
+            except Exception as e:
+                st.error(f"Error exporting: {e}")
+
+        path = st.session_state.get('export_file')
+        if path and os.path.exists(path):
+            name = os.path.basename(path)
+            with open(path, 'rb') as f:
+                st.download_button(f"Download {name} ({st.session_state.export_rows:,} rows)", data=f, file_name=name,
+                                   mime=exports.EXPORT_MIME_TYPES[name.rsplit('.', 1)[-1]])
+
+def render_archive_controls():
+    with st.expander("Columnar Archive"):
+        if not archive.ARCHIVE_AVAILABLE:
+            st.caption("Install pyarrow to archive closed months for faster long-range analysis.")
+            return
+
+        summary = archive.archive_summary()
+        bills = summary['BillEntries']
+        st.caption(f"{bills['months']} month(s) of bills archived ({bills['rows']:,} rows), {bills['stale']} changed since.")
+        pending = archive.pending_months()
+        if st.button(f"Archive Closed Months ({len(pending)} pending)", disabled=not pending):
+            try:
+                exported = archive.archive_closed_months()
+                st.success(f"Archived {len(exported)} month file(s) to {archive.archive_dir()}.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error archiving: {e}")
+
 def render_history_tab():
     st.subheader("Historical Rate Data")
-    st.info("You can edit historical rates here. Note: This does NOT automatically recalculate old bills.")
+    st.info("You can edit historical rates here. Bills on the edited dates are recalculated when you save.")
     
-    conn = get_db_connection()
-    df_history = pd.read_sql_query("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date DESC", conn)
-    conn.close()
+    df_history = chicken_db.read_frame("SELECT Date, TandoorRate, BoilerRate, EggRate FROM RawData ORDER BY Date DESC")
     
     edited_history = st.data_editor(
         df_history,
@@ -147,24 +188,17 @@ def render_history_tab():
     )
     
     if st.button("Save Historical Data"):
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Full replace strategy for simplicity
-            cursor.execute("DELETE FROM RawData")
-            
-            data_to_insert = []
-            for _, row in edited_history.iterrows():
-                if row['Date']:
-                    data_to_insert.append((
-                        row['Date'], row['TandoorRate'], row['BoilerRate'], row['EggRate']
-                    ))
-            
-            cursor.executemany("INSERT INTO RawData (Date, TandoorRate, BoilerRate, EggRate) VALUES (?, ?, ?, ?)", data_to_insert)
-            conn.commit()
-            conn.close()
-            st.success("Historical data updated.")
-            st.rerun()
-        except Exception as e:
-            st.error(f"Error saving history: {e}")
+        # Only the edited dates are written, then their bills are recomputed (in the background)
+        job_status.submit('history_jobs', 'rate_history_save', "Historical rate edits", _save_history_job,
+                          list(df_history.itertuples(index=False, name=None)),
+                          list(edited_history[['Date', 'TandoorRate', 'BoilerRate', 'EggRate']].itertuples(index=False, name=None)))
+
+    job_status.render_jobs('history_jobs', lambda result: (
+        f"Historical data updated for {result['changed_dates']} date(s). Recalculated {result['bills_updated']} bill entries."
+        if result['changed_dates'] else "No changes to save."))
+
+def _save_history_job(job, before, after):
+    job.set_progress(0, 1, "Saving rate edits")
+    changed_dates, bills_updated = job.write(chicken_db.save_raw_rates, before, after)
+    job.set_progress(1)
+    return {'changed_dates': len(changed_dates), 'bills_updated': bills_updated}
@@ -0,0 +1,72 @@
+import streamlit as st
+import jobs
+
+# Status panel for background jobs (see jobs.py). Views keep the ids of the jobs they
+# submitted in st.session_state[session_key] and call render_jobs() where the result
+# should appear; while a job is running the panel refreshes itself every POLL_SECONDS.
+
+POLL_SECONDS = 1.0
+SHOWN_JOBS = 3
+
+def submit(session_key, kind, label, body, *args, **kwargs):
+    """Submits a job to the shared runner and remembers its id for render_jobs()."""
+    job_id = jobs.get_job_runner().submit(kind, label, body, *args, **kwargs)
+    st.session_state.setdefault(session_key, []).insert(0, job_id)
+    return job_id
+
+def _render_rejects(result, prefix=""):
+    for line, reason in result.get('rejects', [])[:20]:
+        st.error(f"{prefix}Skipped line {line}: {reason}")
+    if result.get('rejected', 0) > 20:
+        st.error(f"{prefix}... and {result['rejected'] - 20} more skipped lines.")
+
+def _render_job(record, describe_result):
+    status = record['status']
+    st.write(f"**{record['label']}** — {status}")
+
+    if status in (jobs.STATUS_QUEUED, jobs.STATUS_RUNNING):
+        total = record['total'] or 0
+        fraction = min(record['done'] / total, 1.0) if total else 0.0
+        st.progress(fraction, text=f"{record['message'] or 'Working'}: {record['done']:,} / {total:,}" if total else record['message'])
+        if st.button("Cancel", key=f"cancel_{record['id']}"):
+            jobs.get_job_runner().cancel(record['id'])
+            st.rerun()
+    elif status == jobs.STATUS_SUCCEEDED:
+        result = record['result'] or {}
+        st.success(describe_result(result))
+        _render_rejects(result)
+        # Multi-file imports report each file separately
+        for file in result.get('files', []):
+            if file['error']:
+                st.error(f"{file['name']}: not imported ({file['error']})")
+            else:
+                _render_rejects(file, f"{file['name']}: ")
+    elif status == jobs.STATUS_FAILED:
+        st.error(f"Failed: {record['error']}")
+    else:
+        st.warning(f"{status.capitalize()} after {record['done']:,} of {record['total'] or 0:,}; completed batches were kept.")
+
+def render_jobs(session_key, describe_result):
+    """Shows this session's latest jobs under session_key. describe_result(result) -> summary text."""
+    job_ids = st.session_state.get(session_key, [])[:SHOWN_JOBS]
+    if not job_ids:
+        return
+
+    runner = jobs.get_job_runner()
+    records = [record for record in (runner.get(job_id) for job_id in job_ids) if record]
+    active = any(record['status'] not in jobs.FINISHED_STATUSES for record in records)
+
+    def panel():
+        current = [runner.get(record['id']) for record in records]
+        for record in current:
+            _render_job(record, describe_result)
+        if active and all(record['status'] in jobs.FINISHED_STATUSES for record in current):
+            st.rerun() # Refresh the whole page once the work is done
+
+    # st.fragment reruns only the panel (Streamlit >= 1.37); older versions refresh on demand
+    if active and hasattr(st, 'fragment'):
+        st.fragment(run_every=POLL_SECONDS)(panel)()
+    else:
+        panel()
+        if active:
+            st.button("Refresh Status", key=f"refresh_{session_key}")
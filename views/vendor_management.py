@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import chicken_db
-import sqlite3
 from datetime import datetime
 
 # Default rules for new Chicken vendors
@@ -32,9 +31,6 @@ def render():
     with tab3:
         render_ledger_tab()
 
-def get_db_connection():
-    return sqlite3.connect(chicken_db.DB_NAME)
-
 # -----------------------------------------------------------------------------
 # TAB 1: SUPPLIERS
 # -----------------------------------------------------------------------------
@@ -42,9 +38,7 @@ def render_suppliers_tab():
     st.subheader("Manage Suppliers")
     
     # 1. List Existing Suppliers
-    conn = get_db_connection()
-    df_suppliers = pd.read_sql_query("SELECT * FROM Suppliers", conn)
-    conn.close()
+    df_suppliers = chicken_db.read_frame("SELECT * FROM Suppliers")
     
     st.dataframe(df_suppliers, use_container_width=True, hide_index=True)
     
@@ -71,34 +65,32 @@ def render_suppliers_tab():
                 st.error("Supplier Name is required.")
             else:
                 try:
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    
-                    # Upsert logic (simplified: Insert or Replace)
-                    # Note: Replace might change ID, so better to check existence
-                    cursor.execute("SELECT SupplierID FROM Suppliers WHERE SupplierName = ?", (name,))
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        cursor.execute("""
-                            UPDATE Suppliers SET PhoneNumber=?, PreferredPaymentType=?, PaymentFrequency=?, VendorType=?, MarkupRequired=?
-                            WHERE SupplierName=?
-                        """, (phone, pay_type, freq, vendor_type, 1 if markup_req else 0, name))
-                        st.success(f"Supplier '{name}' updated.")
-                    else:
-                        cursor.execute("""
-                            INSERT INTO Suppliers (SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        """, (name, phone, pay_type, freq, vendor_type, 1 if markup_req else 0))
-                        st.success(f"Supplier '{name}' added.")
+                    with chicken_db.transaction() as conn:
+                        cursor = conn.cursor()
                         
-                        # Auto-populate defaults for Chicken
-                        if vendor_type == 'Chicken' and markup_req:
-                             chicken_db.insert_default_markups(name, DEFAULT_CHICKEN_MARKUP_RULES)
-                             st.info("Default markup rules added.")
+                        # Upsert logic (simplified: Insert or Replace)
+                        # Note: Replace might change ID, so better to check existence
+                        cursor.execute("SELECT SupplierID FROM Suppliers WHERE SupplierName = ?", (name,))
+                        existing = cursor.fetchone()
+                        
+                        if existing:
+                            cursor.execute("""
+                                UPDATE Suppliers SET PhoneNumber=?, PreferredPaymentType=?, PaymentFrequency=?, VendorType=?, MarkupRequired=?
+                                WHERE SupplierName=?
+                            """, (phone, pay_type, freq, vendor_type, 1 if markup_req else 0, name))
+                            st.success(f"Supplier '{name}' updated.")
+                        else:
+                            cursor.execute("""
+                                INSERT INTO Suppliers (SupplierName, PhoneNumber, PreferredPaymentType, PaymentFrequency, VendorType, MarkupRequired)
+                                VALUES (?, ?, ?, ?, ?, ?)
+                            """, (name, phone, pay_type, freq, vendor_type, 1 if markup_req else 0))
+                            st.success(f"Supplier '{name}' added.")
+                            
+                            # Auto-populate defaults for Chicken (joins this transaction)
+                            if vendor_type == 'Chicken' and markup_req:
+                                 chicken_db.insert_default_markups(name, DEFAULT_CHICKEN_MARKUP_RULES)
+                                 st.info("Default markup rules added.")
 
-                    conn.commit()
-                    conn.close()
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error saving supplier: {e}")
@@ -132,12 +124,10 @@ def render_markups_tab():
         return
 
     # Load Rules
-    conn = get_db_connection()
-    df_rules = pd.read_sql_query("""
+    df_rules = chicken_db.read_frame("""
         SELECT ItemID, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2 
         FROM Markups WHERE SupplierName = ?
-    """, conn, params=(selected_vendor,))
-    conn.close()
+    """, (selected_vendor,))
     
     # If empty, we might want to show an empty structure for editing
     if df_rules.empty:
@@ -168,34 +158,19 @@ def render_markups_tab():
     
     if st.button("Save Markup Rules"):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Full Replace Strategy
-            cursor.execute("DELETE FROM Markups WHERE SupplierName = ?", (selected_vendor,))
+            # Diff against the rules this editor was loaded with; only changes are written
+            rule_columns = ['ItemID', 'ItemName', *chicken_db.RULE_COLUMNS]
+            changed = chicken_db.save_markup_rules(
+                selected_vendor,
+                df_rules[rule_columns].itertuples(index=False, name=None),
+                edited_df[rule_columns].itertuples(index=False, name=None)
+            )
             
-            rules_to_insert = []
-            for _, row in edited_df.iterrows():
-                if row['ItemName']: # Skip empty rows
-                    rules_to_insert.append((
-                        selected_vendor,
-                        row['ItemName'],
-                        row['BaseRateType'],
-                        row['MarkupOperator1'],
-                        row['MarkupValue1'],
-                        row['MarkupOperator2'],
-                        row['MarkupValue2']
-                    ))
-            
-            cursor.executemany("""
-                INSERT INTO Markups (SupplierName, ItemName, BaseRateType, MarkupOperator1, MarkupValue1, MarkupOperator2, MarkupValue2)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, rules_to_insert)
-            
-            conn.commit()
-            conn.close()
-            st.success("Markup rules saved successfully.")
-            st.rerun()
+            if changed:
+                st.success(f"Markup rules saved: {', '.join(changed)} changed.")
+                st.rerun()
+            else:
+                st.info("No changes to save.")
             
         except Exception as e:
             st.error(f"Error saving rules: {e}")
@@ -225,14 +200,11 @@ def render_ledger_tab():
         if st.button("Record Payment"):
             if pay_amount > 0:
                 try:
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (pay_date, selected_vendor, 'Payment', -abs(pay_amount), pay_details))
-                    conn.commit()
-                    conn.close()
+                    with chicken_db.transaction() as conn:
+                        conn.execute("""
+                            INSERT INTO VendorLedger (Date, SupplierName, TransactionType, Amount, Details)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (chicken_db.date_key(pay_date), selected_vendor, 'Payment', -abs(pay_amount), pay_details))
                     st.success(f"Payment of ₹{pay_amount} recorded.")
                     st.rerun()
                 except Exception as e:
@@ -242,32 +214,24 @@ def render_ledger_tab():
 
     st.divider()
 
-    # 2. View Ledger
-    conn = get_db_connection()
-    
-    # Fetch Bills (aggregated)
-    df_bills = pd.read_sql_query("""
-        SELECT Date, 'Bill' AS TransactionType, SUM(Qty * VendorRate) AS Amount, 'Bill Total' AS Details
-        FROM BillEntries WHERE SupplierName = ?
-        GROUP BY Date
-    """, conn, params=(selected_vendor,))
-    
-    # Fetch Payments
-    df_payments = pd.read_sql_query("""
-        SELECT Date, TransactionType, Amount, Details FROM VendorLedger WHERE SupplierName = ?
-    """, conn, params=(selected_vendor,))
+    # 2. View Ledger (one page at a time, newest first)
+    f_col1, f_col2 = st.columns(2)
+    from_date = f_col1.date_input("From", value=None, key="ledger_from")
+    to_date = f_col2.date_input("To", value=None, key="ledger_to")
     
-    conn.close()
+    # Cursor stack for this vendor/range/data version: [None, cursor of page 2, ...]
+    view_key = (selected_vendor, from_date, to_date, chicken_db.get_data_generation())
+    if st.session_state.get("ledger_view_key") != view_key:
+        st.session_state.ledger_view_key = view_key
+        st.session_state.ledger_cursors = [None]
+    cursors = st.session_state.ledger_cursors
     
-    # Combine
-    df_ledger = pd.concat([df_bills, df_payments], ignore_index=True)
-    if not df_ledger.empty:
-        df_ledger['Date'] = pd.to_datetime(df_ledger['Date'])
-        df_ledger = df_ledger.sort_values(by='Date', ascending=False)
-        df_ledger['Date'] = df_ledger['Date'].dt.strftime('%Y-%m-%d')
+    page = chicken_db.fetch_ledger_page(selected_vendor, from_date, to_date, cursors[-1])
+    if page['rows']:
+        df_ledger = pd.DataFrame(page['rows'], columns=['Date', 'TransactionType', 'Amount', 'Details', 'Balance'])
         
-        # Calculate Balance
-        balance = df_ledger['Amount'].sum()
+        # Balance from the VendorBalance summary (O(1), no re-summing of history)
+        balance = chicken_db.fetch_vendor_balance(selected_vendor)['NetDue']
         
         # Display Balance
         if balance > 0:
@@ -279,10 +243,20 @@ def render_ledger_tab():
         st.dataframe(
             df_ledger, 
             column_config={
-                "Amount": st.column_config.NumberColumn("Amount", format="₹%.2f")
+                "Amount": st.column_config.NumberColumn("Amount", format="₹%.2f"),
+                "Balance": st.column_config.NumberColumn("Running Balance", format="₹%.2f")
             },
             use_container_width=True, 
             hide_index=True
         )
+        
+        nav1, nav2, nav3 = st.columns([1, 2, 1])
+        if nav1.button("◀ Newer", disabled=len(cursors) == 1, key="ledger_newer"):
+            cursors.pop()
+            st.rerun()
+        nav2.caption(f"Page {len(cursors)}")
+        if nav3.button("Older ▶", disabled=page['next_cursor'] is None, key="ledger_older"):
+            cursors.append(page['next_cursor'])
+            st.rerun()
     else:
         st.info("No transactions found for this vendor.")
@@ -0,0 +1,182 @@
+import tkinter as tk
+from tkinter import ttk
+
+# --- Virtual Treeview ---
+# A ttk.Treeview that holds a sliding window of at most MAX_PAGES pages of rows instead of
+# every row. Rows come from fetch_page(cursor, limit) -> (rows, next_cursor), a keyset query:
+# cursor None fetches the first page, each page's next_cursor the one after it, and None
+# means there are no more. Scrolling close to either end of the window fetches the
+# neighbouring page and drops the page at the far end. Only the cursor of every page seen
+# so far is kept, so a dropped page can be fetched again when the user scrolls back.
+
+PAGE_SIZE = 100
+MAX_PAGES = 3
+EDGE_FRACTION = 0.15 # Fetch the neighbouring page once the view is this close to the window's end
+
+def sequence_pages(count, get_row):
+    """fetch_page over in-memory rows: count() rows, get_row(i) -> (iid, values, tags); the cursor is an offset."""
+    def fetch_page(cursor, limit):
+        start = cursor or 0
+        end = min(start + limit, count())
+        return [get_row(i) for i in range(start, end)], (end if end < count() else None)
+    return fetch_page
+
+class VirtualTreeview:
+    """
+    ttk.Treeview and its scrollbar in self.frame, filled page by page. Configure headings,
+    columns, tags and bindings on self.tree as usual; rows are (iid or None, values, tags).
+    on_select(event) replaces binding <<TreeviewSelect>>: it is called when the selected row
+    changes, not when its page is dropped or fetched again.
+    """
+
+    def __init__(self, parent, fetch_page=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES, on_select=None, **tree_options):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, **tree_options)
+        scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self._on_yscroll(scrollbar, first, last))
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.on_select = on_select
+
+        self._cursors = [] # Index: page number -> cursor that fetches it
+        self._last_page = None # Page number of the final page, once fetched
+        self._window = [] # [(page number, [iids])] currently in the tree, in order
+        self._selected = None # (iid, values); kept while the row's page is dropped
+        self._pending = None # after_idle id of a scheduled fetch
+
+    # --- Loading ---
+
+    def load(self, fetch_page=None):
+        """Clears the tree and shows the first page (of fetch_page, if a new source is given)."""
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+        if self._pending is not None:
+            self.tree.after_cancel(self._pending)
+            self._pending = None
+        self._selected = None
+        self.tree.delete(*self.tree.get_children())
+        self._cursors = [None]
+        self._last_page = None
+        self._window = []
+        self._fetch_into_window(0, tk.END)
+        self.tree.yview_moveto(0)
+
+    def _fetch_into_window(self, page, index):
+        """Fetches page and inserts its rows at index (0 or END). Returns the row count."""
+        rows, next_cursor = self.fetch_page(self._cursors[page], self.page_size)
+        if next_cursor is None:
+            self._last_page = page
+        elif page + 1 == len(self._cursors):
+            self._cursors.append(next_cursor)
+
+        iids = []
+        for i, (iid, values, tags) in enumerate(rows):
+            iids.append(self.tree.insert('', i if index == 0 else tk.END, iid=f"p{page}_{i}" if iid is None else iid,
+                                         values=values, tags=tags))
+        entry = (page, iids)
+        if index == 0:
+            self._window.insert(0, entry)
+        else:
+            self._window.append(entry)
+
+        if self._selected is not None and self._selected[0] in iids:
+            self.tree.selection_set(self._selected[0]) # Back in view after its page was dropped
+        return len(iids)
+
+    def _drop_page(self, at_start):
+        _, iids = self._window.pop(0 if at_start else -1)
+        self.tree.delete(*iids)
+        return len(iids)
+
+    def _visible_range(self):
+        """(first, last) row index in view, from the scroll fractions."""
+        total = len(self.tree.get_children())
+        first, last = self.tree.yview()
+        return round(first * total), round(last * total)
+
+    def _scroll_to_row(self, row):
+        total = len(self.tree.get_children())
+        self.tree.yview_moveto(row / total if total else 0)
+
+    def _fetch_next(self):
+        last_page = self._window[-1][0]
+        if self._last_page is not None and last_page >= self._last_page:
+            return
+        top, _ = self._visible_range()
+        self._fetch_into_window(last_page + 1, tk.END)
+        # Drop the first page only once it is entirely above the view
+        if len(self._window) > self.max_pages and len(self._window[0][1]) <= top:
+            top -= self._drop_page(at_start=True)
+        self._scroll_to_row(top)
+
+    def _fetch_previous(self):
+        first_page = self._window[0][0]
+        if first_page == 0:
+            return
+        top, bottom = self._visible_range()
+        added = self._fetch_into_window(first_page - 1, 0)
+        top += added
+        bottom += added
+        # Drop the last page only once it is entirely below the view
+        if len(self._window) > self.max_pages and len(self.tree.get_children()) - len(self._window[-1][1]) >= bottom:
+            self._drop_page(at_start=False)
+        self._scroll_to_row(top)
+
+    # --- Scrolling ---
+
+    def _on_yscroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if self._pending is None and self._window:
+            self._pending = self.tree.after_idle(self._extend)
+
+    def _extend(self):
+        self._pending = None
+        if not self._window:
+            return
+        first, last = self.tree.yview()
+        if last >= 1.0 - EDGE_FRACTION:
+            self._fetch_next()
+        elif first <= EDGE_FRACTION:
+            self._fetch_previous()
+
+    # --- Rows and Selection ---
+
+    def update_row(self, iid, values=None, tags=None):
+        """Updates a row if its page is in the tree (the next fetch of the page reads the source anyway)."""
+        if not self.tree.exists(iid):
+            return
+        options = {}
+        if values is not None:
+            options['values'] = values
+        if tags is not None:
+            options['tags'] = tags
+        self.tree.item(iid, **options)
+
+    def selected(self):
+        """(iid, values) of the selected row, also while its page is not in the tree, or None."""
+        return self._selected
+
+    def clear_selection(self):
+        self._selected = None
+        if self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+    def _on_tree_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            if self._selected is not None and self._selected[0] == selection[0]:
+                return # Re-selected after its page came back
+            self._selected = (selection[0], self.tree.item(selection[0], 'values'))
+        else:
+            if self._selected is not None and not self.tree.exists(self._selected[0]):
+                return # Its page was dropped; the row stays selected
+            if self._selected is None:
+                return
+            self._selected = None
+        if self.on_select:
+            self.on_select(event)